@@ -0,0 +1,96 @@
+"""
+Client of the GitHub API for "fetch_data.py" and "data_analysis.py".
+
+The connections to api.github.com are kept alive in one pool shared by the threads, so the TCP and TLS handshakes are
+paid once per connection instead of once per request. Each thread has its own session mounted on the shared pool.
+"""
+import requests
+import requests.adapters
+import threading
+import urllib3.util.retry
+
+
+class ApiClient:
+    """
+    Pooled keep-alive sessions to the GitHub API, one per thread.
+    """
+
+    def __init__(self, pool_size: int, retries: int, backoff_factor: float,
+                 adapter_class=requests.adapters.HTTPAdapter) -> None:
+        """
+        :param pool_size: The number of connections kept alive, at least the number of threads.
+        :param retries: The number of retries on connection errors and 5xx answers.
+        :param backoff_factor: The backoff factor between the retries, in seconds.
+        :param adapter_class: The transport adapter of the pool, called with the arguments of HTTPAdapter.
+        """
+        self.adapter_class = adapter_class
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.adapter = None
+        self.generation = 0
+        self.resize(pool_size)
+
+    def resize(self, pool_size: int) -> None:
+        """
+        Replace the pool of connections, the sessions of the threads are mounted on the new pool at their next request.
+        The connections of the previous pool are closed, a request in flight on one of them closes it once done.
+
+        :param pool_size: The number of connections kept alive.
+        """
+        # 429 and 403 are left to the rate controller and the token pool
+        retry = urllib3.util.retry.Retry(total=self.retries, connect=self.retries, read=self.retries,
+                                         status=self.retries, backoff_factor=self.backoff_factor,
+                                         status_forcelist=(500, 502, 503, 504),
+                                         allowed_methods=frozenset(["GET", "HEAD", "POST"]),
+                                         respect_retry_after_header=False, raise_on_status=False)
+        with self.lock:
+            previous = self.adapter
+            self.adapter = self.adapter_class(pool_connections=1, pool_maxsize=max(1, pool_size), max_retries=retry)
+            self.generation += 1
+        if previous is not None:
+            previous.close()
+
+    def get_session(self) -> requests.Session:
+        """
+        Get the session of the current thread, creating it if needed.
+
+        :return: The session.
+        """
+        session = getattr(self.local, "session", None)
+        if session is None or self.local.generation != self.generation:
+            with self.lock:
+                session = requests.Session()
+                session.mount("https://", self.adapter)
+                self.local.session = session
+                self.local.generation = self.generation
+        return session
+
+    def post(self, url: str, json: dict, headers: dict) -> requests.Response:
+        """
+        Send a POST request, for the GraphQL API.
+
+        :param url: The url of the API.
+        :param json: The JSON body of the request.
+        :param headers: The headers of the request.
+        :return: The response.
+        """
+        return self.get_session().post(url, json=json, headers=headers)
+
+    def get(self, url: str, headers: dict) -> requests.Response:
+        """
+        Send a GET request, for the REST API.
+
+        :param url: The url of the API.
+        :param headers: The headers of the request.
+        :return: The response.
+        """
+        return self.get_session().get(url, headers=headers)
+
+    def close(self) -> None:
+        """
+        Close the connections kept alive.
+        """
+        with self.lock:
+            self.adapter.close()
@@ -0,0 +1,818 @@
+"""
+Asyncio engine for "fetch_data.py".
+
+The marketplace listing pages, the marketplace pages, the links and the API enrichment are all driven as coroutines
+sharing a single connection pool. A semaphore bounds the number of requests in flight.
+
+Select it with fetch_data["engine"] = "asyncio" in "fetch_data_config.py".
+"""
+import aiohttp
+import asyncio
+import codecs
+import json.decoder
+import logging
+import os
+import time
+import typing
+
+import cassette
+import crawl_state
+import db_writer
+import extractors
+import fetch_data
+import fetch_data_config as config
+import metrics
+import rate_control
+
+
+NUMBER_OF_ACCEPTED_ACTIONS = 0
+
+
+class ApiAnswer:
+    """
+    The part of an API response needed by fetch_data.extract.
+    """
+
+    def __init__(self, data: dict | list, links: dict) -> None:
+        """
+        :param data: The decoded JSON body of the response.
+        :param links: The parsed "Link" header of the response.
+        """
+        self.data = data
+        self.links = links
+
+    def json(self) -> dict | list:
+        """
+        :return: The decoded JSON body of the response.
+        """
+        return self.data
+
+
+class Client:
+    """
+    The shared connection pool, the semaphore bounding the requests in flight, and the Actions being fetched.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, max_requests: int) -> None:
+        """
+        :param session: The session holding the connection pool.
+        :param max_requests: The maximum number of requests in flight.
+        """
+        self.session = session
+        self.semaphore = asyncio.Semaphore(max_requests)
+        # URL of the marketplace page of an Action being fetched -> future done once the Action is released
+        self.fetching = {}
+
+
+def fetch_data_async(categories: list, state: crawl_state.CrawlState, writer: db_writer.DatabaseWriter) -> None:
+    """
+    Retrieve information about each Action using the asyncio engine.
+
+    :param categories: The categories of GitHub Actions.
+    :param state: The state of the crawl, the tables of the database must already exist.
+    :param writer: The writer of the database.
+    """
+    asyncio.run(crawl(categories, state, writer))
+
+
+async def crawl(categories: list, state: crawl_state.CrawlState, writer: db_writer.DatabaseWriter) -> None:
+    """
+    Crawl every category, one after the other, with all its pages in flight at once.
+
+    :param categories: The categories of GitHub Actions.
+    :param state: The state of the crawl.
+    :param writer: The writer of the database.
+    """
+    global NUMBER_OF_ACCEPTED_ACTIONS
+
+    max_requests = get_max_requests()
+    cookies = {}
+    if os.getenv("CONNECTION_COOKIE"):
+        cookies['user_session'] = os.getenv("CONNECTION_COOKIE")
+
+    connector = aiohttp.TCPConnector(limit=max_requests)
+    async with aiohttp.ClientSession(connector=connector, cookies=cookies) as session:
+        client = Client(session, max_requests)
+
+        logging.info("Fetching the data (asyncio)")
+        for category in categories:
+            NUMBER_OF_ACCEPTED_ACTIONS = 0
+            logging.info(f"***** {category} *****")
+
+            max_page_number = await get_max_page(client, category)
+            pages_to_do = state.get_pages_to_do(category, max_page_number)
+            refused_counter = 10
+
+            while pages_to_do and refused_counter > 0:
+                print("\n" + "*" * 10 + f" loop {category} / {refused_counter}")
+
+                pages = [crawl_page(client, category, page, state, writer) for page in pages_to_do]
+                action_accepted = any(await asyncio.gather(*pages))
+                await asyncio.to_thread(writer.flush)
+                pages_to_do = state.get_pages_to_do(category, max_page_number)
+
+                if not action_accepted:
+                    refused_counter -= 1
+                else:
+                    refused_counter = 10
+
+
+def get_max_requests() -> int:
+    """
+    Fetching the maximum number of requests in flight.
+
+    :return: The maximum number of requests in flight.
+    """
+    max_requests = config.fetch_data["max_concurrent_requests"]
+    try:
+        max_requests = max(1, int(max_requests))
+    except ValueError:
+        logging.error(f"Bad number of concurrent requests in configuration file.\nBad value is {max_requests}")
+        max_requests = 100
+    logging.info(f"Number of concurrent requests: {max_requests}")
+
+    return max_requests
+
+
+async def get_request(client: Client, function: str, url: str) -> str | None:
+    """
+    Send a request to a webpage and returns the content.
+
+    :param client: The client used to send the request.
+    :param function: The name of the calling function.
+    :param url: The url to connect to.
+    :return: The content. If the status code is not 200 after the retries, returns None.
+    """
+    sleep_time = 30
+    counter = 5
+
+    while counter > 0:
+        try:
+            async with client.semaphore:
+                start = time.perf_counter()
+                async with client.session.get(get_url(url)) as response:
+                    status = response.status
+                    retry_after = response.headers.get("Retry-After")
+                    body = await response.read() if status == 200 else b""
+                    text = await response.text() if status == 200 else None
+                record_request(function, start, status, len(body), status == 429)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            record_error(function, start)
+            fetch_data.METRICS.inc("crawl_sleep_seconds_total", sleep_time, reason="connection error")
+            await asyncio.sleep(sleep_time)
+            continue
+
+        if status == 200:
+            return text
+        if status == 429 and retry_after:
+            logging.info(f"{function} - sleeping " + str(int(retry_after) + 0.3) + " seconds")
+            fetch_data.METRICS.inc("crawl_sleep_seconds_total", int(retry_after) + 0.3 + 3, reason="retry after")
+            await asyncio.sleep(int(retry_after) + 0.3 + 3)
+            logging.info(f"{function} - sleeping finished")
+            continue
+        counter -= 1
+
+    return None
+
+
+def is_throttled(status: int, headers: typing.Mapping) -> bool:
+    """
+    Tell if an API response has been refused because of the rate limit: a 429, a secondary rate limit, or the answer
+    to an exhausted token.
+
+    :param status: The status code of the response.
+    :param headers: The headers of the response.
+    :return: True if the request must be sent again.
+    """
+    if status == 429:
+        return True
+    return status == 403 and ("Retry-After" in headers or headers.get("X-RateLimit-Remaining") == "0")
+
+
+def get_url(url: str) -> str:
+    """
+    Get the URL to send a request to, on the local stand-in of "cassette.py" in "server" mode. The other modes of the
+    cassette are only supported by the sessions of requests.
+
+    :param url: The URL of the request.
+    :return: The URL to send the request to.
+    """
+    if config.cassette["mode"] == "server":
+        return cassette.get_server_url(config.cassette["server"], url)
+    return url
+
+
+def record_request(endpoint: str, start: float, status: int, size: int | None, throttled: bool) -> None:
+    """
+    Record the latency, the status code and the size of a request in the metrics shared with "fetch_data.py".
+
+    :param endpoint: The logical endpoint of the request.
+    :param start: The time at which the request has been sent, from time.perf_counter.
+    :param status: The status code of the response.
+    :param size: The size of the body of the response, None if it has not been read.
+    :param throttled: True if the server asked to slow down.
+    """
+    fetch_data.METRICS.observe("crawl_request_duration_seconds", time.perf_counter() - start, endpoint=endpoint)
+    fetch_data.METRICS.inc("crawl_requests_total", endpoint=endpoint, code=status)
+    if throttled:
+        fetch_data.METRICS.inc("crawl_throttled_total", endpoint=endpoint)
+    if size is not None:
+        fetch_data.METRICS.inc("crawl_response_bytes_total", size, endpoint=endpoint)
+
+
+def record_error(endpoint: str, start: float) -> None:
+    """
+    Record a request that failed without response in the metrics shared with "fetch_data.py".
+
+    :param endpoint: The logical endpoint of the request.
+    :param start: The time at which the request has been sent, from time.perf_counter.
+    """
+    fetch_data.METRICS.observe("crawl_request_duration_seconds", time.perf_counter() - start, endpoint=endpoint)
+    fetch_data.METRICS.inc("crawl_request_errors_total", endpoint=endpoint)
+
+
+async def extract_page(extractor: typing.Callable, text: str) -> typing.Any:
+    """
+    Extract the data of a page, in the pool of parsing processes of "fetch_data.py" if it is enabled, without blocking
+    the event loop while the processes work.
+
+    :param extractor: An extract_* function of "extractors.py".
+    :param text: The body of the page.
+    :return: The record extracted from the page.
+    """
+    with metrics.Timer(fetch_data.METRICS, "crawl_parse_duration_seconds"):
+        return await asyncio.wrap_future(fetch_data.PARSE_EXECUTOR.submit(extractor, text))
+
+
+async def get_max_page(client: Client, category: str) -> int:
+    """
+    Get the number of the last page.
+
+    :param client: The client used to send the request.
+    :param category: The category we are interested of knowing the number of pages.
+    :return: The number of the last page. Returns 0 if there is no Actions in this category.
+    """
+    url = f"https://github.com/marketplace?category={category}&page=1&type=actions"
+
+    text = await get_request(client, "get_max_page", url)
+    if not text:
+        logging.info("Number of pages: " + str(0))
+        return 0
+
+    max_page = await extract_page(extractors.extract_max_page, text)
+    logging.info("Number of pages: " + str(max_page))
+    return max_page
+
+
+async def crawl_page(client: Client, category: str, page: int, state: crawl_state.CrawlState,
+                     writer: db_writer.DatabaseWriter) -> bool:
+    """
+    Crawl every Action of a marketplace listing page, pushing each one to the writer, then the page.
+
+    :param client: The client used to send the requests.
+    :param category: The category of GitHub Actions.
+    :param page: The number of the listing page.
+    :param state: The state of the crawl.
+    :param writer: The writer of the database.
+    :return: True if at least one Action has been accepted.
+    """
+    url = f"https://github.com/marketplace?category={category}&page={page}&type=actions"
+
+    text = await get_request(client, "fetch_names", url)
+    if not text:
+        return False
+
+    actions_names_ugly, actions_urls = await extract_page(extractors.extract_listing, text)
+
+    actions = [crawl_action(client, category, name, url, state, writer)
+               for name, url in zip(actions_names_ugly, actions_urls) if not state.is_action_done(category, url)]
+    results = await asyncio.gather(*actions)
+
+    page_done = all(status == "done" for status, _ in results)
+    await asyncio.to_thread(writer.put_page, category, page, page_done)
+
+    return any(accepted for _, accepted in results)
+
+
+async def crawl_action(client: Client, category: str, action_name_ugly: str, action_url: str,
+                       state: crawl_state.CrawlState, writer: db_writer.DatabaseWriter) -> tuple[str, bool]:
+    """
+    Check the marketplace page and the link of an Action, get some data about it, then push it to the writer. An
+    Action already fetched in another category only gets its category added.
+
+    :param client: The client used to send the requests.
+    :param category: The category of GitHub Actions.
+    :param action_name_ugly: The name of the Action, as found on the listing page.
+    :param action_url: The URL of the marketplace page of the Action.
+    :param state: The state of the crawl.
+    :param writer: The writer of the database.
+    :return: The status ("done" or "failed") and True if the Action has been accepted.
+    """
+    repository = await claim_action(client, state, action_url)
+    if repository:
+        status, action_data = "done", fetch_data.get_membership_data(category, repository, state)
+    else:
+        status = None
+        try:
+            status, repository, action_data = await enrich_action(client, category, action_name_ugly, action_url,
+                                                                  state)
+        finally:
+            release_action(client, state, action_url, repository if status == "done" else None)
+    # waiting in a thread keeps the event loop running while the queue of the writer is full
+    await asyncio.to_thread(writer.put_action, category, action_url, status, repository, action_data)
+    fetch_data.METRICS.inc("crawl_actions_total", status=status if status == "failed" or action_data else "skipped")
+    return status, status == "done" and action_data is not None
+
+
+async def claim_action(client: Client, state: crawl_state.CrawlState, action_url: str) -> tuple | None:
+    """
+    Claim an Action without blocking the event loop. The pages of a category are crawled at once, so an Action listed
+    on two of them is fetched by the first coroutine, and the other one waits for it.
+
+    :param client: The client holding the Actions being fetched.
+    :param state: The state of the crawl.
+    :param action_url: The URL of the marketplace page of the Action.
+    :return: The (owner, repository) of the Action if it is already fetched. Otherwise None, and the caller must call
+             release_action.
+    """
+    while action_url in client.fetching:
+        await client.fetching[action_url]
+    # only the thread of the event loop claims Actions, and none of its coroutines holds this one, so it never waits
+    repository = state.claim_action(action_url)
+    if repository is None:
+        client.fetching[action_url] = asyncio.get_running_loop().create_future()
+    return repository
+
+
+def release_action(client: Client, state: crawl_state.CrawlState, action_url: str, repository: tuple | None) -> None:
+    """
+    Release a claimed Action, and wake up the coroutines waiting for it.
+
+    :param client: The client holding the Actions being fetched.
+    :param state: The state of the crawl.
+    :param action_url: The URL of the marketplace page of the Action.
+    :param repository: The (owner, repository) of the Action if it has been fetched, None if it failed.
+    """
+    state.release_action(action_url, repository)
+    client.fetching.pop(action_url).set_result(None)
+
+
+async def enrich_action(client: Client, category: str, action_name_ugly: str, action_url: str,
+                        state: crawl_state.CrawlState) -> tuple[str, tuple | None, dict | None]:
+    """
+    Check the marketplace page and the link of an Action, then get some data about it.
+
+    :param client: The client used to send the requests.
+    :param category: The category of GitHub Actions.
+    :param action_name_ugly: The name of the Action, as found on the listing page.
+    :param action_url: The URL of the marketplace page of the Action.
+    :param state: The state of the crawl.
+    :return: The status ("done" or "failed"), the (owner, repository) if known, and the data to save if the Action
+             has been accepted.
+    """
+    global NUMBER_OF_ACCEPTED_ACTIONS
+
+    action_name = fetch_data.format_action_name(action_name_ugly)
+    mp_page = await test_mp_page(client, action_url)
+    if not mp_page:
+        print(f"\r{action_name} refused 1.", end="\n")
+        return "failed", None, None
+    repository_url = mp_page.link
+
+    owner = fetch_data.get_owner(repository_url)
+    repository_name = fetch_data.get_repo_name(repository_url)
+    failed_keys = state.get_failed_keys(owner, repository_name)
+    if not failed_keys and state.is_fetched(owner, repository_name, category):
+        return "done", (owner, repository_name), None
+
+    if not await test_link(client, repository_url):
+        print(f"\r{action_name} refused 2.", end="\n")
+        return "failed", None, None
+
+    NUMBER_OF_ACCEPTED_ACTIONS += 1
+    print(f"\r{NUMBER_OF_ACCEPTED_ACTIONS} actions accepted.", end='')
+
+    action_data = {
+        'category': category,
+        'verified': mp_page.verified,
+        'owner': owner,
+        'repository': repository_name,
+        'name': action_name,
+    }
+
+    keys = failed_keys or [key for key in config.fetch_categories if config.fetch_categories[key]]
+    repository_data, action_data['failed_keys'] = await run_fetchers(client, keys, owner, repository_name)
+    action_data.update(repository_data)
+
+    status = "failed" if action_data['failed_keys'] else "done"
+    return status, (owner, repository_name), action_data
+
+
+async def run_fetcher(client: Client, fetcher: str, keys: list, owner: str, repo_name: str) -> dict | None:
+    """
+    Run a fetcher for a repository.
+
+    :param client: The client used to send the requests.
+    :param fetcher: The fetcher, as returned by fetch_data.get_fetchers.
+    :param keys: The keys fetched by the fetcher.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :return: The fetched data of each key, None if it could not be fetched.
+    """
+    if fetcher == "graphql":
+        return await get_api_repository(client, keys, owner, repo_name)
+    if fetcher == "dependents":
+        dependents = await get_dependents(client, owner, repo_name)
+        if dependents is None:
+            return None
+        return {'dependents': {'number': dependents[0], 'package_url': dependents[1]}}
+    return {'contributors': await get_api(client, "contributors", owner, repo_name)}
+
+
+async def run_fetchers(client: Client, keys: list, owner: str, repo_name: str) -> tuple[dict, list]:
+    """
+    Run the fetchers of a repository concurrently, within the enrichment timeout.
+
+    :param client: The client used to send the requests.
+    :param keys: The keys of "fetch_categories" to fetch.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :return: The fetched data of each key, and the keys that could not be fetched.
+    """
+    fetchers = fetch_data.get_fetchers(keys)
+    tasks = {asyncio.create_task(run_fetcher(client, fetcher, fetcher_keys, owner, repo_name)): fetcher
+             for fetcher, fetcher_keys in fetchers.items()}
+    if not tasks:
+        return {}, []
+    done, pending = await asyncio.wait(tasks, timeout=config.fetch_data["enrichment_timeout"])
+    for task in pending:
+        task.cancel()
+
+    repository_data = {}
+    failed_keys = []
+    for task, fetcher in tasks.items():
+        fetched = None
+        if task not in done:
+            logging.error(f"{owner}/{repo_name} - {fetcher} timed out")
+        elif task.exception():
+            logging.error(f"{owner}/{repo_name} - {fetcher} failed: {task.exception()!r}")
+        else:
+            fetched = task.result()
+
+        if fetched is None:
+            failed_keys += fetchers[fetcher]
+        else:
+            repository_data.update(fetched)
+
+    return repository_data, failed_keys
+
+
+async def test_mp_page(client: Client, url: str) -> fetch_data.MarketplacePage | None:
+    """
+    Test if the marketplace page of an Action is accessible and contains the URL for the data.
+
+    :param client: The client used to send the request.
+    :param url: The URL of the Action to check.
+    :return: The parsed marketplace page if it is accessible and contains a link. Otherwise returns None.
+    """
+    text = await get_request(client, "test_name", f"https://github.com{url}")
+
+    if text:
+        mp_page = fetch_data.MarketplacePage(await extract_page(extractors.extract_marketplace_page, text))
+        if mp_page.link:
+            return mp_page
+    return None
+
+
+async def test_link(client: Client, url: str) -> bool:
+    """
+    Test if the link to the repository of an Action is valid. The result is cached per repository.
+
+    :param client: The client used to send the request.
+    :param url: The URL to check.
+    :return: True if the URL is accessible. Otherwise False.
+    """
+    repository = (fetch_data.get_owner(url), fetch_data.get_repo_name(url))
+    if repository not in fetch_data.LINK_CACHE:
+        if config.fetch_data["link_check"] == "page":
+            valid = bool(await get_request(client, "test_link", url))
+        else:
+            valid = await check_link(client, url, *repository)
+        fetch_data.LINK_CACHE[repository] = valid
+    return fetch_data.LINK_CACHE[repository]
+
+
+async def check_link(client: Client, url: str, owner: str, repo_name: str) -> bool:
+    """
+    Check a link with a HEAD request, or a GET closed before the body if HEAD is not allowed. If GitHub cannot be
+    reached, the existence of the repository is checked with the GraphQL API.
+
+    :param client: The client used to send the request.
+    :param url: The URL to check.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :return: True if the URL is accessible. Otherwise False.
+    """
+    method = "HEAD"
+    tries = 5
+    while tries > 0:
+        try:
+            async with client.semaphore:
+                start = time.perf_counter()
+                async with client.session.request(method, get_url(url), allow_redirects=True) as response:
+                    status = response.status
+                    retry_after = response.headers.get("Retry-After")
+                record_request("check_link", start, status, None, status == 429)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            record_error("check_link", start)
+            break
+
+        if status in (404, 410):
+            return False
+        if status < 400:
+            return True
+        if status == 405 and method == "HEAD":
+            method = "GET"
+        elif status == 429 and retry_after:
+            fetch_data.METRICS.inc("crawl_sleep_seconds_total", int(retry_after) + 0.3, reason="retry after")
+            await asyncio.sleep(int(retry_after) + 0.3)
+        else:
+            tries -= 1
+
+    api_answer = await request_to_api(client, fetch_data.get_repository_exists_query(owner, repo_name),
+                                      endpoint="graphql_link")
+    return bool(api_answer) and fetch_data.repository_exists(api_answer.json())
+
+
+async def get_dependents(client: Client, owner: str, repo_name: str) -> tuple[int, str] | None:
+    """
+    Get the number of dependents and the corresponding package url for a repository.
+    The dependents pages of the packages are fetched concurrently.
+
+    :param client: The client used to send the requests.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :return: The number of dependents and the url to get the dependents sample, None if the dependents page of the
+             repository or of one of its packages could not be fetched.
+    """
+    url = f"https://github.com/{owner}/{repo_name}/network/dependents"
+    dependents_page = await get_dependents_page(client, url)
+    if dependents_page is None:
+        return None
+
+    packages, max_dependents = dependents_page
+    numbers = await asyncio.gather(*(stream_dependents_number(client, package_url) for package_url in packages))
+    return fetch_data.get_max_dependents(url, max_dependents, packages, numbers)
+
+
+async def get_dependents_page(client: Client, url: str) -> tuple[list, int] | None:
+    """
+    Get the data of a dependents page.
+
+    :param client: The client used to send the requests.
+    :param url: The url for the dependents.
+    :return: The URLs of the dependents pages of the packages and the number of dependents, None if the page could not
+             be fetched or parsed.
+    """
+    for _ in range(config.fetch_data["dependents_retries"]):
+        text = await get_request(client, "get_dependents", url)
+        if not text:
+            return None
+        dependents_page = await extract_page(extractors.extract_dependents_page, text)
+        if dependents_page is not None:
+            return dependents_page
+
+    logging.error(f"get_dependents - {url} could not be parsed")
+    return None
+
+
+async def stream_dependents_number(client: Client, url: str) -> int | None:
+    """
+    Get the number of dependents on a page, reading the page only until the number is found.
+    If the number is not found on the way, the whole page is parsed.
+
+    :param client: The client used to send the requests.
+    :param url: The url for the dependents.
+    :return: The number of dependents, None if the page could not be fetched.
+    """
+    for _ in range(config.fetch_data["dependents_retries"]):
+        try:
+            async with client.semaphore:
+                start = time.perf_counter()
+                async with client.session.get(get_url(url)) as response:
+                    status = response.status
+                    retry_after = response.headers.get("Retry-After")
+                    dependents, text, size = await read_dependents_number(response) if status == 200 else \
+                        (None, "", None)
+                record_request("stream_dependents", start, status, size, status == 429)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            record_error("stream_dependents", start)
+            continue
+
+        if status == 429 and retry_after:
+            fetch_data.METRICS.inc("crawl_sleep_seconds_total", int(retry_after) + 0.3, reason="retry after")
+            await asyncio.sleep(int(retry_after) + 0.3)
+            continue
+        if fetch_data.is_retryable(status):
+            continue
+        if status != 200:
+            logging.error(f"get_dependents - {url} answered {status}")
+            return None
+        if dependents is not None:
+            return dependents
+
+        dependents_page = await extract_page(extractors.extract_dependents_page, text)
+        if dependents_page is not None:
+            return dependents_page[1]
+
+    logging.error(f"get_dependents - {url} could not be fetched")
+    return None
+
+
+async def read_dependents_number(response: aiohttp.ClientResponse) -> tuple[int | None, str, int]:
+    """
+    Read a dependents page only until the number of dependents is found.
+
+    :param response: The response holding the page.
+    :return: The number of dependents, None if it has not been found, the text read, and its size in bytes.
+    """
+    decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+    text = ""
+    size = 0
+    async for chunk in response.content.iter_chunked(16384):
+        start = max(0, len(text) - 4096)
+        text += decoder.decode(chunk)
+        size += len(chunk)
+        dependents = fetch_data.search_dependents_number(text, start)
+        if dependents is not None:
+            return dependents, text, size
+
+    return None, text + decoder.decode(b"", final=True), size
+
+
+async def get_api(client: Client, key: str, owner: str, repo_name: str) -> list:
+    """
+    Contact the REST API to fetch the contributors of a repository, the pages after the first one concurrently.
+
+    :param client: The client used to send the requests.
+    :param key: The kind of data to retrieve, only "contributors" is fetched through the REST API.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :return: The sorted logins of the contributors.
+    """
+    url = f"https://api.github.com/repos/{owner}/{repo_name}/contributors?per_page=100&page=1"
+    api_answer = await request_to_api(client, None, url, "rest_contributors")
+    if not api_answer:
+        return []
+    contributors = set(fetch_data.extract(api_answer, key))
+
+    urls = fetch_data.get_pages_urls(api_answer.links)
+    for page_answer in await asyncio.gather(*(request_to_api(client, None, page_url, "rest_contributors")
+                                              for page_url in urls)):
+        if page_answer:
+            contributors.update(fetch_data.extract(page_answer, key))
+
+    return sorted(contributors)
+
+
+async def get_api_repository(client: Client, keys: list, owner: str, repo_name: str,
+                             incremental: bool = True) -> dict | None:
+    """
+    Contact the GraphQL API once to fetch several kinds of information about a repository.
+
+    :param client: The client used to send the requests.
+    :param keys: The kinds of data to retrieve, among fetch_data.GRAPHQL_KEYS.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :param incremental: False to fetch the paginated connections in full, even in incremental mode.
+    :return: A dictionary with the extracted data for each key, None if error in response.
+    """
+    history = await asyncio.to_thread(fetch_data.get_history, keys, owner, repo_name) if incremental else {}
+    api_answer = await request_to_api(client, fetch_data.get_api_query(keys, owner, repo_name, history),
+                                      endpoint="graphql_repository")
+    if not api_answer:
+        return None
+    api_answer_json = api_answer.json()
+
+    needed_data = {key: fetch_data.extract_json(api_answer_json, key) for key in keys
+                   if key not in fetch_data.CONNECTIONS}
+    async for key, edges in paginate(client, api_answer_json, keys, history):
+        needed_data.setdefault(key, []).extend(fetch_data.format_page(key, edges))
+    for key in history:
+        needed_data[key] = fetch_data.merge_history(key, needed_data[key], history[key])
+
+    stale = fetch_data.get_stale_history(api_answer_json, needed_data, history)
+    if stale:
+        logging.info(f"{owner}/{repo_name} - {', '.join(stale)} changed in the history, fetched in full")
+        stale_data = await get_api_repository(client, stale, owner, repo_name, incremental=False)
+        if stale_data is None:
+            return None
+        needed_data.update(stale_data)
+    return needed_data
+
+
+async def paginate(client: Client, api_answer_json: dict, keys: list,
+                   history: dict | None = None) -> typing.AsyncIterator[tuple[str, list]]:
+    """
+    Yield the edges of the paginated connections of an answer, page by page, following their pageInfo. The next pages
+    of all the connections are fetched together, with a single query per round. Only the pages of the current round
+    are held.
+
+    :param client: The client used to send the requests.
+    :param api_answer_json: The decoded answer holding the first pages.
+    :param keys: The keys for the wanted data, the ones among fetch_data.CONNECTIONS are paginated.
+    :param history: The history of the paginated connections in incremental mode, as returned by
+                    fetch_data.get_history.
+    :return: The key and the edges of each page, the first pages first.
+    """
+    pagination = fetch_data.Pagination(api_answer_json, keys, history)
+    for page in pagination.get_first_pages():
+        yield page
+
+    next_pages = pagination.get_next_pages()
+    while next_pages:
+        api_answer = await request_to_api(client, pagination.get_query(next_pages),
+                                          endpoint=f"graphql_{'_'.join(next_pages)}_page")
+        if not api_answer:
+            break
+        pages = pagination.add_answer(api_answer.json(), next_pages)
+        if pages is None:
+            break
+        for page in pages:
+            yield page
+        next_pages = pagination.get_next_pages()
+
+    fetch_data.METRICS.inc("crawl_graphql_nodes_total", pagination.count_nodes())
+
+
+async def request_to_api(client: Client, query: dict | None, url: str = None,
+                         endpoint: str = None) -> ApiAnswer | None:
+    """
+    Make a request to the GitHub's GraphQL API, or to the REST API if no query is given.
+
+    :param client: The client used to send the request.
+    :param query: The query to get the information.
+    :param url: The url to use for REST API issues.
+    :param endpoint: The logical endpoint of the request, for the metrics. "graphql" or "rest" by default.
+    :return: The API answer or None if error in response.
+    """
+    tries = 10
+
+    resource = "graphql" if query else "core"
+    endpoint = endpoint or ("graphql" if query else "rest")
+
+    while tries > 0:
+        token, wait = fetch_data.TOKEN_POOL.try_acquire(resource)
+        if wait > 0.0:
+            logging.info(f"All tokens exhausted for {resource} - sleeping {round(wait + 1)} seconds")
+            fetch_data.METRICS.inc("crawl_sleep_seconds_total", wait + 1, reason=f"tokens {resource}")
+            await asyncio.sleep(wait + 1)
+            continue
+        headers = {'Authorization': f'token {token}'}
+
+        try:
+            async with client.semaphore:
+                start = time.perf_counter()
+                if query:
+                    response = await client.session.post(get_url("https://api.github.com/graphql"), json=query,
+                                                         headers=headers)
+                else:
+                    headers['accept'] = 'application/vnd.github.v3+json'
+                    response = await client.session.get(get_url(url), headers=headers)
+                async with response:
+                    body = await response.read()
+                    response_headers = response.headers
+                    throttled = is_throttled(response.status, response_headers)
+                    data = None if throttled else await response.json(content_type=None)
+                    throttled = throttled or bool(query) and fetch_data.is_rate_limited(data)
+                    record_request(endpoint, start, response.status, len(body), throttled)
+                    rate_limit = (data.get("data") or {}).get("rateLimit") if isinstance(data, dict) else None
+                    fetch_data.TOKEN_POOL.update(token, resource, response_headers, rate_limit)
+                    if not throttled:
+                        fetch_data.METRICS.inc("crawl_token_points_total", (rate_limit or {}).get("cost", 1),
+                                               endpoint=endpoint)
+                    links = {rel: {'url': str(link['url'])} for rel, link in response.links.items()}
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            record_error(endpoint, start)
+            fetch_data.METRICS.inc("crawl_sleep_seconds_total", 60, reason="connection error")
+            await asyncio.sleep(60)
+            continue
+        except json.decoder.JSONDecodeError:
+            return None
+
+        if throttled:
+            # sent again without spending a try, like the threads of "fetch_data.py" do
+            wait = rate_control.get_throttle_wait(response_headers)
+            if wait > 0.0:
+                logging.info(f"{endpoint} - throttled, sleeping {round(wait)} seconds")
+                fetch_data.METRICS.inc("crawl_sleep_seconds_total", wait, reason="retry after")
+                await asyncio.sleep(wait)
+            continue
+        if query and "errors" in data:
+            tries -= 1
+            continue
+        if not query and not isinstance(data, list):
+            return None
+        return ApiAnswer(data, links)
+
+    return None
@@ -0,0 +1,61 @@
+"""
+Benchmark of the crawl of "fetch_data.py" on recorded traffic, without network.
+
+Record a cassette once by running "fetch_data.py" with cassette["mode"] = "record" in "fetch_data_config.py". Then
+replay it as many times as needed, from the same directory (the categories are read from "categories.npy"). The
+threads engine is served in the process, and the asyncio engine by the local stand-in of "cassette.py". Every run
+crawls the same traffic into a new database, so the engines and their changes can be compared in actions per second.
+
+Usage: python benchmark_crawl.py cassette_path [threads|asyncio] [latency] [throttle_rate]
+"""
+import fetch_data_config as config
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+
+    logging.basicConfig(filename="benchmark_crawl.log", level=logging.INFO, filemode='w',
+                        format='%(asctime)s %(message)s')
+
+    engine_main = sys.argv[2] if len(sys.argv) > 2 else "threads"
+    config.fetch_data["engine"] = engine_main
+    config.cassette["mode"] = "replay" if engine_main == "threads" else "server"
+    config.cassette["path"] = sys.argv[1]
+    config.cassette["latency"] = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    config.cassette["throttle_rate"] = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+    config.metrics["run"] = False
+
+    # the sessions of "fetch_data.py" are mounted on the cassette when it is imported
+    import cassette
+    import fetch_data
+
+    if engine_main == "asyncio":
+        replayer_main = cassette.Replayer(cassette.Cassette(config.cassette["path"]), config.cassette["latency"],
+                                          config.cassette["throttle_rate"], config.cassette["retry_after"],
+                                          config.cassette["seed"])
+        server_main = cassette.serve(replayer_main, 0)
+        config.cassette["server"] = f"http://127.0.0.1:{server_main.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as directory_main:
+        fetch_data.file_name_main = os.path.join(directory_main, "actions_data.db")
+        fetch_data.number_of_threads = 0
+
+        start_time = time.perf_counter()
+        fetch_data.fetch_data_multithread()
+        elapsed = time.perf_counter() - start_time
+
+        sqlite_connection_main = sqlite3.connect(fetch_data.file_name_main)
+        number_of_actions = sqlite_connection_main.execute("SELECT COUNT(owner) FROM actions;").fetchone()[0]
+        sqlite_connection_main.close()
+
+    print(f"\nEngine: {engine_main}, latency: {config.cassette['latency']} seconds, "
+          f"throttle rate: {config.cassette['throttle_rate']}")
+    print(f"{number_of_actions} actions in {elapsed:.1f} seconds: {number_of_actions / elapsed:.1f} actions/sec")
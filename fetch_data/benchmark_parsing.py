@@ -0,0 +1,263 @@
+"""
+Benchmark of the HTML parsing used by "fetch_data.py".
+
+Compare the former parsing (BeautifulSoup + prettify + lxml) with the single-pass lxml parsing, in pages per second.
+Then compare the XPath expressions given as strings with the precompiled ones of "extractors.py", and the former
+formatting of the names of the Actions with the current one, in calls per second. Finally, compare the extraction of
+the marketplace pages by the threads of the crawl with the one by the processes of "parse_executor.py".
+The pages are read from the directory given as first argument (every *.html file, for example recorded marketplace
+pages). Without argument, synthetic pages shaped like the marketplace are used.
+
+Usage: python benchmark_parsing.py [pages_directory] [repetitions]
+"""
+from bs4 import BeautifulSoup
+from html import unescape
+from lxml import html
+
+import concurrent.futures
+import extractors
+import fetch_data
+import os
+import parse_executor
+import re
+import sys
+import time
+
+
+XPATHS = {
+    extractors.CATEGORIES_XPATH: '//*[@id="js-pjax-container"]/div[2]/div[1]/nav/ul[2]/li/a/text()',
+    extractors.PAGES_NUMBERS_XPATH: '//*[@id="js-pjax-container"]/div[2]/div[1]/div[3]/div/a[not(@class="next_page")]'
+                                    ' | //*[@id="js-pjax-container"]/div[2]/div[1]/div[3]/div/em',
+    extractors.ACTIONS_URLS_XPATH: "//div[@class='d-md-flex flex-wrap mb-4']/a/@href",
+    extractors.REPOSITORY_LINK_XPATH: '//h5[normalize-space(text())="Links"]/following-sibling::a[1]/@href',
+    extractors.VERIFIED_XPATH: '//*[text()[contains(., "Verified creator")]]',
+    extractors.DISPLAY_NAME_XPATH: 'normalize-space(//h1)',
+    extractors.DEPENDENTS_NUMBER_XPATH: '//*[@id="dependents"]/div[3]/div[1]/div/div/a[1]/text()',
+}
+
+
+def old_parse_html(request_text: str) -> html.HtmlElement:
+    """
+    The former parsing: BeautifulSoup, prettify, and a second parse with lxml.
+
+    :param request_text: The HTML response as text.
+    :return: The root of the parsed HTML.
+    """
+    soup = BeautifulSoup(request_text, 'html.parser')
+    pretty_soup = soup.prettify()
+    root = html.fromstring(pretty_soup)
+
+    return root
+
+
+def old_format_action_name(ugly_name: str) -> str:
+    """
+    The former formatting of the names, removing the '-' at the ends one at a time.
+
+    :param ugly_name: The name that has to be formatted.
+    :return: The prettified name.
+    """
+    ugly_name = ugly_name.split('<h3 class="h4">')[1].split('</h3>')[0].lower()
+    ugly_name = unescape(ugly_name)
+    ugly_name = ugly_name.replace(" - ", "-").replace(" ", "-")
+    ugly_name = re.sub("[^0-9a-zA-Z_-]", "-", ugly_name)
+
+    while re.search("^-.*$", ugly_name):
+        ugly_name = ugly_name[1:]
+    while re.search("^.*-$", ugly_name):
+        ugly_name = ugly_name[:-1]
+
+    ugly_name = re.sub("-{2,}", "-", ugly_name)
+
+    return ugly_name
+
+
+def load_pages(pages_directory: str) -> list:
+    """
+    Load the recorded pages.
+
+    :param pages_directory: The directory containing the *.html files.
+    :return: The content of the pages.
+    """
+    pages = []
+    for file in sorted(os.listdir(pages_directory)):
+        if file.endswith(".html"):
+            with open(os.path.join(pages_directory, file), 'r', encoding="utf-8") as page:
+                pages.append(page.read())
+    return pages
+
+
+def build_sample_pages() -> list:
+    """
+    Build synthetic pages shaped like a listing page, a marketplace page and a dependents page.
+
+    :return: The content of the pages.
+    """
+    padding = "".join(f'<div class="d-none"><span class="color-fg-muted">filler {i}</span>\n  <svg><path d="M0"/>'
+                      f'</svg></div>\n' for i in range(1500))
+    actions = "".join(f'<div class=\'d-md-flex flex-wrap mb-4\'><a href="/marketplace/actions/action-{i}">\n'
+                      f'  <h3 class="h4">Action {i}</h3>\n</a></div>\n' for i in range(20))
+    pages = "".join(f'<a href="/marketplace?page={i}">{i}</a>' for i in range(2, 10))
+    listing = (f'<html><body>{padding}<div id="js-pjax-container"><div></div><div><div>'
+               f'<nav><ul></ul><ul><li><a>\n  API management\n</a></li><li><a>Chat</a></li></ul></nav>'
+               f'<div></div><div></div><div><div><em class="current">1</em>{pages}'
+               f'<a class="next_page" href="/marketplace?page=2">Next</a></div></div>'
+               f'{actions}</div></div></div></body></html>')
+    mp_page = (f'<html><body>{padding}<div><h5 class="mb-2">\n  Links\n</h5>'
+               f'<a href="https://github.com/owner/repository">owner/repository</a>'
+               f'<span>Verified creator</span></div></body></html>')
+    dependents = (f'<html><body>{padding}<div id="dependents"><div></div><div></div><div><div><div><div>'
+                  f'<a href="#">\n  <svg></svg>\n  1,234\n  Repositories\n</a><a href="#">5 Packages</a>'
+                  f'</div></div></div></div></div></body></html>')
+    return [listing, mp_page, dependents]
+
+
+def check_extractions(pages: list) -> None:
+    """
+    Check that the extractors give the same results with both parsings.
+
+    :param pages: The content of the pages.
+    """
+    extraction_functions = [extractors.get_max_page_number, extractors.get_repository_link, extractors.get_verified,
+                            extractors.get_dependents_number]
+    for page in pages:
+        old_root = old_parse_html(page)
+        new_root = fetch_data.parse_html(page)
+        for extractor in extraction_functions:
+            old_result = extractor(old_root)
+            new_result = extractor(new_root)
+            if old_result != new_result:
+                print(f"Mismatch in {extractor.__name__}: {old_result} != {new_result}")
+
+
+def get_sample_names(pages: list) -> list:
+    """
+    Get the names of the Actions in the pages, with a few names that are hard to format.
+
+    :param pages: The content of the pages.
+    :return: The names, as found in the listing pages.
+    """
+    names = []
+    for page in pages:
+        names.extend(extractors.ACTIONS_NAMES_PATTERN.findall(page))
+    names.extend(f'<h3 class="h4">{name}</h3>' for name in ["&quot;Quoted&quot; - action", "  ** Stars **  ",
+                                                             "---", "Émoji 🚀 deploy", "-" * 2000 + "x" + "-" * 2000])
+
+    return names
+
+
+def check_names(names: list) -> None:
+    """
+    Check that both formattings of the names give the same results.
+
+    :param names: The names, as found in the listing pages.
+    """
+    for name in names:
+        old_result = old_format_action_name(name)
+        new_result = fetch_data.format_action_name(name)
+        if old_result != new_result:
+            print(f"Mismatch in format_action_name: {old_result} != {new_result}")
+
+
+def benchmark_xpaths(roots: list, precompiled: bool, repetitions: int) -> float:
+    """
+    Evaluate every XPath expression of the extractors on the parsed pages several times.
+
+    :param roots: The roots of the parsed pages.
+    :param precompiled: True to use the precompiled expressions, False to give the strings to xpath().
+    :param repetitions: The number of times each expression is evaluated on each page.
+    :return: The number of evaluations per second.
+    """
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        for root in roots:
+            for xpath, expression in XPATHS.items():
+                if precompiled:
+                    xpath(root)
+                else:
+                    root.xpath(expression)
+    elapsed = time.perf_counter() - start
+
+    return len(roots) * len(XPATHS) * repetitions / elapsed
+
+
+def benchmark(parser, pages: list, repetitions: int) -> float:
+    """
+    Parse the pages several times.
+
+    :param parser: The parsing function.
+    :param pages: The content of the pages.
+    :param repetitions: The number of times each page is parsed.
+    :return: The number of pages parsed per second.
+    """
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        for page in pages:
+            parser(page)
+    elapsed = time.perf_counter() - start
+
+    return len(pages) * repetitions / elapsed
+
+
+def benchmark_parse_executor(pages: list, processes: int, threads: int, repetitions: int) -> float:
+    """
+    Extract the data of the pages as the crawl does, from several threads, with or without parsing processes.
+
+    :param pages: The content of the pages.
+    :param processes: The number of parsing processes, 0 to extract in the threads.
+    :param threads: The number of threads of the crawl.
+    :param repetitions: The number of times each page is extracted.
+    :return: The number of pages extracted per second.
+    """
+    executor = parse_executor.ParseExecutor()
+    executor.start(processes)
+    contents = [page.encode() for page in pages] * repetitions
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda content: executor.run(extractors.extract_marketplace_page, content, "utf-8"), contents))
+    elapsed = time.perf_counter() - start
+    executor.close()
+
+    return len(contents) / elapsed
+
+
+if __name__ == "__main__":
+    pages_main = load_pages(sys.argv[1]) if len(sys.argv) > 1 else build_sample_pages()
+    repetitions_main = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    check_extractions(pages_main)
+
+    old_speed = benchmark(old_parse_html, pages_main, repetitions_main)
+    new_speed = benchmark(fetch_data.parse_html, pages_main, repetitions_main)
+    print(f"Pages: {len(pages_main)}, repetitions: {repetitions_main}")
+    print(f"BeautifulSoup + prettify + lxml: {old_speed:.1f} pages/sec")
+    print(f"lxml single pass: {new_speed:.1f} pages/sec")
+    print(f"Speedup: x{new_speed / old_speed:.1f}")
+
+    roots_main = [fetch_data.parse_html(page) for page in pages_main]
+    for xpath_main, expression_main in XPATHS.items():
+        for root_main in roots_main:
+            if xpath_main(root_main) != root_main.xpath(expression_main):
+                print(f"Mismatch in the XPath {expression_main}")
+    string_speed = benchmark_xpaths(roots_main, False, repetitions_main * 10)
+    compiled_speed = benchmark_xpaths(roots_main, True, repetitions_main * 10)
+    print(f"XPath strings: {string_speed:.1f} evaluations/sec")
+    print(f"XPath precompiled: {compiled_speed:.1f} evaluations/sec")
+    print(f"Speedup: x{compiled_speed / string_speed:.1f}")
+
+    names_main = get_sample_names(pages_main)
+    check_names(names_main)
+    old_speed = benchmark(old_format_action_name, names_main, repetitions_main * 10)
+    new_speed = benchmark(fetch_data.format_action_name, names_main, repetitions_main * 10)
+    print(f"Names: {len(names_main)}")
+    print(f"Former format_action_name: {old_speed:.1f} names/sec")
+    print(f"Current format_action_name: {new_speed:.1f} names/sec")
+    print(f"Speedup: x{new_speed / old_speed:.1f}")
+
+    processes_main = os.cpu_count() or 1
+    thread_speed = benchmark_parse_executor(pages_main, 0, 50, repetitions_main)
+    process_speed = benchmark_parse_executor(pages_main, processes_main, 50, repetitions_main)
+    print(f"Extraction in 50 threads: {thread_speed:.1f} pages/sec")
+    print(f"Extraction in {processes_main} processes: {process_speed:.1f} pages/sec")
+    print(f"Speedup: x{process_speed / thread_speed:.1f}")
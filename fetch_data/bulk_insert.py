@@ -0,0 +1,82 @@
+"""
+Bulk persistence of rows in the SQLite databases of "fetch_data.py" and "convert_to_db.py".
+
+The rows of many Actions are gathered per table and inserted with one executemany per table, in one transaction.
+INSERT OR IGNORE keeps the first row of a primary key, exactly as inserting row by row and ignoring the IntegrityError
+did, so the databases are unchanged.
+"""
+import sqlite3
+import time
+
+
+def open_bulk(connection: sqlite3.Connection) -> None:
+    """
+    Tune a connection for bulk inserts: write-ahead log, and no fsync at each commit.
+
+    :param connection: The connection to the database.
+    """
+    connection.execute("PRAGMA journal_mode=WAL;")
+    connection.execute("PRAGMA synchronous=NORMAL;")
+
+
+def close_bulk(connection: sqlite3.Connection) -> None:
+    """
+    Checkpoint the write-ahead log and go back to a single file database, then close the connection.
+
+    :param connection: The connection to the database.
+    """
+    connection.commit()
+    connection.execute("PRAGMA journal_mode=DELETE;")
+    connection.close()
+
+
+class BulkInserter:
+    """
+    Rows waiting to be inserted, per table, and the statistics of the inserts.
+    """
+
+    def __init__(self) -> None:
+        self.rows = {}
+        self.columns = {}
+        self.inserted_rows = 0
+        self.insert_time = 0.0
+
+    def add(self, table: str, columns: tuple, rows: list) -> None:
+        """
+        Add rows to insert in a table.
+
+        :param table: The name of the table.
+        :param columns: The names of the columns.
+        :param rows: The rows, as tuples of values in the order of the columns.
+        """
+        self.columns[table] = columns
+        self.rows.setdefault(table, []).extend(rows)
+
+    def flush(self, connection: sqlite3.Connection) -> int:
+        """
+        Insert the waiting rows, one executemany per table, and commit the transaction.
+
+        :param connection: The connection to the database.
+        :return: The number of rows sent.
+        """
+        start_time = time.time()
+        cursor = connection.cursor()
+        sent = 0
+        for table, rows in self.rows.items():
+            columns = self.columns[table]
+            cursor.executemany(f"""
+            INSERT OR IGNORE INTO {table} ({", ".join(columns)})
+            VALUES ({", ".join("?" for _ in columns)});
+            """, rows)
+            sent += len(rows)
+        connection.commit()
+        self.rows = {}
+        self.inserted_rows += sent
+        self.insert_time += time.time() - start_time
+        return sent
+
+    def get_rate(self) -> float:
+        """
+        :return: The number of rows inserted per second, commits included, since the creation of the inserter.
+        """
+        return self.inserted_rows / self.insert_time if self.insert_time else 0.0
@@ -0,0 +1,368 @@
+"""
+Record and replay of the HTTP traffic of "fetch_data.py", to benchmark the crawl offline on identical traffic.
+
+In "record" mode, every request sent through requests is stored with its response in a cassette: a SQLite file with
+the bodies compressed by zlib. In "replay" mode, the responses are served from the cassette in the process itself,
+without network, and in "simulate" mode they are generated by "simulator.py". In "server" mode, the requests are sent
+to a local stand-in ("python cassette.py serve", or "python simulator.py"), which also serves the asyncio engine. The
+replays can add latency and answer a share of the requests with a 429 and a Retry-After, to exercise the rate control.
+
+Usage: python cassette.py serve cassette_path [port] [latency] [throttle_rate] [retry_after]
+"""
+import hashlib
+import http.server
+import json
+import logging
+import os
+import random
+import requests
+import requests.adapters
+import requests.structures
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+
+
+# the body is stored decoded, and its length is given by the replay
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+
+def get_key(method: str, url: str, body: bytes | str | None = None) -> str:
+    """
+    Get the key of a request in the cassette. The JSON bodies are normalized, so the same GraphQL query gives the same
+    key whatever the client serializing it.
+
+    :param method: The HTTP method.
+    :param url: The URL of the request.
+    :param body: The body of the request, if any.
+    :return: The key.
+    """
+    key = f"{method.upper()} {url}"
+    if not body:
+        return key
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+    except ValueError:
+        pass
+    return f"{key}#{hashlib.sha256(body).hexdigest()}"
+
+
+def is_throttled(status: int, headers: dict) -> bool:
+    """
+    Tell if an answer is a 429 or a secondary rate limit, those are never recorded.
+
+    :param status: The status code.
+    :param headers: The headers.
+    :return: True if the server asked to slow down.
+    """
+    return status == 429 or (status == 403 and ("Retry-After" in headers or
+                                                 headers.get("X-RateLimit-Remaining") == "0"))
+
+
+class Cassette:
+    """
+    Recorded answers, stored in a SQLite file. The last answer of a request is kept.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: The path of the SQLite file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""
+        CREATE TABLE IF NOT EXISTS answers (
+            key TEXT PRIMARY KEY,
+            status INTEGER,
+            headers TEXT,
+            body BLOB,
+            elapsed REAL
+        );
+        """)
+        self.connection.commit()
+
+    def store(self, key: str, status: int, headers: dict, body: bytes, elapsed: float) -> None:
+        """
+        Store an answer.
+
+        :param key: The key of the request.
+        :param status: The status code.
+        :param headers: The headers.
+        :param body: The decoded body.
+        :param elapsed: The number of seconds the server took to answer.
+        """
+        headers = {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS}
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO answers (key, status, headers, body, elapsed) "
+                                    "VALUES (?, ?, ?, ?, ?);",
+                                    (key, status, json.dumps(headers), zlib.compress(body), elapsed))
+            self.connection.commit()
+
+    def load(self, key: str) -> tuple | None:
+        """
+        Load an answer.
+
+        :param key: The key of the request.
+        :return: The answer (status, headers, body, elapsed), or None if the request has not been recorded.
+        """
+        with self.lock:
+            answer = self.connection.execute("SELECT status, headers, body, elapsed FROM answers WHERE key = ?;",
+                                             (key,)).fetchone()
+        if answer is None:
+            return None
+        status, headers, body, elapsed = answer
+        return status, json.loads(headers), zlib.decompress(body), elapsed
+
+    def get_answer(self, method: str, url: str, body: bytes | str | None = None) -> tuple | None:
+        """
+        Get the recorded answer to a request.
+
+        :param method: The HTTP method.
+        :param url: The URL of the request.
+        :param body: The body of the request, if any.
+        :return: The answer (status, headers, body, elapsed), or None if the request has not been recorded.
+        """
+        return self.load(get_key(method, url, body))
+
+    def close(self) -> None:
+        """
+        Close the SQLite file.
+        """
+        with self.lock:
+            self.connection.close()
+
+
+class Replayer:
+    """
+    Serve the answers of a cassette or of the simulator, with injected latency and 429s.
+    """
+
+    def __init__(self, source, latency: float | None, throttle_rate: float, retry_after: int, seed: int) -> None:
+        """
+        :param source: The recorded answers (Cassette) or the generated ones ("simulator.py"), given by its
+                       get_answer method.
+        :param latency: The number of seconds before each answer, None to wait as long as the recording took.
+        :param throttle_rate: The share of the requests answered with a 429, between 0 and 1.
+        :param retry_after: The Retry-After of the injected 429s, in seconds.
+        :param seed: The seed of the random injection of the 429s.
+        """
+        self.source = source
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.missing = 0
+
+    def answer(self, method: str, url: str, body: bytes | str | None = None) -> tuple[int, dict, bytes]:
+        """
+        Wait for the latency, then get the answer to a request.
+
+        :param method: The HTTP method.
+        :param url: The URL of the request.
+        :param body: The body of the request, if any.
+        :return: The answer (status, headers, body). A request missing from the cassette is answered with a 404.
+        """
+        with self.lock:
+            throttled = self.random.random() < self.throttle_rate
+        answer = self.source.get_answer(method, url, body)
+
+        if answer is None:
+            with self.lock:
+                self.missing += 1
+            logging.warning(f"Cassette - {method} {url} has no answer")
+            status, headers, content, elapsed = 404, {}, b"", 0.0
+        else:
+            status, headers, content, elapsed = answer
+
+        time.sleep(elapsed if self.latency is None else self.latency)
+        if throttled:
+            return 429, {"Retry-After": str(self.retry_after)}, b""
+        if method.upper() == "HEAD":
+            content = b""
+        return status, headers, content
+
+
+class CassetteAdapter(requests.adapters.HTTPAdapter):
+    """
+    Transport adapter recording the answers, serving them from a cassette, or sending them to a local stand-in.
+    """
+
+    def __init__(self, cassette: Cassette | None = None, replayer: Replayer | None = None, server: str | None = None,
+                 **kwargs) -> None:
+        """
+        :param cassette: The cassette in which the answers are recorded, in "record" mode.
+        :param replayer: The replayer serving the answers, in "replay" mode.
+        :param server: The URL of the local stand-in, in "server" mode.
+        :param kwargs: The arguments of requests.adapters.HTTPAdapter.
+        """
+        super().__init__(**kwargs)
+        self.cassette = cassette
+        self.replayer = replayer
+        self.server = server
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        """
+        Send a request through the cassette.
+
+        :param request: The request.
+        :param kwargs: The arguments of requests.adapters.HTTPAdapter.send.
+        :return: The response.
+        """
+        if self.replayer is not None:
+            status, headers, body = self.replayer.answer(request.method, request.url, request.body)
+            return self.to_response(request, status, headers, body)
+
+        if self.server is not None:
+            request.url = get_server_url(self.server, request.url)
+            return super().send(request, **kwargs)
+
+        response = super().send(request, **kwargs)
+        if not is_throttled(response.status_code, response.headers):
+            # a streamed body is read here, and read again from memory by the caller
+            self.cassette.store(get_key(request.method, request.url, request.body), response.status_code,
+                                dict(response.headers), response.content, response.elapsed.total_seconds())
+        return response
+
+    @staticmethod
+    def to_response(request: requests.PreparedRequest, status: int, headers: dict, body: bytes) -> requests.Response:
+        """
+        Build a response from a recorded answer.
+
+        :param request: The request.
+        :param status: The status code.
+        :param headers: The headers.
+        :param body: The decoded body.
+        :return: The response.
+        """
+        response = requests.Response()
+        response.status_code = status
+        response.reason = http.server.BaseHTTPRequestHandler.responses.get(status, ("",))[0]
+        response.url = request.url
+        response.request = request
+        response.headers = requests.structures.CaseInsensitiveDict(headers)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = body
+        response._content_consumed = True
+        return response
+
+
+def get_server_url(server: str, url: str) -> str:
+    """
+    Get the URL of a request sent to the local stand-in.
+
+    :param server: The URL of the local stand-in.
+    :param url: The URL of the request.
+    :return: The URL on the stand-in, holding the original URL in its path.
+    """
+    return f"{server.rstrip('/')}/{urllib.parse.quote(url, safe='')}"
+
+
+def get_adapter_class(settings: dict, simulator_settings: dict):
+    """
+    Get the transport adapter to mount on the sessions of "fetch_data.py".
+
+    :param settings: The settings of the cassette, see "cassette" in "fetch_data_config.py".
+    :param simulator_settings: The settings of the simulator, see "simulator" in "fetch_data_config.py".
+    :return: A function creating the adapters, called with the arguments of requests.adapters.HTTPAdapter.
+    """
+    mode = settings["mode"]
+    if mode == "off":
+        return requests.adapters.HTTPAdapter
+
+    cassette = Cassette(settings["path"]) if mode in ("record", "replay") else None
+    replayer = None
+    if mode == "replay":
+        replayer = Replayer(cassette, settings["latency"], settings["throttle_rate"], settings["retry_after"],
+                            settings["seed"])
+    elif mode == "simulate":
+        import simulator
+
+        replayer = Replayer(simulator.Simulator(simulator_settings), settings["latency"], settings["throttle_rate"],
+                            settings["retry_after"], settings["seed"])
+
+    def create_adapter(**kwargs) -> CassetteAdapter:
+        return CassetteAdapter(cassette=cassette if mode == "record" else None, replayer=replayer,
+                               server=settings["server"] if mode == "server" else None, **kwargs)
+
+    logging.info(f"Cassette - {mode} mode")
+    return create_adapter
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Handler of the local stand-in, answering the requests from the cassette.
+    """
+
+    replayer = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.answer()
+
+    def do_HEAD(self) -> None:
+        self.answer()
+
+    def do_POST(self) -> None:
+        self.answer()
+
+    def answer(self) -> None:
+        """
+        Answer a request with the recorded answer of the original URL, found in the path.
+        """
+        url = urllib.parse.unquote(self.path[1:])
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else None
+
+        status, headers, content = self.replayer.answer(self.command, url, body)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(content)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def serve(replayer: Replayer, port: int) -> http.server.ThreadingHTTPServer:
+    """
+    Start the local stand-in in a background thread.
+
+    :param replayer: The replayer serving the answers.
+    :param port: The port to listen on, 0 for any free port.
+    :return: The server, its address is server.server_address.
+    """
+    handler = type("Handler", (StandInHandler,), {"replayer": replayer})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stand-in", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "serve":
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    replayer_main = Replayer(Cassette(sys.argv[2]),
+                             float(sys.argv[4]) if len(sys.argv) > 4 else None,
+                             float(sys.argv[5]) if len(sys.argv) > 5 else 0.0,
+                             int(sys.argv[6]) if len(sys.argv) > 6 else 1, 0)
+    server_main = serve(replayer_main, int(sys.argv[3]) if len(sys.argv) > 3 else 8000)
+    logging.info(f"Serving {sys.argv[2]} on http://127.0.0.1:{server_main.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server_main.shutdown()
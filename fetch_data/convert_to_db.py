@@ -1,7 +1,11 @@
+import bulk_insert
 import json
 import os
 import sqlite3
 
+# number of Actions inserted in one transaction
+BATCH_SIZE = 500
+
 
 def read_json_file(json_file: str):
     with open(json_file, 'r') as file:
@@ -42,6 +46,7 @@ def convert_json_name(json_file):
 
 def create_database(json_data, database_file):
     sqlite_connection = sqlite3.connect(database_file)
+    bulk_insert.open_bulk(sqlite_connection)
     sqlite_cursor = sqlite_connection.cursor()
 
     sqlite_create_main_table = """
@@ -104,25 +109,29 @@ def create_database(json_data, database_file):
 
     sqlite_connection.commit()
 
-    for action in json_data:
+    inserter = bulk_insert.BulkInserter()
+    for index, action in enumerate(json_data, 1):
         owner = json_data[action]["owner"]
         repository = json_data[action]["repository"]
-        insert_actions(json_data[action], sqlite_cursor, owner, repository)
-        insert_contributors(json_data[action], sqlite_cursor, owner, repository)
-        insert_dependents(json_data[action], sqlite_cursor, owner, repository)
-        # insert_issues(json_data[action], sqlite_cursor, owner, repository)
-        insert_versions(json_data[action], sqlite_cursor, owner, repository)
-        sqlite_connection.commit()
+        insert_actions(json_data[action], inserter, owner, repository)
+        insert_contributors(json_data[action], inserter, owner, repository)
+        insert_dependents(json_data[action], inserter, owner, repository)
+        # insert_issues(json_data[action], inserter, owner, repository)
+        insert_versions(json_data[action], inserter, owner, repository)
+        if index % BATCH_SIZE == 0:
+            inserter.flush(sqlite_connection)
+    inserter.flush(sqlite_connection)
 
-    sqlite_connection.close()
+    bulk_insert.close_bulk(sqlite_connection)
+    print(f"{inserter.inserted_rows} rows, {round(inserter.get_rate())} rows/second")
 
 
-def insert_actions(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+def insert_actions(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert basic information in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
@@ -132,43 +141,30 @@ def insert_actions(action_data: dict, cursor: sqlite3.Cursor, owner: str, reposi
     stars = action_data["stars"]
     verified = 1 if action_data["verified"] else 0
     watchers = action_data["watchers"]
-    insert_main = """
-    INSERT INTO actions (category, forks, name, owner, repository, stars, verified, watchers)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?);
-    """
-    try:
-        cursor.execute(insert_main, (category, forks, name, owner, repository, stars, verified, watchers))
-    except sqlite3.IntegrityError:
-        pass
+    inserter.add("actions", ("category", "forks", "name", "owner", "repository", "stars", "verified", "watchers"),
+                 [(category, forks, name, owner, repository, stars, verified, watchers)])
 
 
-def insert_contributors(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+def insert_contributors(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert the contributors data in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
     contributors = action_data["contributors"]
-    for contributor in contributors:
-        insert_contributor = """
-        INSERT INTO contributors (owner, repository, contributor)
-        VALUES (?, ?, ?);
-        """
-        try:
-            cursor.execute(insert_contributor, (owner, repository, contributor))
-        except sqlite3.IntegrityError:
-            pass
-
-
-def insert_dependents(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+    inserter.add("contributors", ("owner", "repository", "contributor"),
+                 [(owner, repository, contributor) for contributor in contributors])
+
+
+def insert_dependents(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert dependents data in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
@@ -179,59 +175,37 @@ def insert_dependents(action_data: dict, cursor: sqlite3.Cursor, owner: str, rep
     else:
         number = dependents
         package_url = None
-    insert_dependent = """
-    INSERT INTO dependents (owner, repository, number, package_url)
-    VALUES (?, ?, ?, ?);
-    """
-    try:
-        cursor.execute(insert_dependent, (owner, repository, number, package_url))
-    except sqlite3.IntegrityError:
-        pass
+    inserter.add("dependents", ("owner", "repository", "number", "package_url"),
+                 [(owner, repository, number, package_url)])
 
 
-def insert_issues(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+def insert_issues(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert issues data in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
     issues = action_data["issues"]
     closed_issues = issues["closed"]
     open_issues = issues["open"]
-    insert_issue = """
-    INSERT INTO issues (owner, repository, closed, open)
-    VALUES (?, ?, ?, ?);
-    """
-    try:
-        cursor.execute(insert_issue, (owner, repository, closed_issues, open_issues))
-    except sqlite3.IntegrityError:
-        pass
+    inserter.add("issues", ("owner", "repository", "closed", "open"), [(owner, repository, closed_issues, open_issues)])
 
 
-def insert_versions(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+def insert_versions(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert versions data in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
     versions = action_data["versions"]
-    for version in versions:
-        date = version[0]
-        tag = version[1]
-        insert_version = """
-        INSERT INTO versions (owner, repository, date, version)
-        VALUES (?, ?, ?, ?);
-        """
-        try:
-            cursor.execute(insert_version, (owner, repository, date, tag))
-        except sqlite3.IntegrityError:
-            pass
+    inserter.add("versions", ("owner", "repository", "date", "version"),
+                 [(owner, repository, version[0], version[1]) for version in versions])
 
 
 if __name__ == "__main__":
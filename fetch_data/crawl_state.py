@@ -0,0 +1,204 @@
+"""
+Frontier of the crawl, stored in the snapshot database of "fetch_data.py".
+
+The pages and the Actions already done (or failed) are recorded per category, so an interrupted crawl resumes where it
+stopped. The data that could not be fetched for a repository is recorded too, so only that data is fetched again.
+The repository of each Action is registered for the whole crawl, so an Action listed in several categories is fetched
+by the first one only, and the others only add their category.
+Membership checks use in-memory sets loaded once from indexed tables. The tables are written by the writer thread
+("db_writer.py"), in the same transactions as the Actions.
+"""
+import sqlite3
+import threading
+
+
+class CrawlState:
+    """
+    Pages done, Actions done and Actions failed, per category, and the data left to fetch, per repository.
+    """
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        """
+        :param connection: The connection to the snapshot database.
+        """
+        cursor = connection.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_pages (
+            category TEXT,
+            page INTEGER,
+            PRIMARY KEY (category, page)
+        );
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_actions (
+            category TEXT,
+            action TEXT,
+            status TEXT,
+            PRIMARY KEY (category, action)
+        );
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_failed_keys (
+            owner TEXT,
+            repository TEXT,
+            key TEXT,
+            PRIMARY KEY (owner, repository, key)
+        );
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_registry (
+            action TEXT PRIMARY KEY,
+            owner TEXT,
+            repository TEXT
+        );
+        """)
+        connection.commit()
+
+        self.pages_done = set(cursor.execute("SELECT category, page FROM crawl_pages;"))
+        self.actions_done = set(cursor.execute("SELECT category, action FROM crawl_actions WHERE status = 'done';"))
+        self.fetched = set(cursor.execute("SELECT owner, repository, category FROM categories;"))
+        self.failed_keys = {}
+        for owner, repository, key in cursor.execute("SELECT owner, repository, key FROM crawl_failed_keys;"):
+            self.failed_keys.setdefault((owner, repository), []).append(key)
+        self.registry = {action: (owner, repository)
+                         for action, owner, repository in cursor.execute("SELECT * FROM crawl_registry;")}
+        self.claimed = set()
+        self.registry_condition = threading.Condition()
+
+    def is_action_done(self, category: str, action: str) -> bool:
+        """
+        :param category: The category of GitHub Actions.
+        :param action: The URL of the marketplace page of the Action.
+        :return: True if the Action is already saved for this category.
+        """
+        return (category, action) in self.actions_done
+
+    def is_fetched(self, owner: str, repository: str, category: str) -> bool:
+        """
+        :param owner: The owner of the repository.
+        :param repository: The name of the repository.
+        :param category: The category of GitHub Actions.
+        :return: True if the repository is already saved for this category.
+        """
+        return (owner, repository, category) in self.fetched
+
+    def get_failed_keys(self, owner: str, repository: str) -> list:
+        """
+        :param owner: The owner of the repository.
+        :param repository: The name of the repository.
+        :return: The keys of "fetch_categories" that could not be fetched for the repository.
+        """
+        return self.failed_keys.get((owner, repository), [])
+
+    def claim_action(self, action: str) -> tuple | None:
+        """
+        Get the repository of an Action already fetched in another category, or claim the Action to fetch it. If
+        another category is fetching the Action, wait for it to finish.
+
+        :param action: The URL of the marketplace page of the Action.
+        :return: The (owner, repository) of the Action if it is already fetched. Otherwise None, and the caller must
+                 call release_action.
+        """
+        with self.registry_condition:
+            while action in self.claimed:
+                self.registry_condition.wait()
+            if action in self.registry:
+                return self.registry[action]
+            self.claimed.add(action)
+            return None
+
+    def release_action(self, action: str, repository: tuple | None) -> None:
+        """
+        Release a claimed Action.
+
+        :param action: The URL of the marketplace page of the Action.
+        :param repository: The (owner, repository) of the Action if it has been fetched, None if it failed.
+        """
+        with self.registry_condition:
+            self.claimed.discard(action)
+            if repository:
+                self.registry[action] = repository
+            self.registry_condition.notify_all()
+
+    def get_pages_to_do(self, category: str, max_page_number: int) -> list:
+        """
+        :param category: The category of GitHub Actions.
+        :param max_page_number: The number of the last page.
+        :return: The numbers of the pages that are not done yet.
+        """
+        return [page for page in range(1, max_page_number + 1) if (category, page) not in self.pages_done]
+
+    def save_action(self, cursor: sqlite3.Cursor, category: str, action: str, status: str,
+                    repository: tuple | None) -> None:
+        """
+        Record the outcome of an Action, and register its repository if it is done. The caller commits, then calls
+        mark_action.
+
+        :param cursor: The cursor of the writer thread.
+        :param category: The category of GitHub Actions.
+        :param action: The URL of the marketplace page of the Action.
+        :param status: "done" or "failed".
+        :param repository: The (owner, repository) of the Action, if known.
+        """
+        cursor.execute("INSERT OR REPLACE INTO crawl_actions (category, action, status) VALUES (?, ?, ?);",
+                       (category, action, status))
+        if status == "done":
+            cursor.execute("INSERT OR IGNORE INTO crawl_registry (action, owner, repository) VALUES (?, ?, ?);",
+                           (action, repository[0], repository[1]))
+
+    def save_page(self, cursor: sqlite3.Cursor, category: str, page: int) -> None:
+        """
+        Record a listing page whose Actions are all done. The caller commits, then calls mark_page.
+
+        :param cursor: The cursor of the writer thread.
+        :param category: The category of GitHub Actions.
+        :param page: The number of the listing page.
+        """
+        cursor.execute("INSERT OR IGNORE INTO crawl_pages (category, page) VALUES (?, ?);", (category, page))
+
+    def save_failed_keys(self, cursor: sqlite3.Cursor, repository: tuple, keys: list) -> None:
+        """
+        Record the keys that could not be fetched for a repository, replacing the previous ones. The caller commits,
+        then calls mark_failed_keys.
+
+        :param cursor: The cursor of the writer thread.
+        :param repository: The (owner, repository).
+        :param keys: The keys of "fetch_categories" that could not be fetched.
+        """
+        cursor.execute("DELETE FROM crawl_failed_keys WHERE owner = ? AND repository = ?;", repository)
+        cursor.executemany("INSERT INTO crawl_failed_keys (owner, repository, key) VALUES (?, ?, ?);",
+                           [(repository[0], repository[1], key) for key in keys])
+
+    def mark_action(self, category: str, action: str, status: str, repository: tuple | None) -> None:
+        """
+        Add a committed Action to the in-memory sets.
+
+        :param category: The category of GitHub Actions.
+        :param action: The URL of the marketplace page of the Action.
+        :param status: "done" or "failed".
+        :param repository: The (owner, repository) of the Action, if done.
+        """
+        if status == "done":
+            self.actions_done.add((category, action))
+            self.fetched.add((repository[0], repository[1], category))
+
+    def mark_page(self, category: str, page: int) -> None:
+        """
+        Add a committed listing page to the in-memory sets.
+
+        :param category: The category of GitHub Actions.
+        :param page: The number of the listing page.
+        """
+        self.pages_done.add((category, page))
+
+    def mark_failed_keys(self, repository: tuple, keys: list) -> None:
+        """
+        Replace the committed keys that could not be fetched for a repository in memory.
+
+        :param repository: The (owner, repository).
+        :param keys: The keys of "fetch_categories" that could not be fetched.
+        """
+        if keys:
+            self.failed_keys[repository] = list(keys)
+        else:
+            self.failed_keys.pop(repository, None)
@@ -3,7 +3,7 @@ This script is used to analyse the data about GitHub Actions.
 """
 from cliffs_delta import cliffs_delta
 from datetime import datetime
-from fetch_data import request_to_api
+from fetch_data import API_CLIENT, request_to_api
 from packaging import version as packaging_version
 from scipy.stats import mannwhitneyu, ttest_ind
 
@@ -16,6 +16,7 @@ import re
 import seaborn
 import sqlite3
 import statistics
+import temporal_store
 import threading
 import yaml
 import yaml.constructor
@@ -141,6 +142,19 @@ def get_number_of_actions_all_files() -> tuple[list, list, list]:
     number_of_actions = []
     lists_of_actions = []
 
+    if config.temporal_path:
+        store = temporal_store.TemporalStore(config.temporal_path)
+        for date, local_number_of_actions in store.count_per_snapshot("actions"):
+            dates.append(date.replace("-", "/"))
+            number_of_actions.append(local_number_of_actions)
+
+            sqlite_connection = store.as_of(date)
+            lists_of_actions.append(get_all_actions_names(sqlite_connection.cursor()))
+            sqlite_connection.close()
+        store.close()
+
+        return dates, number_of_actions, lists_of_actions
+
     for file in files_names_main:
         sqlite_connection = sqlite3.connect(f"{files_path_main}/{file}")
         sqlite_cursor = sqlite_connection.cursor()
@@ -172,6 +186,17 @@ def get_actions_in_category() -> tuple[list[tuple[str, str]], list[dict], list[d
     list_categories_added = []
     list_categories_deleted = []
 
+    if config.temporal_path:
+        store = temporal_store.TemporalStore(config.temporal_path)
+        snapshots = store.get_snapshots()
+        for (first_id, first_date), (second_id, second_date) in zip(snapshots, snapshots[1:]):
+            dates.append((first_date.replace("-", "/"), second_date.replace("-", "/")))
+            list_categories_added.append(get_categories_changes(store, first_id, second_id, True))
+            list_categories_deleted.append(get_categories_changes(store, first_id, second_id, False))
+        store.close()
+
+        return dates, list_categories_added, list_categories_deleted
+
     for i in range(len(files_names_main) - 1):
         j = i + 1
 
@@ -218,6 +243,31 @@ def get_actions_in_category() -> tuple[list[tuple[str, str]], list[dict], list[d
     return dates, list_categories_added, list_categories_deleted
 
 
+def get_categories_changes(store: temporal_store.TemporalStore, first_id: int, second_id: int, added: bool) -> dict:
+    """
+    Count the categories added to or removed from the Actions present in two snapshots, with a single query.
+
+    :param store: The temporal store.
+    :param first_id: The id of the first snapshot.
+    :param second_id: The id of the second snapshot.
+    :param added: True to count the categories added, False to count the categories removed.
+    :return: The number of Actions for each category added or removed.
+    """
+    # an added category is valid in the second snapshot only, a removed category in the first snapshot only
+    changed = "category.valid_from > :first AND category.valid_from <= :second" if added else \
+        "category.valid_to > :first AND category.valid_to <= :second"
+    get_categories_changes_query = f"""
+    SELECT category.category, COUNT(*) FROM categories AS category
+    JOIN actions AS old ON old.owner = category.owner AND old.repository = category.repository
+        AND {temporal_store.valid_at("old", ":first")}
+    JOIN actions AS new ON new.owner = category.owner AND new.repository = category.repository
+        AND new.name IS old.name AND {temporal_store.valid_at("new", ":second")}
+    WHERE {changed}
+    GROUP BY category.category;
+    """
+    return dict(store.connection.execute(get_categories_changes_query, {"first": first_id, "second": second_id}))
+
+
 def get_number_of_actions_categories() -> tuple[list, list]:
     """
     Get the number of Actions for all categories on different dates.
@@ -227,6 +277,17 @@ def get_number_of_actions_categories() -> tuple[list, list]:
     dates = []
     values = []
 
+    if config.temporal_path:
+        store = temporal_store.TemporalStore(config.temporal_path)
+        numbers = {(date, category): number
+                   for date, category, number in store.count_per_snapshot("categories", "category")}
+        for _, date in store.get_snapshots():
+            dates.append(date.replace("-", "/"))
+            values.append([numbers.get((date, category), 0) for category in categories_main])
+        store.close()
+
+        return dates, values
+
     for file in files_names_main:
         sqlite_connection = sqlite3.connect(f"{files_path_main}/{file}")
         sqlite_cursor = sqlite_connection.cursor()
@@ -833,6 +894,7 @@ def filter_repositories_workflow_files(repositories: list) -> list:
     number_of_threads = config.rq4_number_of_threads
     number_of_threads = number_of_threads if number_of_threads > 0 else 10
     # number_of_threads = number_of_threads if number_of_threads < 11 else 4
+    API_CLIENT.resize(number_of_threads)
 
     threads = []
     yml_content = []
@@ -1660,7 +1722,8 @@ def get_triggers_in_files(workflow_files: numpy.ndarray) -> dict:
 
 if __name__ == "__main__":
     files_path_main = config.files_path
-    files_names_main = [file for file in os.listdir(files_path_main) if ".db" in file]
+    # the temporal store may be kept next to the snapshots
+    files_names_main = [file for file in os.listdir(files_path_main) if ".db" in file and "actions_data_" in file]
     files_names_main.sort()
 
     first_file_name_main = files_names_main[0]
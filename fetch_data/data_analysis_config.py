@@ -2,6 +2,9 @@
 Configuration file for "data_analysis.py"
 """
 files_path = r"D:\Master-Thesis\fetch_data\outputs\current"
+# path of the temporal store of "temporal_store.py". If set, the analyses spanning dates read it instead of opening
+# every file of files_path.
+temporal_path = None
 
 rq1 = False
 rq2 = False
@@ -0,0 +1,140 @@
+"""
+Writer thread of the snapshot database of "fetch_data.py".
+
+The workers push each crawled Action as soon as it is finished, and a marker when every Action of a listing page is
+finished. A single thread writes them in batches, with one transaction and one executemany per table for each batch
+("bulk_insert.py"). The queue is bounded, so the workers wait when SQLite falls behind and the memory does not grow
+with the size of a category.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+
+import bulk_insert
+import crawl_state
+
+
+class DatabaseWriter:
+    """
+    Bounded queue of records, written in the database by a dedicated thread.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, state: crawl_state.CrawlState, save_action,
+                 max_queued: int, batch_size: int) -> None:
+        """
+        :param connection: The connection to the snapshot database. Only the writer thread uses it.
+        :param state: The state of the crawl, updated once the records are committed.
+        :param save_action: The function adding the rows of an Action, called with the data and a bulk inserter.
+        :param max_queued: The maximum number of records waiting to be written.
+        :param batch_size: The maximum number of records written in one transaction.
+        """
+        self.connection = connection
+        self.state = state
+        self.save_action = save_action
+        self.batch_size = batch_size
+        self.inserter = bulk_insert.BulkInserter()
+        self.queue = queue.Queue(maxsize=max(1, max_queued))
+        self.thread = threading.Thread(target=self.write, name="writer", daemon=True)
+        self.thread.start()
+
+    def put_action(self, category: str, action_url: str, status: str, repository: tuple | None,
+                   action_data: dict | None) -> None:
+        """
+        Push a finished Action, waiting if the queue is full.
+
+        :param category: The category of GitHub Actions.
+        :param action_url: The URL of the marketplace page of the Action.
+        :param status: "done" or "failed".
+        :param repository: The (owner, repository) of the Action, if known.
+        :param action_data: The data to save in the database, if the Action has been accepted.
+        """
+        self.queue.put(("action", category, action_url, status, repository, action_data))
+
+    def put_page(self, category: str, page: int, page_done: bool) -> None:
+        """
+        Push a finished listing page, after all its Actions.
+
+        :param category: The category of GitHub Actions.
+        :param page: The number of the listing page.
+        :param page_done: True if no Action of the page failed.
+        """
+        self.queue.put(("page", category, page, page_done))
+
+    def write(self) -> None:
+        """
+        Main loop of the writer thread.
+        """
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.write_batch([record for record in batch if record is not None])
+            except Exception:
+                # nothing of the batch is recorded in the crawl state, it is crawled again on the next run. Any error is
+                # caught: without the thread, nothing would empty the queue and the workers would wait forever
+                logging.exception(f"Writing {len(batch)} records failed")
+                self.inserter.rows = {}
+                self.connection.rollback()
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+            if batch[-1] is None:
+                return
+
+    def write_batch(self, batch: list) -> None:
+        """
+        Write a batch of records in one transaction, then record them in the crawl state.
+
+        :param batch: The records.
+        """
+        cursor = self.connection.cursor()
+        for record in batch:
+            if record[0] == "action":
+                category, action_url, status, repository, action_data = record[1:]
+                if action_data:
+                    self.save_action(action_data, self.inserter)
+                    self.state.save_failed_keys(cursor, repository, action_data["failed_keys"])
+                self.state.save_action(cursor, category, action_url, status, repository)
+            else:
+                category, page, page_done = record[1:]
+                if page_done:
+                    self.state.save_page(cursor, category, page)
+        self.inserter.flush(self.connection)
+
+        for record in batch:
+            if record[0] == "action":
+                category, action_url, status, repository, action_data = record[1:]
+                self.state.mark_action(category, action_url, status, repository)
+                if action_data:
+                    self.state.mark_failed_keys(repository, action_data["failed_keys"])
+            elif record[3]:
+                self.state.mark_page(record[1], record[2])
+
+    def flush(self) -> None:
+        """
+        Wait until every pushed record has been written.
+        """
+        self.queue.join()
+        self.log_rate()
+
+    def close(self) -> None:
+        """
+        Write the remaining records and stop the writer thread.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self.log_rate()
+
+    def log_rate(self) -> None:
+        """
+        Log the number of rows written and the write rate.
+        """
+        logging.info(f"Writer: {self.inserter.inserted_rows} rows written, "
+                     f"{round(self.inserter.get_rate())} rows/second")
@@ -0,0 +1,185 @@
+"""
+Extraction of the data of the pages of GitHub in "fetch_data.py".
+
+The XPath expressions and the regular expressions are compiled once at import instead of once per page. The extract_*
+functions take the raw body of a page and return only small records of plain values, so they can run in the worker
+processes of "parse_executor.py" without the global state of "fetch_data.py".
+"""
+from lxml import etree, html
+
+import re
+
+
+# marketplace listing pages, the results of the XPath expressions are plain strings, not linked to the parsed page
+CATEGORIES_XPATH = etree.XPath('//*[@id="js-pjax-container"]/div[2]/div[1]/nav/ul[2]/li/a/text()', smart_strings=False)
+PAGES_NUMBERS_XPATH = etree.XPath('//*[@id="js-pjax-container"]/div[2]/div[1]/div[3]/div/a[not(@class="next_page")] | '
+                                  '//*[@id="js-pjax-container"]/div[2]/div[1]/div[3]/div/em')
+ACTIONS_URLS_XPATH = etree.XPath("//div[@class='d-md-flex flex-wrap mb-4']/a/@href", smart_strings=False)
+ACTIONS_NAMES_PATTERN = re.compile('<h3 class="h4">.*</h3>')
+
+# marketplace pages of the Actions
+REPOSITORY_LINK_XPATH = etree.XPath('//h5[normalize-space(text())="Links"]/following-sibling::a[1]/@href',
+                                    smart_strings=False)
+VERIFIED_XPATH = etree.XPath('//*[text()[contains(., "Verified creator")]]')
+DISPLAY_NAME_XPATH = etree.XPath('normalize-space(//h1)')
+
+# dependents pages
+IS_PACKAGES_XPATH = etree.XPath('//*[@id="dependents"]/details/summary/i/text()', smart_strings=False)
+PACKAGES_XPATH = etree.XPath('//*[@id="dependents"]/details/details-menu/div[2]/a/@href', smart_strings=False)
+DEPENDENTS_NUMBER_XPATH = etree.XPath('//*[@id="dependents"]/div[3]/div[1]/div/div/a[1]/text()', smart_strings=False)
+DEPENDENTS_NUMBER_PATTERN = re.compile(r'dependent_type=REPOSITORY[^>]*>(.*?)</a>', re.DOTALL)
+
+# text cleaning
+NOT_LETTER_PATTERN = re.compile(r'[^a-zA-Z ]')
+SPACES_PATTERN = re.compile(r" {2,}")
+WHITESPACES_PATTERN = re.compile(r"\s{2,}")
+TAG_PATTERN = re.compile(r'<[^>]*>')
+DIGITS_PATTERN = re.compile(r'\d+')
+NOT_NAME_PATTERN = re.compile("[^0-9a-zA-Z_-]")
+DASHES_PATTERN = re.compile("-{2,}")
+
+
+def get_text(content: str | bytes, encoding: str | None = None) -> str:
+    """
+    Decode the body of a response.
+
+    :param content: The body, as text or as raw bytes.
+    :param encoding: The encoding of the raw bytes, UTF-8 if unknown.
+    :return: The body as text.
+    """
+    if isinstance(content, str):
+        return content
+    return content.decode(encoding or "utf-8", errors="replace")
+
+
+def parse(content: str | bytes, encoding: str | None = None) -> html.HtmlElement:
+    """
+    Parse a page in a single pass. The XPaths used on the result must not depend on the whitespaces of the page.
+
+    :param content: The body of the page, as text or as raw bytes.
+    :param encoding: The encoding of the raw bytes.
+    :return: The root of the parsed HTML.
+    """
+    return html.fromstring(get_text(content, encoding))
+
+
+def get_max_page_number(root: html.HtmlElement) -> int:
+    """
+    Get the number of the last page from a parsed marketplace listing page.
+
+    :param root: The parsed listing page.
+    :return: The number of the last page. Returns 0 if there is no Actions in this category.
+    """
+    numbers = PAGES_NUMBERS_XPATH(root)
+    last_index = len(numbers) - 1
+
+    if last_index > 0:
+        max_page = WHITESPACES_PATTERN.sub('', numbers[last_index].text)
+        return int(max_page)
+    else:
+        return 0
+
+
+def get_repository_link(root: html.HtmlElement) -> str | None:
+    """
+    Get the link to the GitHub repository from a parsed marketplace page.
+
+    :param root: The parsed marketplace page.
+    :return: The URL of the GitHub page, or None if there is no link.
+    """
+    url = REPOSITORY_LINK_XPATH(root)
+    if url:
+        return url[0]
+    return None
+
+
+def get_verified(root: html.HtmlElement) -> bool:
+    """
+    Determine if it is a GitHub action developed by a verified user.
+
+    :param root: The parsed marketplace page.
+    :return: True if it is a verified Action and False otherwise.
+    """
+    verified = VERIFIED_XPATH(root)
+
+    return True if verified else False
+
+
+def get_display_name(root: html.HtmlElement) -> str | None:
+    """
+    Get the name of the Action as displayed on its marketplace page.
+
+    :param root: The parsed marketplace page.
+    :return: The displayed name, or None if there is no title.
+    """
+    display_name = DISPLAY_NAME_XPATH(root)
+
+    return str(display_name) if display_name else None
+
+
+def get_number(text: str) -> int:
+    """
+    Get the number written in a text, with its thousands separators.
+
+    :param text: The text.
+    :return: The number, 0 if there is none.
+    """
+    digits = DIGITS_PATTERN.findall(text)
+    return int("".join(digits)) if digits else 0
+
+
+def get_dependents_number(root: html.HtmlElement) -> int:
+    """
+    Get the number of dependents on a page.
+
+    :param root: The html where the dependents are located.
+    :return: The number of dependents.
+    """
+    return get_number("".join(DEPENDENTS_NUMBER_XPATH(root)))
+
+
+def extract_max_page(content: str | bytes, encoding: str | None = None) -> int:
+    """
+    :param content: The body of the first listing page of a category.
+    :param encoding: The encoding of the raw bytes.
+    :return: The number of the last page. Returns 0 if there is no Actions in this category.
+    """
+    return get_max_page_number(parse(content, encoding))
+
+
+def extract_listing(content: str | bytes, encoding: str | None = None) -> tuple[list, list]:
+    """
+    :param content: The body of a listing page.
+    :param encoding: The encoding of the raw bytes.
+    :return: The names of the Actions, as found on the page, and the URLs of their marketplace pages.
+    """
+    text = get_text(content, encoding)
+    return ACTIONS_NAMES_PATTERN.findall(text), ACTIONS_URLS_XPATH(parse(text))
+
+
+def extract_marketplace_page(content: str | bytes, encoding: str | None = None) -> tuple[str | None, bool, str | None]:
+    """
+    :param content: The body of the marketplace page of an Action.
+    :param encoding: The encoding of the raw bytes.
+    :return: The link to the repository, whether the creator is verified, and the displayed name.
+    """
+    root = parse(content, encoding)
+    return get_repository_link(root), get_verified(root), get_display_name(root)
+
+
+def extract_dependents_page(content: str | bytes, encoding: str | None = None) -> tuple[list, int] | None:
+    """
+    :param content: The body of a dependents page.
+    :param encoding: The encoding of the raw bytes.
+    :return: The URLs of the dependents pages of the packages, and the number of dependents. None if the page cannot
+             be parsed.
+    """
+    try:
+        root = parse(content, encoding)
+    except etree.ParserError:
+        return None
+
+    packages = []
+    if IS_PACKAGES_XPATH(root):
+        packages = ["https://github.com" + package_url for package_url in PACKAGES_XPATH(root)]
+    return packages, get_dependents_number(root)
@@ -5,33 +5,77 @@ You will need to use Python3.10.
 """
 import json.decoder
 
-from bs4 import BeautifulSoup
 from datetime import datetime
 from html import unescape
-from lxml import html, etree
-from ratelimit import limits, sleep_and_retry
-
+from lxml import html
+
+import api_client
+import concurrent.futures
+import bulk_insert
+import cassette
+import crawl_state
+import db_writer
+import extractors
 import fetch_data_config as config
+import http_cache
 import logging
+import metrics
 import numpy
 import os
-import re
+import parse_executor
+import rate_control
 import requests
 import requests.adapters
+import snapshot_history
 import sqlite3
+import temporal_store
 import threading
 import time
-
-
-GITHUB_TOKENS = config.tokens
-CURRENT_TOKEN = GITHUB_TOKENS[0]
-LIMIT = config.limit_requests
+import token_pool
+import typing
+import urllib.parse
+import work_queue
+
+
+METRICS = metrics.Metrics()
+TOKEN_POOL = token_pool.TokenPool(config.tokens, METRICS)
+HTML_CONTROLLER = rate_control.AdaptiveController("github.com", config.rate_control, config.limit_requests, METRICS)
+API_CONTROLLER = rate_control.AdaptiveController("api.github.com", config.rate_control, config.limit_requests,
+                                                 METRICS)
+ADAPTER_CLASS = cassette.get_adapter_class(config.cassette, config.simulator)
+API_CLIENT = api_client.ApiClient(config.api_client["pool_size"], config.api_client["retries"],
+                                  config.api_client["backoff_factor"], ADAPTER_CLASS)
+# a recorded or replayed crawl must see the answers of the server, not the ones of the cache
+HTTP_CACHE = http_cache.HttpCache(config.http_cache["path"], config.http_cache["max_bytes"],
+                                  config.http_cache["ttl"], config.http_cache["commit_every"],
+                                  config.http_cache["commit_interval"]) if config.http_cache["run"] and \
+    config.cassette["mode"] == "off" else None
 SESSION = requests.Session()
 SESSION.cookies['user_session'] = os.getenv("CONNECTION_COOKIE")
-T_R = 0
-ACTION_ACCEPTED = True
+SESSION.mount("https://", ADAPTER_CLASS())
+SESSION.mount("http://", ADAPTER_CLASS())
 CURRENT_DATE = datetime.strftime(datetime.now(), "%Y_%m_%d")
 NUMBER_OF_ACCEPTED_ACTIONS = 0
+GRAPHQL_KEYS = ["versions", "stars", "watchers", "forks", "issues"]
+# the paginated connections of the GraphQL keys, and the fields of their nodes
+CONNECTIONS = {"versions": "releases", "issues": "issues"}
+CONNECTIONS_NODES = {"versions": "tag { name } publishedAt createdAt", "issues": "state createdAt closedAt"}
+# asked with every GraphQL query, to keep the budget of each token up to date
+RATE_LIMIT_QUERY = "rateLimit { cost remaining resetAt }"
+# in incremental mode, the newest releases are fetched first, until one created before the previous crawl is reached
+HISTORY_ORDER = "orderBy: {field: CREATED_AT, direction: DESC}"
+DEPENDENTS_EXECUTOR = concurrent.futures.ThreadPoolExecutor(config.fetch_data["dependents_fan_out"],
+                                                            thread_name_prefix="dependents")
+API_PAGES_EXECUTOR = concurrent.futures.ThreadPoolExecutor(config.fetch_data["api_pages_fan_out"],
+                                                            thread_name_prefix="api_pages")
+ENRICHMENT_EXECUTOR = concurrent.futures.ThreadPoolExecutor(config.fetch_data["enrichment_fan_out"],
+                                                             thread_name_prefix="enrichment")
+# (owner, repository) -> True if the link to the repository is valid
+LINK_CACHE = {}
+# started by fetch_data_multithread, the pages are parsed in the calling threads until then
+PARSE_EXECUTOR = parse_executor.ParseExecutor()
+# opened by fetch_data_multithread in incremental mode
+HISTORY = snapshot_history.SnapshotHistory()
 
 
 def get_categories() -> None:
@@ -48,14 +92,14 @@ def get_categories() -> None:
         logging.error("Not supposed to happen...")
         exit()
 
-    root = beautiful_html(request.text)
+    root = parse_html(request.text)
 
-    result = root.xpath('//*[@id="js-pjax-container"]/div[2]/div[1]/nav/ul[2]/li/a/text()')
-
-    pattern = re.compile(r'[^a-zA-Z ]')
+    result = extractors.CATEGORIES_XPATH(root)
 
     for li in result:
-        category = re.sub(re.compile(r" {2,}"), '', re.sub(pattern, '', li).lower()).replace(' ', '-')
+        li = " ".join(li.split())
+        category = extractors.NOT_LETTER_PATTERN.sub('', li).lower()
+        category = extractors.SPACES_PATTERN.sub('', category).replace(' ', '-')
         save_categories.append(category)
 
     logging.info(f"Categories: \n{save_categories}")
@@ -69,45 +113,29 @@ def get_categories() -> None:
     numpy.save("categories.npy", save_categories)
 
 
-@sleep_and_retry
-@limits(calls=LIMIT, period=60.0)
 def get_request(function: str, url: str) -> requests.Response | None:
     """
     Send a request to a webpage and returns the response.
 
-    :param function: The name of the calling function.
+    :param function: The name of the calling function, used as the endpoint in the metrics.
     :param url: The url to connect to.
     :return: The response. If error 404, returns None.
     """
-    global T_R
     global SESSION
 
     sleep_time = 30
 
     while True:
         try:
-            request = SESSION.get(url)
-            T_R += 1
-
-            if T_R % config.limit_requests == 0:
-                logging.info(f"request {T_R}")
+            request = send_html(url, function)
 
             counter = 5
 
             while counter > 0 and request.status_code != 200:
                 if request.status_code == 429:
-                    logging.info(">" + str(T_R))
-                    logging.info(
-                        f"{function} - sleeping " + str(int(request.headers["Retry-After"]) + 0.3) + " seconds")
-                    time.sleep(int(request.headers["Retry-After"]) + 0.3)
-                    logging.info(f"{function} - sleeping finished")
-
-                    time.sleep(3)
-                    request = SESSION.get(url)
-                    T_R += 1
-
-                    if T_R % config.limit_requests == 0:
-                        logging.info(f"request {T_R}")
+                    # the controller pauses every worker until Retry-After and lowers the limits
+                    logging.info(f"{function} - throttled")
+                    request = send_html(url, function)
 
                 elif request.status_code == 404 and counter == 1:
                     return None
@@ -121,29 +149,103 @@ def get_request(function: str, url: str) -> requests.Response | None:
             SESSION = requests.Session()
             SESSION.cookies['user_session'] = os.getenv("CONNECTION_COOKIE")
             try:
-                threads = max(10, number_of_threads)
+                pool_size = get_pool_size(max(10, number_of_threads))
             except NameError:
-                threads = 10
-            adapter = requests.adapters.HTTPAdapter(pool_connections=threads, pool_maxsize=threads)
+                pool_size = get_pool_size(10)
+            adapter = ADAPTER_CLASS(pool_connections=pool_size, pool_maxsize=pool_size)
             SESSION.mount("https://", adapter)
             SESSION.mount("http://", adapter)
+            METRICS.inc("crawl_sleep_seconds_total", sleep_time, reason="connection error")
             time.sleep(sleep_time)
 
     return request
 
 
-def beautiful_html(request_text: str) -> html.document_fromstring:
+def send_html(url: str, endpoint: str) -> requests.Response:
+    """
+    Send a GET request to a webpage through the HTTP cache, within the limits of the rate controller.
+
+    :param url: The url to connect to.
+    :param endpoint: The logical endpoint of the request, for the metrics.
+    :return: The response.
+    """
+    return send_cached(lambda headers: HTML_CONTROLLER.send(
+        lambda: send_measured(lambda: SESSION.get(url, headers=headers), endpoint)), url)
+
+
+def send_measured(send_request, endpoint: str, streamed: bool = False) -> requests.Response:
+    """
+    Send a request and record its latency, its status code and its size in the metrics.
+    The answers served by the HTTP cache are not sent, so they are not recorded.
+
+    :param send_request: The function sending the request.
+    :param endpoint: The logical endpoint of the request.
+    :param streamed: True if the body is streamed. Its size is then recorded by the caller reading it.
+    :return: The response.
+    """
+    start = time.perf_counter()
+    try:
+        response = send_request()
+    except Exception:
+        METRICS.inc("crawl_request_errors_total", endpoint=endpoint)
+        raise
+    finally:
+        METRICS.observe("crawl_request_duration_seconds", time.perf_counter() - start, endpoint=endpoint)
+
+    METRICS.inc("crawl_requests_total", endpoint=endpoint, code=response.status_code)
+    if rate_control.is_throttled(response):
+        METRICS.inc("crawl_throttled_total", endpoint=endpoint)
+    if not streamed:
+        METRICS.inc("crawl_response_bytes_total", len(response.content), endpoint=endpoint)
+    return response
+
+
+def send_cached(send_request, url: str, headers: dict | None = None, body: dict | None = None) -> requests.Response:
+    """
+    Send a request through the HTTP cache if it is enabled.
+
+    :param send_request: The function sending the request, called with the headers to use.
+    :param url: The URL of the request.
+    :param headers: The headers of the request.
+    :param body: The JSON body of the request, for GraphQL queries.
+    :return: The response.
+    """
+    if HTTP_CACHE is None:
+        return send_request(headers)
+    return HTTP_CACHE.send(send_request, url, headers, body)
+
+
+def close_http_cache() -> None:
     """
-    Parse the HTML response and prettify it.
+    Commit the last entries of the HTTP cache, if it is enabled.
+    """
+    if HTTP_CACHE is not None:
+        HTTP_CACHE.close()
+
+
+def parse_html(request_text: str) -> html.HtmlElement:
+    """
+    Parse the HTML response in a single pass.
+    The XPaths used on the result must not depend on the whitespaces of the page.
 
     :param request_text: The HTML response as text.
-    :return: A prettified version of the HTML. It is a html.document_fromstring object.
+    :return: The root of the parsed HTML.
     """
-    soup = BeautifulSoup(request_text, 'html.parser')
-    pretty_soup = soup.prettify()
-    root = html.fromstring(pretty_soup)
+    with metrics.Timer(METRICS, "crawl_parse_duration_seconds"):
+        return html.fromstring(request_text)
+
 
-    return root
+def extract_page(extractor: typing.Callable, content: str | bytes, encoding: str | None = None) -> typing.Any:
+    """
+    Extract the data of a page, in the pool of parsing processes if it is enabled.
+
+    :param extractor: An extract_* function of "extractors.py".
+    :param content: The body of the page, as raw bytes or as text.
+    :param encoding: The encoding of the raw bytes.
+    :return: The record extracted from the page.
+    """
+    with metrics.Timer(METRICS, "crawl_parse_duration_seconds"):
+        return PARSE_EXECUTOR.run(extractor, content, encoding)
 
 
 def fetch_data_multithread() -> None:
@@ -152,10 +254,97 @@ def fetch_data_multithread() -> None:
     """
     global number_of_threads
     categories = numpy.load("categories.npy")
+    # before any other thread is started, so the parsing processes are forked cleanly
+    PARSE_EXECUTOR.start(config.fetch_data["parse_processes"])
+    if config.incremental["run"]:
+        HISTORY.open(config.incremental["directory"], file_name_main, config.incremental["margin_days"])
 
-    sqlite_connection = sqlite3.connect(file_name_main)
+    sqlite_connection = sqlite3.connect(file_name_main, check_same_thread=False)
+    bulk_insert.open_bulk(sqlite_connection)
     sqlite_cursor = sqlite_connection.cursor()
 
+    create_tables(sqlite_cursor)
+    sqlite_connection.commit()
+
+    state = crawl_state.CrawlState(sqlite_connection)
+    writer = db_writer.DatabaseWriter(sqlite_connection, state, save_action, config.fetch_data["writer_queue_size"],
+                                      config.fetch_data["writer_batch_size"])
+    if config.metrics["run"]:
+        METRICS.start(config.metrics["path"], config.metrics["interval"])
+
+    if config.fetch_data["engine"] == "asyncio":
+        import async_fetch_data
+
+        if config.cassette["mode"] in ("record", "replay", "simulate"):
+            logging.warning(f"The asyncio engine does not support the {config.cassette['mode']} mode of the cassette, "
+                            f"use the server mode")
+        async_fetch_data.fetch_data_async(categories, state, writer)
+        writer.close()
+        bulk_insert.close_bulk(sqlite_connection)
+        PARSE_EXECUTOR.close()
+        HISTORY.close()
+        close_http_cache()
+        if config.metrics["run"]:
+            METRICS.stop(config.metrics["path"])
+        return
+
+    logging.info("Fetching the data")
+    number_of_threads = get_number_of_threads()
+
+    pool_size = get_pool_size(number_of_threads)
+    adapter = ADAPTER_CLASS(pool_connections=pool_size, pool_maxsize=pool_size)
+    SESSION.mount("https://", adapter)
+    SESSION.mount("http://", adapter)
+    API_CLIENT.resize(pool_size)
+
+    progress = {}
+    pool = work_queue.WorkerPool(number_of_threads, lambda item: handle_work_item(item, pool, state, writer, progress))
+    for category in categories:
+        progress[category] = {"max_page": 0, "accepted": False, "refused_counter": 10}
+        pool.submit(("category", category))
+    pool.join()
+    writer.flush()
+
+    while True:
+        retries = []
+        for category in categories:
+            pages_to_do = state.get_pages_to_do(category, progress[category]["max_page"])
+            if not pages_to_do:
+                continue
+            if progress[category]["accepted"]:
+                progress[category]["refused_counter"] = 10
+            else:
+                progress[category]["refused_counter"] -= 1
+            if progress[category]["refused_counter"] > 0:
+                retries.append((category, pages_to_do))
+
+        if not retries:
+            break
+
+        for category, pages_to_do in retries:
+            print("\n" + "*" * 10 + f" loop {category} / {progress[category]['refused_counter']}")
+            progress[category]["accepted"] = False
+            for page in pages_to_do:
+                pool.submit(("page", category, page))
+        pool.join()
+        writer.flush()
+
+    pool.close()
+    writer.close()
+    bulk_insert.close_bulk(sqlite_connection)
+    PARSE_EXECUTOR.close()
+    HISTORY.close()
+    close_http_cache()
+    if config.metrics["run"]:
+        METRICS.stop(config.metrics["path"])
+
+
+def create_tables(sqlite_cursor: sqlite3.Cursor) -> None:
+    """
+    Create the tables of the database if they do not exist yet.
+
+    :param sqlite_cursor: The cursor used to create the tables.
+    """
     sqlite_create_main_table = """
     CREATE TABLE IF NOT EXISTS actions (
         forks INTEGER,
@@ -223,224 +412,112 @@ def fetch_data_multithread() -> None:
     for query in sqlite_queries:
         sqlite_cursor.execute(query)
 
-    sqlite_connection.commit()
-
-    logging.info("Fetching the data")
-    for category in categories:
-        global ACTION_ACCEPTED
-        global NUMBER_OF_ACCEPTED_ACTIONS
-        ACTION_ACCEPTED = True
-        NUMBER_OF_ACCEPTED_ACTIONS = 0
-        logging.info(f"***** {category} *****")
-
-        max_page_number = get_max_page(category)
-
-        if max_page_number == 0:
-            ACTION_ACCEPTED = False
-
-        number_of_threads = get_number_of_threads(max_page_number)
-
-        adapter = requests.adapters.HTTPAdapter(pool_connections=number_of_threads, pool_maxsize=number_of_threads)
-        SESSION.mount("https://", adapter)
-        SESSION.mount("http://", adapter)
-
-        refused_counter = 10
-
-        while ACTION_ACCEPTED and refused_counter > 0:
-            print("\n" + "*" * 10 + f" loop {category} / {refused_counter}")
-            ACTION_ACCEPTED = False
-            threads = []
-
-            already_fetched = sqlite_cursor.execute("SELECT owner, repository, category FROM categories;").fetchall()
-            save_data = {}
-
-            if number_of_threads > 0:
-                for i in range(0, number_of_threads):
-                    list_of_pages = [x for x in range(1, max_page_number + 1) if x % number_of_threads == i]
-                    list_of_pages.sort()
-                    threads.append(threading.Thread(target=thread_data,
-                                                    args=(list_of_pages, category, save_data, already_fetched),
-                                                    name=f"thread_{i}"))
-
-                for thread in threads:
-                    thread.start()
 
-                for thread in threads:
-                    thread.join()
-
-            for action in save_data:
-                owner = save_data[action]["owner"]
-                repository = save_data[action]["repository"]
-                insert_actions(save_data[action], sqlite_cursor, owner, repository)
-                insert_categories(save_data[action], sqlite_cursor, owner, repository)
-                insert_contributors(save_data[action], sqlite_cursor, owner, repository)
-                insert_dependents(save_data[action], sqlite_cursor, owner, repository)
-                insert_issues(save_data[action], sqlite_cursor, owner, repository)
-                insert_versions(save_data[action], sqlite_cursor, owner, repository)
-                sqlite_connection.commit()
-
-            if not ACTION_ACCEPTED:
-                ACTION_ACCEPTED = True
-                refused_counter -= 1
-            else:
-                refused_counter = 10
+def save_action(action_data: dict, inserter: bulk_insert.BulkInserter) -> None:
+    """
+    Add the rows of a fetched Action to the bulk inserter.
 
-    sqlite_connection.close()
+    :param action_data: The data to save in the database.
+    :param inserter: The bulk inserter of the writer thread.
+    """
+    owner = action_data["owner"]
+    repository = action_data["repository"]
+    insert_actions(action_data, inserter, owner, repository)
+    insert_categories(action_data, inserter, owner, repository)
+    insert_contributors(action_data, inserter, owner, repository)
+    insert_dependents(action_data, inserter, owner, repository)
+    insert_issues(action_data, inserter, owner, repository)
+    insert_versions(action_data, inserter, owner, repository)
 
 
-def insert_actions(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+def insert_actions(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert basic information in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
-    if "forks" in action_data.keys():
-        forks = action_data["forks"]
-    if "name" in action_data.keys():
-        name = action_data["name"]
-    if "stars" in action_data.keys():
-        stars = ["stars"]
-    if "verified" in action_data.keys():
-        verified = 0 if action_data["verified"] else 1
-    if "watchers" in action_data.keys():
-        watchers = action_data["watchers"]
-    insert_main = """
-    INSERT INTO actions (forks, name, owner, repository, stars, verified, watchers)
-    VALUES (?, ?, ?, ?, ?, ?, ?);
-    """
-    try:
-        cursor.execute(insert_main, (forks, name, owner, repository, stars, verified, watchers))
-    except (sqlite3.IntegrityError, UnboundLocalError):
-        pass
+    # an Action missing one of the fields has no row in the actions table
+    if any(key not in action_data for key in ("forks", "name", "stars", "verified", "watchers")):
+        return
+    verified = 0 if action_data["verified"] else 1
+    inserter.add("actions", ("forks", "name", "owner", "repository", "stars", "verified", "watchers"),
+                 [(action_data["forks"], action_data["name"], owner, repository, action_data["stars"], verified,
+                   action_data["watchers"])])
 
 
-def insert_categories(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+def insert_categories(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert categories information in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
-    category = action_data["category"]
-    insert_category = """
-    INSERT INTO categories (owner, repository, category)
-    VALUES (?, ?, ?);
-    """
-    try:
-        cursor.execute(insert_category, (owner, repository, category))
-    except sqlite3.IntegrityError:
-        pass
+    inserter.add("categories", ("owner", "repository", "category"), [(owner, repository, action_data["category"])])
 
 
-def insert_contributors(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+def insert_contributors(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert the contributors data in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
     if "contributors" in action_data.keys():
-        contributors = action_data["contributors"]
-        for contributor in contributors:
-            insert_contributor = """
-            INSERT INTO contributors (owner, repository, contributor)
-            VALUES (?, ?, ?);
-            """
-            try:
-                cursor.execute(insert_contributor, (owner, repository, contributor))
-            except sqlite3.IntegrityError:
-                pass
+        inserter.add("contributors", ("owner", "repository", "contributor"),
+                     [(owner, repository, contributor) for contributor in action_data["contributors"]])
 
 
-def insert_dependents(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+def insert_dependents(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert dependents data in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
     if "dependents" in action_data.keys():
         dependents = action_data["dependents"]
-        number = dependents["number"]
-        package_url = dependents["package_url"]
-        insert_dependent = """
-        INSERT INTO dependents (owner, repository, number, package_url)
-        VALUES (?, ?, ?, ?);
-        """
-        try:
-            cursor.execute(insert_dependent, (owner, repository, number, package_url))
-        except sqlite3.IntegrityError:
-            pass
+        inserter.add("dependents", ("owner", "repository", "number", "package_url"),
+                     [(owner, repository, dependents["number"], dependents["package_url"])])
 
 
-def insert_issues(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+def insert_issues(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert issues data in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
     if "issues" in action_data.keys():
         issues = action_data["issues"]
-        if len(issues) == 0:
-            state = None
-            created = None
-            closed = None
-            insert_issue = """
-            INSERT INTO issues (owner, repository, state, created, closed)
-            VALUES (?, ?, ?, ?, ?);
-            """
-            try:
-                cursor.execute(insert_issue, (owner, repository, state, created, closed))
-            except sqlite3.IntegrityError:
-                pass
-        for issue in issues:
-            state = issue[0]
-            created = issue[1]
-            closed = issue[2]
-            insert_issue = """
-            INSERT INTO issues (owner, repository, state, created, closed)
-            VALUES (?, ?, ?, ?, ?);
-            """
-            try:
-                cursor.execute(insert_issue, (owner, repository, state, created, closed))
-            except sqlite3.IntegrityError:
-                pass
+        # a repository without issues is recorded with an empty row
+        rows = [(owner, repository, issue[0], issue[1], issue[2]) for issue in issues] or \
+            [(owner, repository, None, None, None)]
+        inserter.add("issues", ("owner", "repository", "state", "created", "closed"), rows)
 
 
-def insert_versions(action_data: dict, cursor: sqlite3.Cursor, owner: str, repository: str) -> None:
+def insert_versions(action_data: dict, inserter: bulk_insert.BulkInserter, owner: str, repository: str) -> None:
     """
     Insert versions data in the database.
 
     :param action_data: The data to insert.
-    :param cursor: The cursor used to add the data.
+    :param inserter: The bulk inserter used to add the data.
     :param owner: The name of the owner.
     :param repository: The name of the repository.
     """
     if "versions" in action_data.keys():
-        versions = action_data["versions"]
-        for version in versions:
-            date = version[0]
-            tag = version[1]
-            insert_version = """
-            INSERT INTO versions (owner, repository, date, version)
-            VALUES (?, ?, ?, ?);
-            """
-            try:
-                cursor.execute(insert_version, (owner, repository, date, tag))
-            except sqlite3.IntegrityError:
-                pass
+        inserter.add("versions", ("owner", "repository", "date", "version"),
+                     [(owner, repository, version[0], version[1]) for version in action_data["versions"]])
 
 
 def get_max_page(category: str) -> int:
@@ -454,38 +531,23 @@ def get_max_page(category: str) -> int:
 
     request = get_request("get_max_page", url)
 
-    page_xpath_0 = '//*[@id="js-pjax-container"]/div[2]/div[1]/div[3]/div/a[not(@class="next_page")]'
-    page_xpath_1 = '//*[@id="js-pjax-container"]/div[2]/div[1]/div[3]/div/em'
-    page_xpath = f'{page_xpath_0} | {page_xpath_1}'
-
-    root = beautiful_html(request.text)
-    numbers = root.xpath(page_xpath)
-    last_index = len(numbers) - 1
+    max_page = extract_page(extractors.extract_max_page, request.content, request.encoding)
+    logging.info("Number of pages: " + str(max_page))
+    return max_page
 
-    if last_index > 0:
-        max_page = re.sub(re.compile(r"\s{2,}"), '', numbers[last_index].text)
-        logging.info("Number of pages: " + str(max_page))
-        return int(max_page)
-    else:
-        logging.info("Number of pages: " + str(0))
-        return 0
 
-
-def get_number_of_threads(max_page_number: int) -> int:
+def get_number_of_threads() -> int:
     """
     Fetching the number of threads to use.
 
-    :param max_page_number: The number of pages on the GitHub marketplace.
     :return: The number of threads to use.
     """
     num_of_threads = config.fetch_data["max_threads"]
     try:
         num_of_threads = int(num_of_threads)
-        # the point here is not to allow more threads then the number of pages
-        if num_of_threads > max_page_number:
-            num_of_threads = max_page_number
+        # the workers are shared by every category, at least one is needed
         if num_of_threads < 1:
-            num_of_threads = 0
+            num_of_threads = 1
     except ValueError:
         logging.error("Bad number of threads in configuration file.\nBad value is " + num_of_threads)
         num_of_threads = 19  # this value has been chosen because "trust me".
@@ -494,87 +556,280 @@ def get_number_of_threads(max_page_number: int) -> int:
     return num_of_threads
 
 
-def thread_data(pages: list, category: str, save_data: dict, already_fetched: list) -> None:
+def get_pool_size(number_of_threads: int) -> int:
+    """
+    Get the number of connections to keep alive per host: the requests are sent by the workers, and by the threads
+    of the executors of the enrichment, of the REST API pages and of the dependents pages.
+
+    :param number_of_threads: The number of workers.
+    :return: The number of connections.
     """
-    For each Action on a category:
+    return number_of_threads + config.fetch_data["enrichment_fan_out"] + config.fetch_data["api_pages_fan_out"] + \
+        config.fetch_data["dependents_fan_out"]
+
+
+class PageWork:
+    """
+    The Actions of a listing page being crawled. Each one is pushed to the writer once finished, and the page once the
+    last one is finished.
+    """
+
+    def __init__(self, category: str, page: int, number_of_actions: int) -> None:
+        """
+        :param category: The category of GitHub Actions.
+        :param page: The number of the listing page.
+        :param number_of_actions: The number of Actions to crawl on the page.
+        """
+        self.category = category
+        self.page = page
+        self.remaining = number_of_actions
+        self.page_done = True
+        self.lock = threading.Lock()
+
+    def finish_action(self, action_url: str, status: str, repository: tuple | None, action_data: dict | None,
+                      writer: db_writer.DatabaseWriter) -> None:
+        """
+        Push the outcome of an Action to the writer, and the page if it was the last one.
+
+        :param action_url: The URL of the marketplace page of the Action.
+        :param status: "done" or "failed".
+        :param repository: The (owner, repository) of the Action, if known.
+        :param action_data: The data to save in the database, if the Action has been accepted.
+        :param writer: The writer of the database.
+        """
+        writer.put_action(self.category, action_url, status, repository, action_data)
+        with self.lock:
+            if status != "done":
+                self.page_done = False
+            self.remaining -= 1
+            last_action = self.remaining == 0
+
+        if last_action:
+            writer.put_page(self.category, self.page, self.page_done)
+
+
+def handle_work_item(item: tuple, pool: work_queue.WorkerPool, state: crawl_state.CrawlState,
+                     writer: db_writer.DatabaseWriter, progress: dict) -> None:
+    """
+    Handle a work item of the crawl:
+        - ("category", category): find the pages of the category.
+        - ("page", category, page): find the Actions of a listing page.
+        - ("action", page_work, action_name_ugly, action_url): crawl an Action.
+
+    :param item: The work item.
+    :param pool: The pool of workers, to submit the new work items.
+    :param state: The state of the crawl.
+    :param writer: The writer of the database.
+    :param progress: The maximum page and whether an Action has been accepted, per category.
+    """
+    if item[0] == "category":
+        category = item[1]
+        logging.info(f"***** {category} *****")
+        progress[category]["max_page"] = get_max_page(category)
+        for page in state.get_pages_to_do(category, progress[category]["max_page"]):
+            pool.submit(("page", category, page))
+
+    elif item[0] == "page":
+        process_page(item[1], item[2], pool, state, writer)
+
+    else:
+        page_work, action_name_ugly, action_url = item[1:]
+        try:
+            status, repository, action_data = crawl_action(page_work.category, action_name_ugly, action_url, state)
+        except Exception:
+            logging.exception(f"{action_url} failed")
+            status, repository, action_data = "failed", None, None
+        if status == "done" and action_data:
+            progress[page_work.category]["accepted"] = True
+        METRICS.inc("crawl_actions_total", status=status if status == "failed" or action_data else "skipped")
+        page_work.finish_action(action_url, status, repository, action_data, writer)
+
+
+def process_page(category: str, page: int, pool: work_queue.WorkerPool, state: crawl_state.CrawlState,
+                 writer: db_writer.DatabaseWriter) -> None:
+    """
+    Submit a work item for each Action of a listing page that is not done yet.
+
+    :param category: The category of GitHub Actions.
+    :param page: The number of the listing page.
+    :param pool: The pool of workers, to submit the new work items.
+    :param state: The state of the crawl.
+    :param writer: The writer of the database.
+    """
+    url = f"https://github.com/marketplace?category={category}&page={page}&type=actions"
+
+    request = get_request("fetch_names", url)
+
+    actions_names_ugly, actions_urls = extract_page(extractors.extract_listing, request.content, request.encoding)
+
+    actions = [(action_name_ugly, action_url) for action_name_ugly, action_url in zip(actions_names_ugly, actions_urls)
+               if not state.is_action_done(category, action_url)]
+
+    page_work = PageWork(category, page, len(actions))
+    if not actions:
+        writer.put_page(category, page, True)
+    for action_name_ugly, action_url in actions:
+        pool.submit(("action", page_work, action_name_ugly, action_url))
+
+
+def crawl_action(category: str, action_name_ugly: str, action_url: str,
+                 state: crawl_state.CrawlState) -> tuple[str, tuple | None, dict | None]:
+    """
+    Fetch an Action, unless it has already been fetched in another category: then only its category is added.
+
+    :param category: The category of GitHub Actions.
+    :param action_name_ugly: The name of the Action, as found on the listing page.
+    :param action_url: The URL of the marketplace page of the Action.
+    :param state: The state of the crawl.
+    :return: The status ("done" or "failed"), the (owner, repository) if known, and the data to save if the Action
+             has been accepted.
+    """
+    repository = state.claim_action(action_url)
+    if repository:
+        return "done", repository, get_membership_data(category, repository, state)
+
+    status = None
+    try:
+        status, repository, action_data = fetch_action(category, action_name_ugly, action_url, state)
+        return status, repository, action_data
+    finally:
+        state.release_action(action_url, repository if status == "done" else None)
+
+
+def get_membership_data(category: str, repository: tuple, state: crawl_state.CrawlState) -> dict | None:
+    """
+    Get the data adding a category to an Action already fetched.
+
+    :param category: The category of GitHub Actions.
+    :param repository: The (owner, repository) of the Action.
+    :param state: The state of the crawl.
+    :return: The data to save, None if the category is already saved.
+    """
+    if state.is_fetched(repository[0], repository[1], category):
+        return None
+    return {'category': category, 'owner': repository[0], 'repository': repository[1], 'failed_keys': []}
+
+
+def fetch_action(category: str, action_name_ugly: str, action_url: str,
+                 state: crawl_state.CrawlState) -> tuple[str, tuple | None, dict | None]:
+    """
+    For an Action:
         - Check if it has a valid MP page.
         - If so, check if it has a valid link to a github page.
         - If so, get some data about it.
 
-    :param pages: The list of pages on which fetch the actions names.
     :param category: The category of GitHub Actions.
-    :param save_data: The data to save in the database.
-    :param already_fetched: The already fetched data.
-    """
-    actions_names_pattern = '<h3 class="h4">.*</h3>'
-    actions_names_pattern_compiled = re.compile(actions_names_pattern)
-
-    for page in pages:
-        url = f"https://github.com/marketplace?category={category}&page={page}&type=actions"
-
-        request = get_request("fetch_names", url)
-        root = beautiful_html(request.text)
-
-        actions_names_ugly = actions_names_pattern_compiled.findall(request.text)
-        actions_urls = root.xpath("//div[@class='d-md-flex flex-wrap mb-4']/a/@href")
-
-        for j in range(0, len(actions_names_ugly)):
-            action_name = format_action_name(actions_names_ugly[j])
-            mp_page, action_url = test_mp_page(actions_urls[j])
-            if mp_page:
-                owner = get_owner(action_url)
-                repository_name = get_repo_name(action_url)
-                if (owner, repository_name, category) not in already_fetched:
-                    pretty_name = f'{owner}/{repository_name}'
-                    data = test_link(action_url)
-                    if data:
-                        global ACTION_ACCEPTED
-                        global NUMBER_OF_ACCEPTED_ACTIONS
-                        NUMBER_OF_ACCEPTED_ACTIONS += 1
-                        print(f"\r{NUMBER_OF_ACCEPTED_ACTIONS} actions accepted.", end='')
-                        ACTION_ACCEPTED = True
-                        save_data[pretty_name] = {}
-                        save_data[pretty_name]['category'] = category
-                        verified = get_verified(mp_page)
-                        save_data[pretty_name]['verified'] = verified
-                        save_data[pretty_name]['owner'] = owner
-                        save_data[pretty_name]['repository'] = repository_name
-                        save_data[pretty_name]['name'] = format_action_name(actions_names_ugly[j])
-
-                        if config.fetch_categories["versions"]:
-                            versions = get_api('versions', owner, repository_name)
-                            save_data[pretty_name]['versions'] = versions
-
-                        if config.fetch_categories["dependents"]:
-                            dependents = get_dependents(owner, repository_name)
-                            save_data[pretty_name]['dependents'] = {}
-                            save_data[pretty_name]['dependents']['number'] = dependents[0]
-                            save_data[pretty_name]['dependents']['package_url'] = dependents[1]
-
-                        if config.fetch_categories["contributors"]:
-                            contributors = get_api('contributors', owner, repository_name)
-                            contributors.sort()
-                            save_data[pretty_name]['contributors'] = contributors
-
-                        if config.fetch_categories["stars"]:
-                            stars = get_api("stars", owner, repository_name)
-                            save_data[pretty_name]["stars"] = stars
-
-                        if config.fetch_categories["watchers"]:
-                            watchers = get_api("watchers", owner, repository_name)
-                            save_data[pretty_name]["watchers"] = watchers
-
-                        if config.fetch_categories["forks"]:
-                            forks = get_api("forks", owner, repository_name)
-                            save_data[pretty_name]["forks"] = forks
-
-                        if config.fetch_categories["issues"]:
-                            issues = get_api("issues", owner, repository_name)
-                            save_data[pretty_name]["issues"] = issues
-                    else:
-                        print(f"\r{action_name} refused 2.", end="\n")
-            else:
-                print(f"\r{action_name} refused 1.", end="\n")
+    :param action_name_ugly: The name of the Action, as found on the listing page.
+    :param action_url: The URL of the marketplace page of the Action.
+    :param state: The state of the crawl.
+    :return: The status ("done" or "failed"), the (owner, repository) if known, and the data to save if the Action
+             has been accepted.
+    """
+    global NUMBER_OF_ACCEPTED_ACTIONS
+
+    action_name = format_action_name(action_name_ugly)
+    mp_page = test_mp_page(action_url)
+    if not mp_page:
+        print(f"\r{action_name} refused 1.", end="\n")
+        return "failed", None, None
+
+    owner = get_owner(mp_page.link)
+    repository_name = get_repo_name(mp_page.link)
+    failed_keys = state.get_failed_keys(owner, repository_name)
+    if not failed_keys and state.is_fetched(owner, repository_name, category):
+        return "done", (owner, repository_name), None
+
+    if not test_link(mp_page.link):
+        print(f"\r{action_name} refused 2.", end="\n")
+        return "failed", None, None
+
+    NUMBER_OF_ACCEPTED_ACTIONS += 1
+    print(f"\r{NUMBER_OF_ACCEPTED_ACTIONS} actions accepted.", end='')
+    action_data = {
+        'category': category,
+        'verified': mp_page.verified,
+        'owner': owner,
+        'repository': repository_name,
+        'name': action_name,
+    }
+
+    # only the data that could not be fetched before is fetched again
+    keys = failed_keys or [key for key in config.fetch_categories if config.fetch_categories[key]]
+    repository_data, action_data['failed_keys'] = run_fetchers(keys, owner, repository_name)
+    action_data.update(repository_data)
+
+    status = "failed" if action_data['failed_keys'] else "done"
+    return status, (owner, repository_name), action_data
+
+
+def get_fetchers(keys: list) -> dict:
+    """
+    Group the keys to fetch by the fetcher getting them: all the GraphQL keys are fetched with one query.
+
+    :param keys: The keys of "fetch_categories" to fetch.
+    :return: The keys fetched by each fetcher ("graphql", "dependents" and "contributors").
+    """
+    fetchers = {}
+    graphql_keys = [key for key in GRAPHQL_KEYS if key in keys]
+    if graphql_keys:
+        fetchers["graphql"] = graphql_keys
+    for key in ("dependents", "contributors"):
+        if key in keys:
+            fetchers[key] = [key]
+    return fetchers
+
+
+def run_fetcher(fetcher: str, keys: list, owner: str, repo_name: str) -> dict | None:
+    """
+    Run a fetcher for a repository.
+
+    :param fetcher: The fetcher, as returned by get_fetchers.
+    :param keys: The keys fetched by the fetcher.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :return: The fetched data of each key, None if it could not be fetched.
+    """
+    if fetcher == "graphql":
+        return get_api_repository(keys, owner, repo_name)
+    if fetcher == "dependents":
+        dependents = get_dependents(owner, repo_name)
+        if dependents is None:
+            return None
+        return {'dependents': {'number': dependents[0], 'package_url': dependents[1]}}
+    return {'contributors': get_contributors(owner, repo_name)}
+
+
+def run_fetchers(keys: list, owner: str, repo_name: str) -> tuple[dict, list]:
+    """
+    Run the fetchers of a repository concurrently, within the enrichment timeout.
+
+    :param keys: The keys of "fetch_categories" to fetch.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :return: The fetched data of each key, and the keys that could not be fetched.
+    """
+    fetchers = get_fetchers(keys)
+    futures = {ENRICHMENT_EXECUTOR.submit(run_fetcher, fetcher, fetcher_keys, owner, repo_name): fetcher
+               for fetcher, fetcher_keys in fetchers.items()}
+    done, _ = concurrent.futures.wait(futures, timeout=config.fetch_data["enrichment_timeout"])
+
+    repository_data = {}
+    failed_keys = []
+    for future, fetcher in futures.items():
+        fetched = None
+        if future not in done:
+            logging.error(f"{owner}/{repo_name} - {fetcher} timed out")
+        elif future.exception():
+            logging.error(f"{owner}/{repo_name} - {fetcher} failed: {future.exception()!r}")
+        else:
+            fetched = future.result()
+
+        if fetched is None:
+            failed_keys += fetchers[fetcher]
+        else:
+            repository_data.update(fetched)
+
+    return repository_data, failed_keys
 
 
 def format_action_name(ugly_name: str) -> str:
@@ -587,66 +842,127 @@ def format_action_name(ugly_name: str) -> str:
     ugly_name = ugly_name.split('<h3 class="h4">')[1].split('</h3>')[0].lower()
     ugly_name = unescape(ugly_name)  # convert html code to utf-8 ex: &quot becomes "
     ugly_name = ugly_name.replace(" - ", "-").replace(" ", "-")
-    ugly_name = re.sub("[^0-9a-zA-Z_-]", "-", ugly_name)
+    ugly_name = extractors.NOT_NAME_PATTERN.sub("-", ugly_name)
 
     # Removes '-' at the beginning and the end of a name.
-    while re.search("^-.*$", ugly_name):
-        ugly_name = ugly_name[1:]
-    while re.search("^.*-$", ugly_name):
-        ugly_name = ugly_name[:-1]
+    ugly_name = ugly_name.strip("-")
 
-    ugly_name = re.sub("-{2,}", "-", ugly_name)
+    ugly_name = extractors.DASHES_PATTERN.sub("-", ugly_name)
 
     return ugly_name
 
 
-def test_mp_page(url: str) -> tuple[requests.Response, str] | tuple[None, None]:
+class MarketplacePage:
     """
-    Test if the marketplace page of an Action is accessible and returns the URL for the data if so.
+    The data of the marketplace page of an Action, extracted once and shared by the steps needing it.
+    """
+
+    def __init__(self, record: tuple, response: requests.Response | None = None) -> None:
+        """
+        :param record: The link, verified flag and displayed name extracted by extractors.extract_marketplace_page.
+        :param response: The response containing the marketplace page, if any.
+        """
+        self.response = response
+        self.link, self.verified, self.display_name = record
+
+
+def test_mp_page(url: str) -> MarketplacePage | None:
+    """
+    Test if the marketplace page of an Action is accessible and contains the URL for the data.
 
     :param url: The URL of the Action to check.
-    :return: The response and the URL of the GitHub page if the marketplace page is accessible.
-             Otherwise returns None, None.
+    :return: The parsed marketplace page if it is accessible and contains a link. Otherwise returns None.
     """
     url = f"https://github.com{url}"
     request = get_request("test_name", url)
 
     if request:
-        root = beautiful_html(request.text)
-        url = root.xpath('//h5[text()="\n          Links\n         "]/following-sibling::a[1]/@href')
-        if url:
-            return request, url[0]
-        return None, None
-    return None, None
+        mp_page = MarketplacePage(extract_page(extractors.extract_marketplace_page, request.content,
+                                               request.encoding), request)
+        if mp_page.link:
+            return mp_page
+    return None
 
 
-def test_link(url: str) -> str | None:
+def test_link(url: str) -> bool:
     """
-    Test if a link is valid and return it's content.
+    Test if the link to the repository of an Action is valid. The result is cached per repository.
 
     :param url: The URL to check.
-    :return: The content if the URL is accessible. Otherwise None.
+    :return: True if the URL is accessible. Otherwise False.
     """
-    request = get_request("test_link", url)
+    repository = (get_owner(url), get_repo_name(url))
+    if repository not in LINK_CACHE:
+        if config.fetch_data["link_check"] == "page":
+            request = get_request("test_link", url)
+            LINK_CACHE[repository] = bool(request)
+        else:
+            LINK_CACHE[repository] = check_link(url, *repository)
+    return LINK_CACHE[repository]
 
-    if request:
-        return request.text
-    return None
 
+def check_link(url: str, owner: str, repo_name: str) -> bool:
+    """
+    Check a link with a HEAD request, or a streamed GET closed before the body if HEAD is not allowed. If GitHub cannot
+    be reached, the existence of the repository is checked with the GraphQL API.
 
-def get_verified(mp_page: requests.Response) -> bool:
+    :param url: The URL to check.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :return: True if the URL is accessible. Otherwise False.
     """
-    Determine if it is a GitHub action developed by a verified user.
+    method = "HEAD"
+    tries = 5
+    while tries > 0:
+        try:
+            response = HTML_CONTROLLER.send(lambda: send_measured(
+                lambda: SESSION.request(method, url, stream=True, timeout=30), "check_link", True))
+            response.close()
+        except requests.RequestException:
+            break
+
+        if response.status_code in (404, 410):
+            return False
+        if response.ok:
+            return True
+        if response.status_code == 405 and method == "HEAD":
+            method = "GET"
+        else:
+            tries -= 1
+
+    api_answer = request_to_api(get_repository_exists_query(owner, repo_name), endpoint="graphql_link")
+    return bool(api_answer) and repository_exists(api_answer.json())
+
 
-    :param mp_page: The Response used to determine if it is an Action developed by a verified user or not.
-    :return: True if it is a verified Action and False otherwise.
+def get_repository_exists_query(owner: str, repo_name: str) -> dict:
     """
-    xpath = '//*[text()[contains(., "Verified creator")]]'
-    root = beautiful_html(mp_page.text)
+    Get the query checking if a repository exists.
+
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :return: The query.
+    """
+    # a missing repository is null under repositoryOwner, instead of a NOT_FOUND error retried by request_to_api
+    return {'query': f"""
+    {{
+      repositoryOwner(login: "{owner}") {{
+        repository(name: "{repo_name}") {{
+          id
+        }}
+      }}
+    }}
+    """}
+
 
-    verified = root.xpath(xpath)
+def repository_exists(api_answer_json: dict) -> bool:
+    """
+    Read the answer of the query checking if a repository exists.
 
-    return True if verified else False
+    :param api_answer_json: The decoded answer of the API.
+    :return: True if the repository exists.
+    """
+    repository_owner = (api_answer_json.get("data") or {}).get("repositoryOwner")
+    return bool(repository_owner and repository_owner.get("repository"))
 
 
 def get_owner(url: str) -> str:
@@ -669,80 +985,262 @@ def get_repo_name(url: str) -> str:
     return url.split('https://github.com/')[1].split('/')[1]
 
 
-def get_api(key: str, owner: str, repo_name: str) -> int | dict | list:
+def get_contributors(owner: str, repo_name: str) -> list:
     """
-    Contact the API to fetch information.
+    Get the contributors of a repository. The first page gives the number of the last one, and the other pages are
+    fetched concurrently.
 
-    :param key: The kind of data to retrieve.
     :param owner: The owner of the repository.
     :param repo_name: The name of the repository.
-    :return: A tuple with an integer, a list or a dictionary, depending of the nature of the needed information and
-             the index for the next API call.
+    :return: The sorted logins of the contributors.
     """
-    if key != "contributors":
-        queries = {"versions": "releases(first: 100) { totalCount edges { cursor node { tag { name } publishedAt } } }",
-                   "stars": "stargazerCount",
-                   "watchers": "watchers { totalCount }",
-                   "forks": "forks { totalCount }",
-                   "issues": "issues(first: 100) { totalCount edges { cursor node { state createdAt closedAt } } }",
-                   }
-
-        query = {'query': f"""
-        {{
-          repositoryOwner(login: "{owner}") {{
-            login
-            repository(name: "{repo_name}") {{
-              name
-              {queries[key]}
-            }}
-          }}
+    url = f"https://api.github.com/repos/{owner}/{repo_name}/contributors?per_page=100&page=1"
+    api_answer = request_to_api(None, url, "rest_contributors")
+    # an empty repository answers 204 without body, and a deleted one 404: sending again would not help
+    if api_answer.status_code in (204, 404):
+        return []
+    contributors = set(extract(api_answer, "contributors"))
+
+    urls = get_pages_urls(api_answer.links)
+    for page_answer in API_PAGES_EXECUTOR.map(lambda page_url: request_to_api(None, page_url, "rest_contributors"),
+                                                urls):
+        contributors.update(extract(page_answer, "contributors"))
+
+    return sorted(contributors)
+
+
+def get_pages_urls(links: dict) -> list:
+    """
+    Get the urls of the pages after the first one, from the "last" link of the first page of a REST API answer.
+
+    :param links: The parsed "Link" header of the first page.
+    :return: The urls of the other pages.
+    """
+    if "last" not in links:
+        return []
+    last_url = urllib.parse.urlsplit(links["last"]["url"])
+    parameters = urllib.parse.parse_qs(last_url.query)
+    last_page = int(parameters["page"][0])
+
+    urls = []
+    for page in range(2, last_page + 1):
+        parameters["page"] = [str(page)]
+        urls.append(urllib.parse.urlunsplit(last_url._replace(query=urllib.parse.urlencode(parameters, doseq=True))))
+    return urls
+
+
+def get_api_repository(keys: list, owner: str, repo_name: str, incremental: bool = True) -> dict:
+    """
+    Contact the GraphQL API once to fetch several kinds of information about a repository.
+
+    :param keys: The kinds of data to retrieve, among GRAPHQL_KEYS.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :param incremental: False to fetch the paginated connections in full, even in incremental mode.
+    :return: A dictionary with the extracted data for each key, in the same shape as get_api.
+    """
+    history = get_history(keys, owner, repo_name) if incremental else {}
+    query = get_api_query(keys, owner, repo_name, history)
+
+    api_answer = request_to_api(query, endpoint="graphql_repository")
+    api_answer_json = api_answer.json()
+
+    needed_data = {key: extract_json(api_answer_json, key) for key in keys if key not in CONNECTIONS}
+    for key, edges in paginate(api_answer_json, keys, history):
+        needed_data.setdefault(key, []).extend(format_page(key, edges))
+    for key in history:
+        needed_data[key] = merge_history(key, needed_data[key], history[key])
+
+    stale = get_stale_history(api_answer_json, needed_data, history)
+    if stale:
+        logging.info(f"{owner}/{repo_name} - {', '.join(stale)} changed in the history, fetched in full")
+        needed_data.update(get_api_repository(stale, owner, repo_name, incremental=False))
+
+    return needed_data
+
+
+def get_history(keys: list, owner: str, repo_name: str) -> dict:
+    """
+    Get the history of the paginated connections of a repository in the previous snapshot, in incremental mode.
+
+    :param keys: The kinds of data to retrieve.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :return: The rows of the previous snapshot for each key among CONNECTIONS having them. Empty if the crawl is not
+             incremental.
+    """
+    history = {}
+    for key in keys:
+        if key in CONNECTIONS:
+            rows = HISTORY.get_rows(key, owner, repo_name)
+            if rows is not None:
+                history[key] = rows
+    return history
+
+
+def get_history_arguments(key: str, history: dict | None) -> str:
+    """
+    Get the arguments restricting a connection to what changed since its history.
+
+    :param key: The key for the wanted data, among CONNECTIONS.
+    :param history: The history of each key, as returned by get_history.
+    :return: The arguments, empty if the key has no history.
+    """
+    if not history or key not in history:
+        return ""
+    if key == "versions":
+        return HISTORY_ORDER
+    # an issue is updated when it is opened or closed
+    return f'filterBy: {{since: "{HISTORY.since}"}}'
+
+
+def is_history_reached(key: str, connection: dict) -> bool:
+    """
+    Check if the pages of a connection fetched newest first have reached its history, so the next pages only hold
+    known nodes. The releases are ordered by their creation, so the creation date of the oldest release fetched is
+    compared to the date from which the history is fetched again.
+
+    :param key: The key for the wanted data, among CONNECTIONS.
+    :param connection: The last page of the connection.
+    :return: True if the next pages do not need to be fetched.
+    """
+    if key != "versions" or not connection["edges"]:
+        return False
+    return connection["edges"][-1]["node"]["createdAt"] < HISTORY.since
+
+
+def merge_history(key: str, fetched: list, rows: list) -> list:
+    """
+    Copy the history of a connection forward, under what has been fetched since. The nodes deleted since are still
+    copied, get_stale_history notices them.
+
+    :param key: The key for the wanted data, among CONNECTIONS.
+    :param fetched: The formatted nodes fetched since the previous snapshot.
+    :param rows: The rows of the previous snapshot.
+    :return: The whole history.
+    """
+    if key == "versions":
+        return list(dict.fromkeys(fetched + rows))
+    # an issue updated since is replaced, its creation date identifies it
+    updated = {issue[1] for issue in fetched}
+    return fetched + [issue for issue in rows if issue[1] not in updated]
+
+
+def get_stale_history(api_answer_json: dict, needed_data: dict, history: dict) -> list:
+    """
+    Find the connections whose merged history does not hold as many nodes as the repository. The releases and the
+    issues deleted or transferred since the previous snapshot are still in its history, and a draft release published
+    since was created before the previous crawl, which did not list it. These connections must be fetched in full.
+
+    :param api_answer_json: The decoded answer of the query of get_api_query.
+    :param needed_data: The data extracted for each key, with the merged histories.
+    :param history: The history of the paginated connections, as returned by get_history.
+    :return: The keys of the connections to fetch in full.
+    """
+    repository = api_answer_json["data"]["repositoryOwner"]["repository"]
+    return [key for key in history if len(needed_data[key]) != repository[f"{CONNECTIONS[key]}Count"]["totalCount"]]
+
+
+def get_api_query(keys: list, owner: str, repo_name: str, history: dict | None = None) -> dict:
+    """
+    Build the GraphQL query used to fetch information about a repository.
+
+    :param keys: The kinds of data to retrieve, among GRAPHQL_KEYS.
+    :param owner: The owner of the repository.
+    :param repo_name: The name of the repository.
+    :param history: The history of the paginated connections in incremental mode, as returned by get_history.
+    :return: The query, ready to be sent to the API.
+    """
+    queries = {"versions": get_connection_query("versions", arguments=get_history_arguments("versions", history)),
+               "stars": "stargazerCount",
+               "watchers": "watchers { totalCount }",
+               "forks": "forks { totalCount }",
+               "issues": get_connection_query("issues", arguments=get_history_arguments("issues", history)),
+               }
+
+    query = {'query': f"""
+    {{
+      {RATE_LIMIT_QUERY}
+      repositoryOwner(login: "{owner}") {{
+        login
+        repository(name: "{repo_name}") {{
+          name
+          {" ".join(queries[key] for key in keys)}
+          {" ".join(get_count_query(key) for key in history or {})}
         }}
-        """}
+      }}
+    }}
+    """}
 
-        api_answer = request_to_api(query)
+    return query
 
-        needed_data = extract(api_answer, key)
 
-        return needed_data
-    else:
-        url = f"https://api.github.com/repos/{owner}/{repo_name}/contributors?per_page=100&page=1"
-        final = []
-        api_answer = request_to_api(None, url)
-        while 'next' in api_answer.links.keys():
-            temp = extract(api_answer, "contributors")
-            for element in temp:
-                if element not in final:
-                    final.append(element)
-            api_answer = request_to_api(None, api_answer.links['next']['url'])
-        temp = extract(api_answer, "contributors")
-        for element in temp:
-            if element not in final:
-                final.append(element)
-        return final
-
-
-def request_to_api(query: dict | None, url: str = None) -> requests.Response | None:
+def get_count_query(key: str) -> str:
+    """
+    Build the part of a GraphQL query counting all the nodes of a connection, which is restricted to what changed
+    since its history in incremental mode.
+
+    :param key: The key for the wanted data, among CONNECTIONS.
+    :return: The part of the query.
+    """
+    return f"{CONNECTIONS[key]}Count: {CONNECTIONS[key]} {{ totalCount }}"
+
+
+def get_connection_query(key: str, cursor: str | None = None, page_size: int | None = None,
+                         arguments: str = "") -> str:
+    """
+    Build the part of a GraphQL query fetching a page of a paginated connection.
+
+    :param key: The key for the wanted data, among CONNECTIONS.
+    :param cursor: The end cursor of the previous page, None for the first page.
+    :param page_size: The number of nodes of the page, the largest page allowed by default.
+    :param arguments: The other arguments of the connection, such as its order.
+    :return: The part of the query.
+    """
+    after = f', after: "{cursor}"' if cursor else ""
+    arguments = f", {arguments}" if arguments else ""
+    page_size = page_size or config.graphql_pagination["page_size"]
+    return (f"{CONNECTIONS[key]}(first: {page_size}{after}{arguments}) "
+            f"{{ totalCount pageInfo {{ hasNextPage endCursor }} edges {{ node {{ {CONNECTIONS_NODES[key]} }} }} }}")
+
+
+def request_to_api(query: dict | None, url: str = None, endpoint: str = None) -> requests.Response | None:
     """
     Make a request to the GitHub's GraphQL API.
 
     :param query: The query to get the information.
     :param url: The url to use for REST API issues.
+    :param endpoint: The logical endpoint of the request, for the metrics. "graphql" or "rest" by default.
     :return: The API response or None if error in response.
     """
     tries = 10
     api_call = None
     if query:
+        endpoint = endpoint or "graphql"
         while tries > 0:
             url = "https://api.github.com/graphql"
 
             try:
-                while not get_remaining_api_calls():
-                    time.sleep(60)
+                token = TOKEN_POOL.acquire("graphql")
                 headers = {
-                    'Authorization': f'token {CURRENT_TOKEN}',
+                    'Authorization': f'token {token}',
                 }
-                api_call = requests.post(url, json=query, headers=headers)
+                api_call = send_cached(lambda sent_headers: API_CONTROLLER.send(lambda: send_measured(
+                    lambda: API_CLIENT.post(url, json=query, headers=sent_headers), endpoint)), url, headers, query)
+                if rate_control.is_throttled(api_call) or rate_control.is_token_exhausted(api_call):
+                    TOKEN_POOL.update(token, "graphql", api_call.headers)
+                    continue
                 api_call_json = api_call.json()
+                # the rateLimit of an answer served from the cache is the one of the day it was stored
+                rate_limit = None if http_cache.is_from_cache(api_call) else \
+                    (api_call_json.get("data") or {}).get("rateLimit")
+                TOKEN_POOL.update(token, "graphql", api_call.headers, rate_limit)
+                if is_rate_limited(api_call_json):
+                    wait = rate_control.get_throttle_wait(api_call.headers)
+                    METRICS.inc("crawl_sleep_seconds_total", wait, reason="graphql rate limited")
+                    time.sleep(wait)
+                    continue
+                METRICS.inc("crawl_token_points_total", (rate_limit or {}).get("cost", 1), endpoint=endpoint)
                 if "errors" in api_call_json:
                     tries -= 1
                     api_call = None
@@ -750,25 +1248,33 @@ def request_to_api(query: dict | None, url: str = None) -> requests.Response | N
                     return api_call
 
             except requests.exceptions.ConnectionError:
+                METRICS.inc("crawl_sleep_seconds_total", 60, reason="connection error")
                 time.sleep(60)
-                return request_to_api(query)
+                return request_to_api(query, endpoint=endpoint)
             except requests.exceptions.ChunkedEncodingError:
                 return None
             except json.decoder.JSONDecodeError:
                 return None
 
     else:
+        endpoint = endpoint or "rest"
         try:
-            while not get_remaining_api_calls(True):
-                time.sleep(60)
-            headers = {
-                'Authorization': f'token {CURRENT_TOKEN}',
-                'accept': 'application/vnd.github.v3+json',
-            }
-            api_call = requests.get(url, headers=headers)
+            api_call = None
+            while api_call is None or rate_control.is_throttled(api_call) or rate_control.is_token_exhausted(api_call):
+                token = TOKEN_POOL.acquire("core")
+                headers = {
+                    'Authorization': f'token {token}',
+                    'accept': 'application/vnd.github.v3+json',
+                }
+                api_call = send_cached(lambda sent_headers: API_CONTROLLER.send(lambda: send_measured(
+                    lambda: API_CLIENT.get(url, headers=sent_headers), endpoint)), url, headers)
+                TOKEN_POOL.update(token, "core", api_call.headers)
+                if not rate_control.is_throttled(api_call) and not rate_control.is_token_exhausted(api_call):
+                    METRICS.inc("crawl_token_points_total", 1, endpoint=endpoint)
         except requests.exceptions.ConnectionError:
+            METRICS.inc("crawl_sleep_seconds_total", 60, reason="connection error")
             time.sleep(60)
-            return request_to_api(None, url)
+            return request_to_api(None, url, endpoint)
 
     return api_call
 
@@ -781,23 +1287,23 @@ def extract(api_answer: requests.Response, key: str) -> int | dict | list:
     :param key: The information we need to extract.
     :return: The extracted information in a list or dictionary and the index for the API.
     """
+    return extract_json(api_answer.json(), key)
+
+
+def extract_json(api_answer_json: dict | list, key: str) -> int | dict | list:
+    """
+    Extract the information from the decoded answer of the API.
+
+    The paginated connections are read page by page by paginate.
+
+    :param api_answer_json: The decoded answer from the API.
+    :param key: The information we need to extract.
+    :return: The extracted information in a list or dictionary.
+    """
     if key != "contributors":
-        data = api_answer.json()["data"]["repositoryOwner"]["repository"]
-
-        if key == "versions":
-            final_releases = []
-            gathered_releases = extract_all(api_answer, key)
-            for release in gathered_releases:
-                try:
-                    tag = release["node"]["tag"]["name"]
-                except TypeError:
-                    tag = None
-                date = datetime.strptime(release["node"]["publishedAt"], "%Y-%m-%dT%H:%M:%SZ")
-                date = date.strftime("%Y-%m-%d %H:%M:%S")
-                final_releases.append((date, tag))
-            return final_releases
-
-        elif key == "stars":
+        data = api_answer_json["data"]["repositoryOwner"]["repository"]
+
+        if key == "stars":
             stars = data["stargazerCount"]
             return stars
 
@@ -809,186 +1315,375 @@ def extract(api_answer: requests.Response, key: str) -> int | dict | list:
             forks = data["forks"]["totalCount"]
             return forks
 
-        elif key == "issues":
-            final_issues = []
-            gathered_issues = extract_all(api_answer, key)
-            for issue in gathered_issues:
-                try:
-                    state = issue["node"]["state"]
-                    created_at = issue["node"]["createdAt"]
-                    closed_at = issue["node"]["closedAt"]
-                    final_issues.append((state, created_at, closed_at))
-                except KeyError:
-                    continue
-            return final_issues
-
     else:
         extracted = []
-        for needed in api_answer.json():
+        for needed in api_answer_json:
             extracted.append(needed["login"])
         return extracted
 
 
-def extract_all(api_answer: requests.Response, key: str) -> list:
+def format_page(key: str, edges: list) -> list:
     """
-    Extract the data when there is possibly multiple pages of answer.
+    Format a page of a paginated connection.
 
-    :param api_answer: The answer of the API call.
-    :param key: The key for the wanted data.
+    :param key: The key for the wanted data, among CONNECTIONS.
+    :param edges: The edges of the page.
+    :return: The formatted rows.
     """
-    version_query = """
-    releases(first: 100, after:{after}) {{ totalCount edges {{ cursor node {{ tag {{ name }} publishedAt }} }} }}
+    if key == "versions":
+        return format_versions(edges)
+    return format_issues(edges)
+
+
+def format_versions(gathered_releases: typing.Iterable) -> list:
     """
-    queries = {
-        "versions": version_query,
-        "issues": "issues(first: 100, after:{after}) {{ totalCount edges {{ cursor node {{ state }} }} }}",
-    }
-    to_extract = {"versions": "releases", "issues": "issues"}
-
-    owner = api_answer.json()["data"]["repositoryOwner"]["login"]
-    repository_name = api_answer.json()["data"]["repositoryOwner"]["repository"]["name"]
-    data = api_answer.json()["data"]["repositoryOwner"]["repository"]
-
-    extracted_data = data[to_extract[key]]
-    total_count = extracted_data["totalCount"]
-    gathered_data = extracted_data["edges"]
-    total_gathered = len(gathered_data)
-    while total_gathered < total_count:
-        last_gathered_cursor = f'"{extracted_data["edges"][-1]["cursor"]}"'
-        query = {'query': f"""
-        {{
-          repositoryOwner(login: "{owner}") {{
-            login
-            repository(name: "{repository_name}") {{
-              name
-              {queries[key].format(after=last_gathered_cursor)}
-            }}
-          }}
-        }}
-        """}
-        new_api_answer = request_to_api(query)
-        gathered_data += new_api_answer.json()["data"]["repositoryOwner"]["repository"][to_extract[key]]["edges"]
+    Format the releases returned by the API.
 
-        total_gathered = len(gathered_data)
+    :param gathered_releases: The edges of the "releases" connection.
+    :return: A list of (date, tag) tuples.
+    """
+    final_releases = []
+    for release in gathered_releases:
+        try:
+            tag = release["node"]["tag"]["name"]
+        except TypeError:
+            tag = None
+        date = datetime.strptime(release["node"]["publishedAt"], "%Y-%m-%dT%H:%M:%SZ")
+        date = date.strftime("%Y-%m-%d %H:%M:%S")
+        final_releases.append((date, tag))
+    return final_releases
 
-    return gathered_data
 
+def format_issues(gathered_issues: typing.Iterable) -> list:
+    """
+    Format the issues returned by the API.
 
-def get_remaining_api_calls(rest: bool = False) -> bool:
+    :param gathered_issues: The edges of the "issues" connection.
+    :return: A list of (state, created, closed) tuples.
     """
-    Tells if API calls can be made or not.
-    Always switch to the first token with remaining calls.
+    final_issues = []
+    for issue in gathered_issues:
+        try:
+            state = issue["node"]["state"]
+            created_at = issue["node"]["createdAt"]
+            closed_at = issue["node"]["closedAt"]
+            final_issues.append((state, created_at, closed_at))
+        except KeyError:
+            continue
+    return final_issues
 
-    :param rest: Indicate if we check for the REST of GraphQL API.
-    :return: True if there can be API requests. Otherwise, False.
+
+def paginate(api_answer_json: dict, keys: list, history: dict | None = None) -> typing.Iterator[tuple[str, list]]:
     """
-    global CURRENT_TOKEN
+    Yield the edges of the paginated connections of an answer, page by page, following their pageInfo. The cost of a
+    query does not depend on the number of its connections, so the next pages of all the connections are fetched
+    together, with a single query per round. Only the pages of the current round are held.
 
-    if not rest:
-        url = "https://api.github.com/graphql"
-        for token in GITHUB_TOKENS:
-            while True:
-                try:
-                    headers = {
-                        'Authorization': f'token {token}',
-                    }
-                    query = {"query": "{ rateLimit { remaining resetAt } }"}
-                    api_call = requests.post(url, json=query, headers=headers)
-                    rate_limit = api_call.json()["data"]["rateLimit"]
+    :param api_answer_json: The decoded answer holding the first pages.
+    :param keys: The keys for the wanted data, the ones among CONNECTIONS are paginated.
+    :param history: The history of the paginated connections in incremental mode, as returned by get_history.
+    :return: The key and the edges of each page, the first pages first.
+    """
+    pagination = Pagination(api_answer_json, keys, history)
+    yield from pagination.get_first_pages()
 
-                    if rate_limit["remaining"] > 0:
-                        CURRENT_TOKEN = token
-                        return True
+    next_pages = pagination.get_next_pages()
+    while next_pages:
+        api_answer = request_to_api(pagination.get_query(next_pages), endpoint=f"graphql_{'_'.join(next_pages)}_page")
+        if not api_answer:
+            break
+        pages = pagination.add_answer(api_answer.json(), next_pages)
+        if pages is None:
+            break
+        yield from pages
+        next_pages = pagination.get_next_pages()
 
-                    break
-                except (TypeError, json.decoder.JSONDecodeError, KeyError):
-                    time.sleep(1)
-    else:
-        for token in GITHUB_TOKENS:
-            headers = {
-                'Authorization': f'token {token}',
-                'accept': 'application/vnd.github.v3+json',
-            }
-            api_call = requests.get("http://api.github.com/rate_limit", headers=headers)
-            if int(api_call.headers['X-RateLimit-Remaining']) > 0:
-                CURRENT_TOKEN = token
-                return True
-    return False
+    METRICS.inc("crawl_graphql_nodes_total", pagination.count_nodes())
 
 
-def get_dependents(owner: str, repo_name: str) -> tuple[int, str]:
+class Pagination:
+    """
+    The paginated connections of a repository being fetched, shared by paginate and by its asynchronous version in
+    "async_fetch_data.py". Only the last page of each connection is held.
+    """
+
+    def __init__(self, api_answer_json: dict, keys: list, history: dict | None = None) -> None:
+        """
+        :param api_answer_json: The decoded answer holding the first pages.
+        :param keys: The keys for the wanted data, the ones among CONNECTIONS are paginated.
+        :param history: The history of the paginated connections in incremental mode, as returned by get_history.
+        """
+        repository = api_answer_json["data"]["repositoryOwner"]["repository"]
+        self.owner = api_answer_json["data"]["repositoryOwner"]["login"]
+        self.repository_name = repository["name"]
+        self.history = history or {}
+        self.keys = [key for key in keys if key in CONNECTIONS]
+        # key -> the last page of the connection, and the number of nodes fetched so far
+        self.connections = {key: repository[CONNECTIONS[key]] for key in self.keys}
+        self.fetched = {key: len(self.connections[key]["edges"]) for key in self.keys}
+        self.pages = 1
+        # the points spent on the next pages
+        self.cost = 0
+        # the points of the last query per connection, expected for each connection of the next round
+        self.connection_cost = get_query_cost(api_answer_json) / max(1, len(self.keys))
+
+    def get_first_pages(self) -> list:
+        """
+        :return: The key and the edges of the first page of each connection.
+        """
+        return [(key, self.connections[key]["edges"]) for key in self.keys]
+
+    def get_next_pages(self) -> dict:
+        """
+        Get the next page to fetch of each connection, within the pagination budget. The cost of the next round is
+        predicted from the cost of the last query, and the connections that do not fit in the points left are
+        truncated.
+
+        :return: The end cursor and the size of the next page of each key to fetch in the next round.
+        """
+        next_pages = {}
+        for key in self.keys:
+            connection = self.connections[key]
+            if key in self.history and is_history_reached(key, connection):
+                continue
+            if connection["pageInfo"]["hasNextPage"]:
+                next_pages[key] = (connection["pageInfo"]["endCursor"], self.get_page_size(key))
+
+        if self.pages >= config.graphql_pagination["max_pages"]:
+            fitting = 0
+        elif self.connection_cost > 0:
+            fitting = int((config.graphql_pagination["max_cost"] - self.cost) / self.connection_cost)
+        else:
+            fitting = len(next_pages)
+        if fitting < len(next_pages):
+            logging.warning(f"{self.owner}/{self.repository_name} - {', '.join(list(next_pages)[max(0, fitting):])} "
+                            f"truncated after {self.pages} pages ({self.cost} points)")
+        return dict(list(next_pages.items())[:max(0, fitting)])
+
+    def get_page_size(self, key: str) -> int:
+        """
+        Size the next page of a connection from the nodes it still holds. Every page is as large as allowed, except
+        the last one, which only asks for the remaining nodes.
+
+        :param key: The key of the connection.
+        :return: The number of nodes of the next page.
+        """
+        remaining = self.connections[key]["totalCount"] - self.fetched[key]
+        return max(1, min(config.graphql_pagination["page_size"], remaining))
+
+    def get_query(self, next_pages: dict) -> dict:
+        """
+        :param next_pages: The next pages to fetch, as returned by get_next_pages.
+        :return: The query fetching the next pages.
+        """
+        return get_next_page_query(self.owner, self.repository_name, next_pages, self.history)
+
+    def add_answer(self, page_answer_json: dict, next_pages: dict) -> list | None:
+        """
+        Replace the pages of the connections with the next ones.
+
+        :param page_answer_json: The decoded answer holding the next pages.
+        :param next_pages: The fetched pages, as returned by get_next_pages.
+        :return: The key and the edges of each new page. None if the answer holds no repository, for example if it
+                 has been deleted in the meantime.
+        """
+        page_repository = ((page_answer_json.get("data") or {}).get("repositoryOwner") or {}).get("repository")
+        if not page_repository:
+            return None
+
+        cost = get_query_cost(page_answer_json)
+        self.pages += 1
+        self.cost += cost
+        self.connection_cost = cost / len(next_pages)
+        for key in next_pages:
+            self.connections[key] = page_repository[CONNECTIONS[key]]
+            self.fetched[key] += len(self.connections[key]["edges"])
+        return [(key, self.connections[key]["edges"]) for key in next_pages]
+
+    def count_nodes(self) -> int:
+        """
+        :return: The number of nodes fetched.
+        """
+        return sum(self.fetched.values())
+
+
+def get_query_cost(api_answer_json: dict) -> int:
+    """
+    Get the rate limit cost of a GraphQL query.
+
+    :param api_answer_json: The decoded answer of the query.
+    :return: The cost, 1 if it has not been requested.
+    """
+    rate_limit = (api_answer_json.get("data") or {}).get("rateLimit") or {}
+    return rate_limit.get("cost", 1)
+
+
+def is_rate_limited(api_answer_json: dict | list) -> bool:
+    """
+    Tell if a GraphQL query has been refused because of the rate limit. The answer has the status code 200, and the
+    reason is only given in its errors.
+
+    :param api_answer_json: The decoded answer of the query.
+    :return: True if the query must be sent again.
+    """
+    if not isinstance(api_answer_json, dict):
+        return False
+    return any(isinstance(error, dict) and error.get("type") == "RATE_LIMITED"
+               for error in api_answer_json.get("errors") or [])
+
+
+def get_next_page_query(owner: str, repository_name: str, next_pages: dict, history: dict | None = None) -> dict:
+    """
+    Build the GraphQL query used to fetch the next pages of paginated connections.
+
+    :param owner: The owner of the repository.
+    :param repository_name: The name of the repository.
+    :param next_pages: The end cursor of the previous page and the size of the next page, for each key.
+    :param history: The history of the paginated connections in incremental mode, as returned by get_history.
+    :return: The query, ready to be sent to the API.
+    """
+    query = {'query': f"""
+    {{
+      {RATE_LIMIT_QUERY}
+      repositoryOwner(login: "{owner}") {{
+        login
+        repository(name: "{repository_name}") {{
+          name
+          {" ".join(get_connection_query(key, cursor, page_size, get_history_arguments(key, history))
+                    for key, (cursor, page_size) in next_pages.items())}
+        }}
+      }}
+    }}
+    """}
+
+    return query
+
+
+def get_dependents(owner: str, repo_name: str) -> tuple[int, str] | None:
     """
     Get the number of dependents and the corresponding package url for a repository.
+    The dependents pages of the packages are fetched concurrently.
 
     :param owner: The owner of the repository.
     :param repo_name: The name of the repository.
-    :return: The number of dependents and the url to get the dependents sample.
+    :return: The number of dependents and the url to get the dependents sample, None if the dependents page of the
+             repository or of one of its packages could not be fetched.
     """
     url = f"https://github.com/{owner}/{repo_name}/network/dependents"
-    xpath_is_packages = '//*[@id="dependents"]/details/summary/i/text()'
-    xpath_packages = '//*[@id="dependents"]/details/details-menu/div[2]/a/@href'
-
-    root = get_dependents_html(url)
-
-    ugly_packages = root.xpath(xpath_is_packages)
-    packages = []
-    if ugly_packages:
-        packages = root.xpath(xpath_packages)
-        for i, urls in enumerate(packages):
-            packages[i] = "https://github.com" + urls
-
-    max_url = url if "https://github.com" in url else "https://github.com" + url
-    max_dependents = get_dependents_number(root)
-    if packages:
-        for urls in packages:
-            root_package = get_dependents_html(urls)
-            dependents = get_dependents_number(root_package)
-            if dependents > max_dependents:
-                max_url = urls
-                max_dependents = dependents
+    dependents_page = get_dependents_page(url)
+    if dependents_page is None:
+        return None
+
+    packages, max_dependents = dependents_page
+    return get_max_dependents(url, max_dependents, packages, DEPENDENTS_EXECUTOR.map(stream_dependents_number,
+                                                                                      packages))
+
+
+def get_max_dependents(url: str, dependents: int, packages: list,
+                       packages_dependents: typing.Iterable) -> tuple[int, str] | None:
+    """
+    Get the package of a repository having the most dependents.
+
+    :param url: The url of the dependents page of the repository.
+    :param dependents: The number of dependents on the page of the repository.
+    :param packages: The urls of the dependents pages of the packages.
+    :param packages_dependents: The number of dependents of each package, None if its page could not be fetched.
+    :return: The largest number of dependents and its url, None if the page of a package could not be fetched: the
+             largest number is not known then.
+    """
+    max_dependents = dependents
+    max_url = url
+    for package_url, package_dependents in zip(packages, packages_dependents):
+        if package_dependents is None:
+            logging.error(f"get_dependents - {url} incomplete, {package_url} could not be fetched")
+            return None
+        if package_dependents > max_dependents:
+            max_url = package_url
+            max_dependents = package_dependents
 
     return max_dependents, max_url
 
 
-def get_dependents_html(url: str) -> html.document_fromstring:
+def get_dependents_page(url: str) -> tuple[list, int] | None:
     """
-    Get the html for a dependents page.
+    Get the data of a dependents page.
 
     :param url: The url for the dependents.
-    :return: The response as an html.document_fromstring object.
+    :return: The URLs of the dependents pages of the packages and the number of dependents, None if the page could not
+             be fetched or parsed.
+    """
+    for _ in range(config.fetch_data["dependents_retries"]):
+        request = get_request("get_dependents", url)
+        if not request:
+            return None
+        dependents_page = extract_page(extractors.extract_dependents_page, request.content, request.encoding)
+        if dependents_page is not None:
+            return dependents_page
+
+    logging.error(f"get_dependents - {url} could not be parsed")
+    return None
+
+
+def stream_dependents_number(url: str) -> int | None:
     """
-    root = None
+    Get the number of dependents on a page, reading the page only until the number is found.
+    If the number is not found on the way, the whole page is parsed.
 
-    while True:
+    :param url: The url for the dependents.
+    :return: The number of dependents, None if the page could not be fetched.
+    """
+    for _ in range(config.fetch_data["dependents_retries"]):
+        # the body is streamed, so a connection broken while reading it is a failed try too
         try:
-            request = get_request("get_dependents", url)
-            root = beautiful_html(request.text)
-            break
-        except etree.ParserError:
+            response = HTML_CONTROLLER.send(lambda: send_measured(
+                lambda: SESSION.get(url, stream=True, timeout=30), "stream_dependents", True))
+            with response:
+                if is_retryable(response.status_code):
+                    continue
+                if response.status_code != 200:
+                    logging.error(f"get_dependents - {url} answered {response.status_code}")
+                    return None
+                response.encoding = response.encoding or "utf-8"
+                text = ""
+                for chunk in response.iter_content(chunk_size=16384, decode_unicode=True):
+                    start = max(0, len(text) - 4096)
+                    text += chunk
+                    METRICS.inc("crawl_response_bytes_total", len(chunk.encode()), endpoint="stream_dependents")
+                    dependents = search_dependents_number(text, start)
+                    if dependents is not None:
+                        return dependents
+        except requests.RequestException:
             continue
 
-    return root
+        dependents_page = extract_page(extractors.extract_dependents_page, text)
+        if dependents_page is not None:
+            return dependents_page[1]
 
+    logging.error(f"get_dependents - {url} could not be fetched")
+    return None
 
-def get_dependents_number(root: html.document_fromstring) -> int:
-    """
-    Get the number of dependents on a page.
 
-    :param root: The html where the dependents are located.
-    :return: The number of dependents.
+def is_retryable(status_code: int) -> bool:
     """
-    xpath_dependents_number = '//*[@id="dependents"]/div[3]/div[1]/div/div/a[1]/text()'
+    :param status_code: The status code of a response.
+    :return: True if the request may succeed if sent again: the server is throttling or failing.
+    """
+    return status_code == 429 or status_code >= 500
 
-    try:
-        ugly_dependents = root.xpath(xpath_dependents_number)[1]
-    except IndexError:
-        return 0
 
-    dependents_temp = re.findall(re.compile(r'\d+'), ugly_dependents)
-    if dependents_temp:
-        dependents = int(''.join(dependents_temp))
-        return dependents
-    return 0
+def search_dependents_number(text: str, start: int) -> int | None:
+    """
+    Search the number of dependents in the part of a dependents page read so far.
+
+    :param text: The text read so far.
+    :param start: The position from which to search. The link holding the number may start before the last chunk read,
+                  so it must be a few kilobytes before it.
+    :return: The number of dependents, None if it has not been found yet.
+    """
+    match = extractors.DEPENDENTS_NUMBER_PATTERN.search(text, start)
+    if match:
+        return extractors.get_number(extractors.TAG_PATTERN.sub("", match.group(1)))
+    return None
 
 
 if __name__ == "__main__":
@@ -1033,9 +1728,16 @@ if __name__ == "__main__":
             sqlite_connection_main.close()
 
             logging.info(f"Number of fetched actions: {number_of_actions}")
+
+            if config.temporal["run"]:
+                store_main = temporal_store.TemporalStore(config.temporal["path"])
+                store_main.ingest(file_name_main)
+                store_main.close()
         else:
             logging.info(f"Number of fetched actions: N/A")
 
         SESSION.close()
+        API_CLIENT.close()
+        close_http_cache()
 
     logging.info(f"--- {time.time() - start_time} seconds ---")
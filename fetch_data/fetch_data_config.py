@@ -28,6 +28,133 @@ get_categories = {
 fetch_data = {
     "run": True,
     "max_threads": 50,
+    # "threads" or "asyncio"
+    "engine": "threads",
+    # only used by the "asyncio" engine
+    "max_concurrent_requests": 200,
+    # number of processes parsing the pages, so the parsing does not hold the GIL of the crawl. 0 parses the pages in
+    # the threads of the crawl.
+    "parse_processes": 0,
+    # the crawled Actions wait in a bounded queue and are written in batches by a dedicated thread
+    "writer_queue_size": 1000,
+    "writer_batch_size": 100,
+    # "head" checks the links of the repositories without downloading them, "page" downloads the whole page
+    "link_check": "head",
+    # number of dependents pages of packages fetched at once, and tries for each dependents page
+    "dependents_fan_out": 8,
+    "dependents_retries": 3,
+    # number of pages of a paginated REST API answer fetched at once
+    "api_pages_fan_out": 8,
+    # the GraphQL query, the dependents and the contributors of an Action are fetched concurrently, within a timeout
+    # in seconds. The data that could not be fetched is fetched again in the next loop.
+    "enrichment_fan_out": 150,
+    "enrichment_timeout": 900,
+}
+
+# the releases and the issues of the latest previous snapshot of the directory are copied forward, and the API is only
+# asked for the releases created and the issues updated since. A repository whose releases or issues no longer match
+# their count, after a deletion or a transfer, has them fetched in full. The stars, watchers, forks, contributors and
+# dependents are fetched in full.
+incremental = {
+    "run": False,
+    "directory": "outputs",
+    # the releases created and the issues updated this number of days before the date of the previous snapshot are
+    # fetched again, as a crawl lasts for hours
+    "margin_days": 1,
+}
+# every snapshot is also ingested in the temporal store of "temporal_store.py", which keeps all the snapshots in a
+# single database, each row with the snapshots it is valid in
+temporal = {
+    "run": False,
+    "path": "outputs/actions_history.db",
+}
+# pagination of the releases and issues of a repository through the GraphQL API
+graphql_pagination = {
+    # largest page of a connection, 100 is the maximum of the API. The cost of a query does not depend on the size of
+    # its pages, only the last page of a connection is smaller, to ask for its remaining nodes only.
+    "page_size": 100,
+    # a connection is truncated, with a warning, once one of the budgets is spent
+    "max_pages": 500,
+    "max_cost": 1000,
+}
+
+# AIMD control of the requests sent to github.com and to api.github.com, the initial rate is limit_requests
+rate_control = {
+    "initial_concurrency": 50,
+    "min_concurrency": 2,
+    "max_concurrency": 200,
+    "min_rate": 30,
+    "max_rate": 2000,
+    "decrease_factor": 0.5,
+    # requests/minute added after each clean response
+    "rate_increase": 0.5,
+    "log_every": 500,
+}
+
+# keep-alive connections to the GitHub API, the pool is resized to the number of threads when fetching the data
+api_client = {
+    "pool_size": 10,
+    # retries on connection errors and 5xx answers
+    "retries": 3,
+    "backoff_factor": 0.5,
+}
+
+# on-disk cache of the responses, revalidated with ETag / Last-Modified
+http_cache = {
+    "run": True,
+    "path": "outputs/http_cache.db",
+    "max_bytes": 2 * 1024 ** 3,
+    "ttl": 7 * 24 * 3600,
+    # the writes are committed together, every commit_every writes or every commit_interval seconds
+    "commit_every": 100,
+    "commit_interval": 5.0,
+}
+
+# record the HTTP traffic, or replay it offline to benchmark the crawl on identical traffic
+cassette = {
+    # "off", "record", "replay" (in the process), "simulate" (in the process, answers of "simulator.py"),
+    # or "server" (through the stand-in of "cassette.py" or "simulator.py")
+    "mode": "off",
+    "path": "outputs/cassette.db",
+    "server": "http://127.0.0.1:8000",
+    # number of seconds before each replayed answer, None to wait as long as the recording took
+    "latency": None,
+    # share of the replayed requests answered with a 429
+    "throttle_rate": 0.0,
+    "retry_after": 1,
+    "seed": 0,
+}
+
+# synthetic marketplace and API of "simulator.py"
+simulator = {
+    "categories": 20,
+    "actions": 20000,
+    "actions_per_page": 20,
+    # share of the Actions also listed in a second category
+    "overlap_share": 0.1,
+    "verified_share": 0.1,
+    # share of the Actions whose repository does not exist anymore
+    "broken_link_share": 0.02,
+    "repositories_per_owner": 3,
+    # [median, sigma, maximum] of the log-normal distribution of each size
+    "sizes": {
+        "stars": [20, 2.0, 100000],
+        "watchers": [3, 1.5, 5000],
+        "forks": [4, 1.8, 20000],
+        "releases": [5, 1.2, 1000],
+        "issues": [8, 1.5, 5000],
+        "contributors": [3, 1.2, 2000],
+        "dependents": [10, 2.0, 1000000],
+        "packages": [0.3, 1.5, 5],
+    },
+    "seed": 0,
+}
+
+# counters and latency histograms of the requests, written in the Prometheus text format
+metrics = {
+    "run": True,
+    "path": "outputs/metrics.prom",
+    "interval": 30,
 }
 
 tokens = [
@@ -0,0 +1,235 @@
+"""
+On-disk cache of HTTP responses for "fetch_data.py", revalidated with conditional requests.
+
+A response is stored with its validators (ETag and Last-Modified). The next request to the same URL (and the same
+body for GraphQL queries) sends If-None-Match / If-Modified-Since, and a 304 answer is served from the cache.
+The cache file is written in WAL mode and committed in batches, so the workers do not wait for a sync of the disk
+after each request. An interrupted crawl only loses the last uncommitted entries.
+"""
+import hashlib
+import json
+import os
+import requests
+import requests.structures
+import sqlite3
+import threading
+import time
+
+
+class HttpCache:
+    """
+    Responses cache stored in a SQLite file, with a time to live and a least recently used eviction by size.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl: float, commit_every: int = 100,
+                 commit_interval: float = 5.0) -> None:
+        """
+        :param path: The path of the SQLite file.
+        :param max_bytes: The maximum size of the stored bodies, in bytes.
+        :param ttl: The number of seconds after which an entry is not revalidated anymore but fetched again.
+        :param commit_every: The number of writes committed together.
+        :param commit_interval: The maximum number of seconds between two commits.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.lock = threading.Lock()
+        self.connection = None
+        self.size = 0
+        self.pending = 0
+        self.last_commit = time.time()
+
+    def get_connection(self) -> sqlite3.Connection:
+        """
+        Open the cache file on first use. The lock must be held.
+
+        :return: The connection to the cache file.
+        """
+        if self.connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode = WAL;")
+            self.connection.execute("PRAGMA synchronous = NORMAL;")
+            self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT,
+                body BLOB,
+                size INTEGER,
+                stored REAL,
+                accessed REAL
+            );
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);")
+            self.connection.commit()
+            self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses;").fetchone()[0]
+        return self.connection
+
+    @staticmethod
+    def get_key(url: str, body: dict | None = None) -> str:
+        """
+        Get the key of a request.
+
+        :param url: The URL of the request.
+        :param body: The JSON body of the request, for GraphQL queries.
+        :return: The key used in the cache.
+        """
+        if body is None:
+            return url
+        digest = hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{url}#{digest}"
+
+    def get(self, key: str) -> tuple | None:
+        """
+        Get a fresh entry of the cache.
+
+        :param key: The key of the request.
+        :return: The entry (etag, last_modified, headers, body), or None if there is no fresh entry.
+        """
+        with self.lock:
+            connection = self.get_connection()
+            entry = connection.execute(
+                "SELECT etag, last_modified, headers, body, stored FROM responses WHERE key = ?;", (key,)).fetchone()
+        if entry is None or time.time() - entry[4] > self.ttl:
+            return None
+        return entry[:4]
+
+    def store(self, key: str, response: requests.Response) -> None:
+        """
+        Store a response if it has validators.
+
+        :param key: The key of the request.
+        :param response: The response to store.
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+
+        body = response.content
+        now = time.time()
+        with self.lock:
+            connection = self.get_connection()
+            previous = connection.execute("SELECT size FROM responses WHERE key = ?;", (key,)).fetchone()
+            if previous:
+                self.size -= previous[0]
+            connection.execute("""
+            INSERT OR REPLACE INTO responses (key, etag, last_modified, headers, body, size, stored, accessed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+            """, (key, etag, last_modified, json.dumps(dict(response.headers)), body, len(body), now, now))
+            self.size += len(body)
+            self.evict()
+            self.commit_batch()
+
+    def touch(self, key: str) -> None:
+        """
+        Mark an entry as revalidated.
+
+        :param key: The key of the request.
+        """
+        now = time.time()
+        with self.lock:
+            connection = self.get_connection()
+            connection.execute("UPDATE responses SET stored = ?, accessed = ? WHERE key = ?;", (now, now, key))
+            self.commit_batch()
+
+    def commit_batch(self) -> None:
+        """
+        Commit the writes once the batch is full or old enough. The lock must be held.
+        """
+        self.pending += 1
+        if self.pending >= self.commit_every or time.time() - self.last_commit >= self.commit_interval:
+            self.connection.commit()
+            self.pending = 0
+            self.last_commit = time.time()
+
+    def close(self) -> None:
+        """
+        Commit the pending writes and close the cache file. It is opened again on the next use.
+        """
+        with self.lock:
+            if self.connection is not None:
+                self.connection.commit()
+                self.connection.close()
+                self.connection = None
+                self.pending = 0
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until the cache fits in its maximum size. The lock must be held.
+        """
+        connection = self.get_connection()
+        while self.size > self.max_bytes:
+            oldest = connection.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 100;").fetchall()
+            if not oldest:
+                self.size = 0
+                break
+            for key, size in oldest:
+                connection.execute("DELETE FROM responses WHERE key = ?;", (key,))
+                self.size -= size
+                if self.size <= self.max_bytes:
+                    break
+
+    def send(self, send_request, url: str, headers: dict | None = None, body: dict | None = None) -> requests.Response:
+        """
+        Send a conditional request and serve a 304 answer from the cache.
+
+        :param send_request: The function sending the request, called with the headers to use.
+        :param url: The URL of the request.
+        :param headers: The headers of the request.
+        :param body: The JSON body of the request, for GraphQL queries.
+        :return: The response, rebuilt from the cache if the server answered 304.
+        """
+        key = self.get_key(url, body)
+        entry = self.get(key)
+        headers = dict(headers) if headers else {}
+        if entry:
+            etag, last_modified, _, _ = entry
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = send_request(headers)
+
+        if response.status_code == 304 and entry:
+            self.touch(key)
+            return self.to_response(entry, response)
+        self.store(key, response)
+        return response
+
+    @staticmethod
+    def to_response(entry: tuple, not_modified: requests.Response) -> requests.Response:
+        """
+        Rebuild a response from an entry of the cache. It is marked with from_cache, so its body is not read as the
+        current state of the server (the rateLimit object of a GraphQL answer, for example).
+
+        :param entry: The entry of the cache.
+        :param not_modified: The 304 response, whose headers (rate limit, ...) are kept.
+        :return: The rebuilt response.
+        """
+        _, _, headers, body = entry
+        response = requests.Response()
+        response.status_code = 200
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.headers = requests.structures.CaseInsensitiveDict(json.loads(headers))
+        response.headers.update(not_modified.headers)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = body
+        response.from_cache = True
+        return response
+
+
+def is_from_cache(response: requests.Response) -> bool:
+    """
+    :param response: A response returned by HttpCache.send.
+    :return: True if the body has been served from the cache.
+    """
+    return getattr(response, "from_cache", False)
@@ -0,0 +1,147 @@
+"""
+Load test of the crawl of "fetch_data.py" on the synthetic marketplace of "simulator.py".
+
+Each scale is crawled in a new process, from the categories page to the last Action, with every kind of data fetched
+and the limits of the rate controller lifted, so the crawl itself is measured. The threads engine is served in the
+process, and the asyncio engine by a stand-in running in the same process. The report gives, per number of Actions,
+the listing pages, the crawl time, the throughput, the peak memory of the process (simulator included) and the size of
+the database. Where the resource module does not exist (Windows), the peak memory is read with psutil if it is
+installed, or else traced with tracemalloc, which only counts the memory allocated by Python.
+
+Usage: python load_test.py [threads|asyncio] [number_of_actions ...]
+"""
+import fetch_data_config as config
+import json
+import logging
+import math
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+DEFAULT_SCALES = [1000, 10000, 100000]
+
+
+def run_scale(engine: str, number_of_actions: int) -> dict:
+    """
+    Crawl a simulated marketplace in the current process.
+
+    :param engine: "threads" or "asyncio".
+    :param number_of_actions: The number of Actions of the marketplace.
+    :return: The measures of the crawl.
+    """
+    if resource is None and psutil is None:
+        tracemalloc.start()
+    config.simulator["actions"] = number_of_actions
+    config.cassette["mode"] = "simulate" if engine == "threads" else "server"
+    config.cassette["latency"] = 0.0
+    config.cassette["throttle_rate"] = 0.0
+    config.fetch_data["engine"] = engine
+    config.http_cache["run"] = False
+    config.metrics["run"] = False
+    for key in config.fetch_categories:
+        config.fetch_categories[key] = True
+    config.rate_control["initial_concurrency"] = config.rate_control["max_concurrency"]
+    config.rate_control["max_rate"] = config.rate_control["min_rate"] = config.limit_requests = 10 ** 9
+
+    # the sessions of "fetch_data.py" are mounted on the simulator when it is imported
+    import cassette
+    import fetch_data
+    import simulator
+
+    simulated = simulator.Simulator(config.simulator)
+    if engine == "asyncio":
+        server = cassette.serve(cassette.Replayer(simulated, 0.0, 0.0, 1, 0), 0)
+        config.cassette["server"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        fetch_data.get_categories()
+        fetch_data.file_name_main = os.path.join(directory, "actions_data.db")
+        fetch_data.number_of_threads = 0
+
+        start_time = time.perf_counter()
+        fetch_data.fetch_data_multithread()
+        elapsed = time.perf_counter() - start_time
+
+        sqlite_connection = sqlite3.connect(fetch_data.file_name_main)
+        fetched_actions = sqlite_connection.execute("SELECT COUNT(*) FROM actions;").fetchone()[0]
+        sqlite_connection.close()
+        database_size = os.path.getsize(fetch_data.file_name_main)
+
+    return {
+        "actions": number_of_actions,
+        "pages": sum(max(1, math.ceil(len(listing) / simulated.per_page)) for listing in simulated.listings),
+        "fetched": fetched_actions,
+        "seconds": elapsed,
+        "memory": get_peak_memory(),
+        "database": database_size / 1024 ** 2,
+    }
+
+
+def get_peak_memory() -> float:
+    """
+    Get the peak memory of the process.
+
+    :return: The peak memory, in megabytes.
+    """
+    if resource is not None:
+        # bytes on macOS, kilobytes elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+    if psutil is not None:
+        # the peak is only known on Windows, the current memory is the closest measure elsewhere
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, "peak_wset", memory_info.rss) / 1024 ** 2
+    return tracemalloc.get_traced_memory()[1] / 1024 ** 2
+
+
+def print_report(engine: str, results: list) -> None:
+    """
+    Print the measures of every scale.
+
+    :param engine: "threads" or "asyncio".
+    :param results: The measures of the crawls.
+    """
+    print(f"\nEngine: {engine}")
+    print(f"{'actions':>9} {'pages':>7} {'fetched':>8} {'seconds':>9} {'actions/sec':>12} {'peak MB':>9} {'DB MB':>8}")
+    for result in results:
+        print(f"{result['actions']:>9} {result['pages']:>7} {result['fetched']:>8} {result['seconds']:>9.1f} "
+              f"{result['fetched'] / result['seconds']:>12.1f} {result['memory']:>9.1f} {result['database']:>8.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--scale":
+        logging.basicConfig(filename=f"load_test_{sys.argv[2]}_{sys.argv[3]}.log", level=logging.INFO, filemode='w',
+                            format='%(asctime)s %(message)s')
+        result_main = run_scale(sys.argv[2], int(sys.argv[3]))
+        print("\n" + json.dumps(result_main))
+        sys.exit(0)
+
+    engine_main = sys.argv[1] if len(sys.argv) > 1 else "threads"
+    scales_main = [int(scale) for scale in sys.argv[2:]] or DEFAULT_SCALES
+
+    results_main = []
+    for scale_main in scales_main:
+        print(f"Crawling {scale_main} Actions...")
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), "--scale", engine_main, str(scale_main)],
+                                 capture_output=True, text=True)
+        if process.returncode != 0:
+            print(process.stderr)
+            break
+        results_main.append(json.loads(process.stdout.strip().splitlines()[-1]))
+
+    print_report(engine_main, results_main)
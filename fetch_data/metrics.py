@@ -0,0 +1,196 @@
+"""
+Telemetry of the crawl of "fetch_data.py".
+
+Counters, gauges and histograms are keyed by a name and labels, for example the logical endpoint of a request and its
+status code. Every worker updates them under a single lock. A background thread writes them periodically in the
+Prometheus text format, so the file can be read by hand or collected by a node exporter.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+
+
+# upper bounds of the buckets of the histograms, in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_labels(labels: tuple) -> str:
+    """
+    Format labels for the Prometheus text format.
+
+    :param labels: The (name, value) pairs of the labels.
+    :return: The labels between braces, or an empty string if there is none.
+    """
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    """
+    Thread-safe counters, gauges and histograms, written in a file in the Prometheus text format.
+    """
+
+    def __init__(self, buckets: tuple = BUCKETS) -> None:
+        """
+        :param buckets: The upper bounds of the buckets of the histograms, in increasing order.
+        """
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # (name, labels) -> value
+        self.counters = {}
+        self.gauges = {}
+        # (name, labels) -> [count of each bucket and of +Inf, sum]
+        self.histograms = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increase a counter.
+
+        :param name: The name of the counter.
+        :param value: The increase.
+        :param labels: The labels of the counter.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """
+        Set a gauge.
+
+        :param name: The name of the gauge.
+        :param value: The value.
+        :param labels: The labels of the gauge.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Add a value to a histogram.
+
+        :param name: The name of the histogram.
+        :param value: The value, in seconds for the default buckets.
+        :param labels: The labels of the histogram.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram = self.histograms[key]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def to_prometheus(self) -> str:
+        """
+        :return: Every metric in the Prometheus text format.
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, list(histogram)) for key, histogram in self.histograms.items())
+
+        lines = []
+        last_name = None
+        for metric_type, values in (("counter", counters), ("gauge", gauges)):
+            for (name, labels), value in values:
+                if name != last_name:
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    last_name = name
+                lines.append(f"{name}{format_labels(labels)} {value}")
+
+        for (name, labels), histogram in histograms:
+            if name != last_name:
+                lines.append(f"# TYPE {name} histogram")
+                last_name = name
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), histogram[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram[-1]}")
+            lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Write the metrics in a file. The file is replaced at once, so a reader never sees it half written.
+
+        :param path: The path of the file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'w', encoding="utf-8") as file:
+            file.write(self.to_prometheus())
+        os.replace(temporary_path, path)
+
+    def start(self, path: str, interval: float) -> None:
+        """
+        Start writing the metrics in a file periodically.
+
+        :param path: The path of the file.
+        :param interval: The number of seconds between two writes.
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.write_periodically, args=(path, interval), name="metrics",
+                                       daemon=True)
+        self.thread.start()
+
+    def write_periodically(self, path: str, interval: float) -> None:
+        """
+        Main loop of the thread writing the metrics.
+
+        :param path: The path of the file.
+        :param interval: The number of seconds between two writes.
+        """
+        while not self.stop_event.wait(interval):
+            try:
+                self.write(path)
+            except OSError:
+                logging.exception(f"Writing the metrics in {path} failed")
+
+    def stop(self, path: str) -> None:
+        """
+        Stop the periodic writes, and write the final values of the metrics.
+
+        :param path: The path of the file.
+        """
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+        self.write(path)
+
+
+class Timer:
+    """
+    Context manager adding the time spent in its block to a histogram.
+    """
+
+    def __init__(self, metrics: Metrics, name: str, **labels) -> None:
+        """
+        :param metrics: The metrics holding the histogram.
+        :param name: The name of the histogram.
+        :param labels: The labels of the histogram.
+        """
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
@@ -0,0 +1,69 @@
+"""
+Pool of processes parsing the pages of the crawl of "fetch_data.py".
+
+With many crawl threads, parsing the pages holds the GIL, so the crawl is bound to a single core. The raw bodies of the
+responses are shipped to worker processes running the extractors of "extractors.py", and only the small records they
+extract come back (names, URLs, verified flags, numbers). Without processes, the extractors run in the calling thread.
+"""
+import concurrent.futures
+import typing
+
+
+class ParseExecutor:
+    """
+    Runs the extractors of "extractors.py" in a pool of processes, or in the calling thread if there is none.
+    """
+
+    def __init__(self) -> None:
+        self.pool = None
+
+    def start(self, processes: int) -> None:
+        """
+        Start the worker processes. It is called before the threads of the crawl are started, so the workers are
+        forked from a process with a single thread.
+
+        :param processes: The number of worker processes, 0 to run the extractors in the calling threads.
+        """
+        if processes > 0 and self.pool is None:
+            self.pool = concurrent.futures.ProcessPoolExecutor(processes)
+            # the workers are started with the first task
+            self.pool.submit(int).result()
+
+    def submit(self, extractor: typing.Callable, content: str | bytes,
+               encoding: str | None = None) -> concurrent.futures.Future:
+        """
+        Submit the extraction of a page.
+
+        :param extractor: An extract_* function of "extractors.py".
+        :param content: The body of the page, preferably as raw bytes, which are cheaper to send to a process.
+        :param encoding: The encoding of the raw bytes.
+        :return: The future of the extracted record. It is already done if there is no worker process.
+        """
+        if self.pool is not None:
+            return self.pool.submit(extractor, content, encoding)
+
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(extractor(content, encoding))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    def run(self, extractor: typing.Callable, content: str | bytes, encoding: str | None = None) -> typing.Any:
+        """
+        Extract the record of a page and wait for it.
+
+        :param extractor: An extract_* function of "extractors.py".
+        :param content: The body of the page.
+        :param encoding: The encoding of the raw bytes.
+        :return: The extracted record.
+        """
+        return self.submit(extractor, content, encoding).result()
+
+    def close(self) -> None:
+        """
+        Stop the worker processes.
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,175 @@
+"""
+Adaptive concurrency and rate controller shared by the workers of "fetch_data.py".
+
+The number of requests in flight and the number of requests per minute follow an AIMD scheme: they grow additively
+while the responses are clean, and are multiplied by a decrease factor when a 429 or a secondary rate limit is met.
+A Retry-After pauses every worker, not only the one that received it. An exhausted token is not a reason to slow
+down: the other tokens may still have budget, and the token pool of "token_pool.py" leaves it aside until its reset.
+"""
+import logging
+import requests
+import threading
+import time
+import typing
+
+
+def is_throttled(response: requests.Response | None) -> bool:
+    """
+    Tell if a response is a 429 or a secondary rate limit (a 403 with a Retry-After).
+
+    :param response: The response, None if the request failed.
+    :return: True if the server asks to slow down.
+    """
+    if response is None:
+        return False
+    if response.status_code == 429:
+        return True
+    return response.status_code == 403 and "Retry-After" in response.headers
+
+
+def is_token_exhausted(response: requests.Response | None) -> bool:
+    """
+    Tell if a response has been refused because the budget of its token is exhausted.
+
+    :param response: The response, None if the request failed.
+    :return: True if the request must be sent again with another token.
+    """
+    if response is None:
+        return False
+    return response.status_code in (403, 429) and response.headers.get("X-RateLimit-Remaining") == "0"
+
+
+def get_retry_after(response: requests.Response) -> float:
+    """
+    Get the number of seconds to wait before the next request.
+
+    :param response: The throttled response.
+    :return: The number of seconds to wait.
+    """
+    if "Retry-After" in response.headers:
+        return int(response.headers["Retry-After"]) + 0.3
+    return 60.0
+
+
+def get_throttle_wait(headers: typing.Mapping) -> float:
+    """
+    Get the number of seconds to wait before sending again a request refused because of the rate limit of the API. An
+    exhausted token is left aside by the token pool until its reset, so the other tokens can be used at once.
+
+    :param headers: The headers of the refused response.
+    :return: The number of seconds to wait.
+    """
+    if "Retry-After" in headers:
+        return int(headers["Retry-After"]) + 0.3
+    if headers.get("X-RateLimit-Remaining") == "0":
+        return 0.0
+    return 60.0
+
+
+class AdaptiveController:
+    """
+    AIMD controller of the requests in flight and of the request rate.
+    """
+
+    def __init__(self, name: str, settings: dict, initial_rate: float, metrics=None) -> None:
+        """
+        :param name: The name used in the logs.
+        :param settings: The settings of the controller, see "rate_control" in "fetch_data_config.py".
+        :param initial_rate: The initial number of requests per minute.
+        :param metrics: The metrics recording the waits and the limits, if any.
+        """
+        self.name = name
+        self.metrics = metrics
+        self.min_concurrency = settings["min_concurrency"]
+        self.max_concurrency = settings["max_concurrency"]
+        self.min_rate = settings["min_rate"]
+        self.max_rate = settings["max_rate"]
+        self.decrease_factor = settings["decrease_factor"]
+        self.rate_increase = settings["rate_increase"]
+        self.log_every = settings["log_every"]
+
+        self.concurrency = float(settings["initial_concurrency"])
+        self.rate = float(initial_rate)
+        self.in_flight = 0
+        self.next_slot = 0.0
+        self.last_decrease = 0.0
+        self.responses = 0
+        self.condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """
+        Wait for a free place in flight and for the next slot of the request rate.
+
+        :return: The time at which the request is sent, to give back to release.
+        """
+        start = time.time()
+        with self.condition:
+            while self.in_flight >= int(self.concurrency):
+                self.condition.wait()
+            self.in_flight += 1
+            now = time.time()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + 60.0 / self.rate
+
+        if self.metrics is not None:
+            self.metrics.inc("crawl_sleep_seconds_total", now - start, reason=f"{self.name} concurrency")
+            self.metrics.inc("crawl_sleep_seconds_total", slot - now, reason=f"{self.name} rate")
+        if slot > now:
+            time.sleep(slot - now)
+        return slot
+
+    def release(self, sent_at: float, response: requests.Response | None) -> None:
+        """
+        Give back the place in flight and adapt the limits to the response.
+
+        :param sent_at: The value returned by acquire.
+        :param response: The response, None if the request failed.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.responses += 1
+
+            if is_throttled(response):
+                now = time.time()
+                pause = get_retry_after(response)
+                self.next_slot = max(self.next_slot, now + pause)
+                # only the first throttled response of a burst decreases the limits
+                if sent_at >= self.last_decrease:
+                    self.last_decrease = now
+                    self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease_factor)
+                    self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                    self.log_limits(f"throttled, pausing {round(pause, 1)} seconds")
+            elif response is not None and not is_token_exhausted(response):
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+                self.rate = min(self.max_rate, self.rate + self.rate_increase)
+
+            if self.responses % self.log_every == 0:
+                self.log_limits("periodic")
+            if self.metrics is not None:
+                self.metrics.set("crawl_concurrency_limit", int(self.concurrency), host=self.name)
+                self.metrics.set("crawl_rate_limit", round(self.rate, 1), host=self.name)
+            self.condition.notify_all()
+
+    def log_limits(self, reason: str) -> None:
+        """
+        Log the current limits. The condition must be held.
+
+        :param reason: Why the limits are logged.
+        """
+        logging.info(f"{self.name} limits ({reason}): {int(self.concurrency)} in flight, "
+                     f"{round(self.rate)} requests/minute")
+
+    def send(self, send_request) -> requests.Response:
+        """
+        Send a request within the limits.
+
+        :param send_request: The function sending the request.
+        :return: The response.
+        """
+        sent_at = self.acquire()
+        response = None
+        try:
+            response = send_request()
+            return response
+        finally:
+            self.release(sent_at, response)
@@ -0,0 +1,379 @@
+"""
+Synthetic GitHub marketplace and API, to test the crawl of "fetch_data.py" at scale without network.
+
+Every answer is generated on demand from the number of the Action and a seed, so the simulator holds no state and a
+simulated marketplace of any size gives the same pages on every run. It generates:
+    - the list of the categories and the listing pages, with the pagination read by get_max_page;
+    - the marketplace pages of the Actions, with their "Links" and "Verified creator" markup;
+    - the repository pages, missing for a share of the Actions;
+    - the dependents pages, with the packages of some repositories;
+    - the GraphQL answers (stargazerCount, watchers, forks and the paginated releases and issues);
+    - the paginated REST contributors, with their "Link" header.
+The sizes are drawn from log-normal distributions, configured by "simulator" in "fetch_data_config.py".
+
+It answers through the replay of "cassette.py", with cassette["mode"] = "simulate" in the process itself, or as a
+local stand-in with cassette["mode"] = "server".
+
+Usage: python simulator.py [port]
+"""
+import datetime
+import json
+import logging
+import math
+import random
+import re
+import string
+import sys
+import threading
+import urllib.parse
+
+import cassette
+import fetch_data_config as config
+
+
+FIRST_DATE = datetime.datetime(2020, 1, 1)
+HTML_HEADERS = {"Content-Type": "text/html; charset=utf-8"}
+JSON_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+LISTING_PATTERN = re.compile(r"^/marketplace$")
+ACTION_PATTERN = re.compile(r"^/marketplace/actions/action-(\d+)$")
+REPOSITORY_PATTERN = re.compile(r"^/owner-(\d+)/repository-(\d+)(/network/dependents)?$")
+CONTRIBUTORS_PATTERN = re.compile(r"^/repos/owner-(\d+)/repository-(\d+)/contributors$")
+GRAPHQL_REPOSITORY_PATTERN = re.compile(r'repositoryOwner\(login: "owner-(\d+)"\)\s*{[^{]*repository\(name: '
+                                        r'"repository-(\d+)"\)')
+GRAPHQL_CONNECTION_PATTERN = re.compile(r'(releases|issues)\(first: (\d+)(?:, after: "(\d+)")?([^)]*)\)')
+GRAPHQL_COUNT_PATTERN = re.compile(r'(releases|issues)Count: ')
+GRAPHQL_SINCE_PATTERN = re.compile(r'since: "([^"]+)"')
+
+
+def get_category_name(index: int) -> str:
+    """
+    Get the name of a category. The names hold only letters, as the digits are removed by get_categories.
+
+    :param index: The number of the category.
+    :return: The name displayed in the marketplace.
+    """
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = string.ascii_lowercase[remainder] + letters
+    return f"Category {letters.capitalize()}"
+
+
+def get_category_slug(index: int) -> str:
+    """
+    :param index: The number of the category.
+    :return: The category as found by get_categories, used in the URLs.
+    """
+    return get_category_name(index).lower().replace(" ", "-")
+
+
+class Simulator:
+    """
+    Answers of a synthetic marketplace and API, generated from the settings.
+    """
+
+    def __init__(self, settings: dict) -> None:
+        """
+        :param settings: The settings of the simulator, see "simulator" in "fetch_data_config.py".
+        """
+        self.settings = settings
+        self.number_of_categories = settings["categories"]
+        self.number_of_actions = settings["actions"]
+        self.per_page = settings["actions_per_page"]
+        self.seed = settings["seed"]
+        self.categories = {get_category_slug(index): index for index in range(self.number_of_categories)}
+
+        # the Actions are spread over the categories in turn, and a share of them is also listed in the next category
+        self.listings = [list(range(index, self.number_of_actions, self.number_of_categories))
+                         for index in range(self.number_of_categories)]
+        if self.number_of_categories > 1:
+            for action in range(self.number_of_actions):
+                if self.get_random(action, "overlap").random() < settings["overlap_share"]:
+                    self.listings[(action + 1) % self.number_of_categories].append(action)
+
+    def get_random(self, action: int, purpose: str) -> random.Random:
+        """
+        Get the random generator of a property of an Action, the same on every run.
+
+        :param action: The number of the Action.
+        :param purpose: The property.
+        :return: The random generator.
+        """
+        return random.Random(f"{self.seed}-{action}-{purpose}")
+
+    def get_size(self, action: int, key: str) -> int:
+        """
+        Draw a size of an Action (number of releases, issues...) from its log-normal distribution.
+
+        :param action: The number of the Action.
+        :param key: The key of the size in the settings.
+        :return: The size.
+        """
+        median, sigma, maximum = self.settings["sizes"][key]
+        if median <= 0:
+            return 0
+        value = self.get_random(action, key).lognormvariate(math.log(median), sigma)
+        return int(min(maximum, value))
+
+    def get_owner(self, action: int) -> int:
+        """
+        :param action: The number of the Action.
+        :return: The number of the owner of its repository, an owner holds several repositories.
+        """
+        return action // self.settings["repositories_per_owner"]
+
+    def is_valid(self, owner: int, action: int) -> bool:
+        """
+        Tell if a repository exists.
+
+        :param owner: The number of the owner.
+        :param action: The number of the Action, and of its repository.
+        :return: True if the repository exists.
+        """
+        return (0 <= action < self.number_of_actions and owner == self.get_owner(action) and
+                self.get_random(action, "link").random() >= self.settings["broken_link_share"])
+
+    def get_answer(self, method: str, url: str, body: bytes | str | None = None) -> tuple | None:
+        """
+        Generate the answer to a request.
+
+        :param method: The HTTP method.
+        :param url: The URL of the request.
+        :param body: The body of the request, if any.
+        :return: The answer (status, headers, body, elapsed), or None if the URL is not simulated.
+        """
+        parts = urllib.parse.urlsplit(url)
+        parameters = {name: values[0] for name, values in urllib.parse.parse_qs(parts.query).items()}
+
+        if parts.netloc == "api.github.com":
+            if parts.path == "/graphql" and body:
+                return self.get_graphql(json.loads(body)["query"])
+            match = CONTRIBUTORS_PATTERN.match(parts.path)
+            if match:
+                return self.get_contributors(int(match.group(1)), int(match.group(2)), url,
+                                             int(parameters.get("page", 1)), int(parameters.get("per_page", 30)))
+            return None
+
+        if parts.netloc != "github.com":
+            return None
+        if LISTING_PATTERN.match(parts.path):
+            if "category" not in parameters:
+                return self.get_categories_page()
+            return self.get_listing_page(parameters["category"], int(parameters.get("page", 1)))
+        match = ACTION_PATTERN.match(parts.path)
+        if match:
+            return self.get_action_page(int(match.group(1)))
+        match = REPOSITORY_PATTERN.match(parts.path)
+        if match:
+            owner, action = int(match.group(1)), int(match.group(2))
+            if not self.is_valid(owner, action):
+                return 404, HTML_HEADERS, b"<html><body>Not Found</body></html>", 0.0
+            if match.group(3):
+                return self.get_dependents_page(owner, action, parameters.get("package_id"))
+            return 200, HTML_HEADERS, f"<html><body><h1>repository-{action}</h1></body></html>".encode(), 0.0
+        return None
+
+    def get_categories_page(self) -> tuple:
+        """
+        :return: The answer of the marketplace page listing the categories.
+        """
+        categories = "".join(f"<li><a>\n  {get_category_name(index)}\n</a></li>"
+                             for index in range(self.number_of_categories))
+        page = (f'<html><body><div id="js-pjax-container"><div></div><div><div>'
+                f'<nav><ul></ul><ul>{categories}</ul></nav></div></div></div></body></html>')
+        return 200, HTML_HEADERS, page.encode(), 0.0
+
+    def get_listing_page(self, category: str, page: int) -> tuple | None:
+        """
+        Generate a listing page of a category, with the pagination of GitHub: the first pages, the pages around the
+        current one and the last pages.
+
+        :param category: The category, as found by get_categories.
+        :param page: The number of the page.
+        :return: The answer, None if the category is not simulated.
+        """
+        if category not in self.categories:
+            return None
+        listing = self.listings[self.categories[category]]
+        max_page = max(1, math.ceil(len(listing) / self.per_page))
+        actions = listing[(page - 1) * self.per_page:page * self.per_page] if 1 <= page <= max_page else []
+
+        # like GitHub, there is no pagination when the category fits in one page
+        numbers = sorted({1, 2, page - 1, page, page + 1, max_page - 1, max_page} & set(range(1, max_page + 1)))
+        if max_page == 1:
+            numbers = []
+        pagination = "".join(f'<em class="current">{number}</em>' if number == page else
+                             f'<a href="/marketplace?category={category}&amp;page={number}">{number}</a>'
+                             for number in numbers)
+        if page < max_page:
+            pagination += f'<a class="next_page" href="/marketplace?category={category}&amp;page={page + 1}">Next</a>'
+        cards = "".join(f"<div class='d-md-flex flex-wrap mb-4'><a href=\"/marketplace/actions/action-{action}\">\n"
+                        f'  <h3 class="h4">Action {action}</h3>\n</a></div>\n' for action in actions)
+        listing_page = (f'<html><body><div id="js-pjax-container"><div></div><div><div>'
+                        f'<nav><ul></ul><ul></ul></nav><div></div><div></div><div><div>{pagination}</div></div>'
+                        f'{cards}</div></div></div></body></html>')
+        return 200, HTML_HEADERS, listing_page.encode(), 0.0
+
+    def get_action_page(self, action: int) -> tuple | None:
+        """
+        Generate the marketplace page of an Action.
+
+        :param action: The number of the Action.
+        :return: The answer, None if the Action is not simulated.
+        """
+        if not 0 <= action < self.number_of_actions:
+            return None
+        verified = self.get_random(action, "verified").random() < self.settings["verified_share"]
+        page = (f'<html><body><h1>\n  Action {action}\n</h1><div><h5 class="mb-2">\n  Links\n</h5>'
+                f'<a href="https://github.com/owner-{self.get_owner(action)}/repository-{action}">'
+                f'owner-{self.get_owner(action)}/repository-{action}</a>'
+                f'{"<span>Verified creator</span>" if verified else ""}</div></body></html>')
+        return 200, HTML_HEADERS, page.encode(), 0.0
+
+    def get_dependents_page(self, owner: int, action: int, package: str | None) -> tuple:
+        """
+        Generate a dependents page of a repository, or of one of its packages.
+
+        :param owner: The number of the owner.
+        :param action: The number of the Action.
+        :param package: The number of the package, None for the page of the repository.
+        :return: The answer.
+        """
+        url = f"/owner-{owner}/repository-{action}/network/dependents"
+        packages = self.get_size(action, "packages")
+        dependents = self.get_size(action, "dependents")
+        if package is not None:
+            dependents = self.get_random(action, f"package-{package}").randint(0, max(1, dependents) * 2)
+
+        menu = ""
+        if packages:
+            links = "".join(f'<a href="{url}?package_id={index}">package-{index}</a>' for index in range(packages))
+            menu = (f'<details><summary><i>Package:</i></summary>'
+                    f'<details-menu><div></div><div>{links}</div></details-menu></details>')
+        page = (f'<html><body><div id="dependents">{menu}<div></div><div></div><div><div><div><div>'
+                f'<a href="{url}?dependent_type=REPOSITORY">\n  <svg></svg>\n  {dependents:,}\n  Repositories\n</a>'
+                f'<a href="{url}?dependent_type=PACKAGE">0 Packages</a>'
+                f'</div></div></div></div></div></body></html>')
+        return 200, HTML_HEADERS, page.encode(), 0.0
+
+    def get_graphql(self, query: str) -> tuple:
+        """
+        Generate the answer of a GraphQL query about a repository.
+
+        :param query: The GraphQL query.
+        :return: The answer.
+        """
+        match = GRAPHQL_REPOSITORY_PATTERN.search(query)
+        owner, action = (int(match.group(1)), int(match.group(2))) if match else (-1, -1)
+        if not self.is_valid(owner, action):
+            answer = {"data": {"repositoryOwner": None}}
+            return 200, JSON_HEADERS, json.dumps(answer).encode(), 0.0
+
+        repository = {"id": f"R_{action}", "name": f"repository-{action}"}
+        if "stargazerCount" in query:
+            repository["stargazerCount"] = self.get_size(action, "stars")
+        if "watchers" in query:
+            repository["watchers"] = {"totalCount": self.get_size(action, "watchers")}
+        if "forks" in query:
+            repository["forks"] = {"totalCount": self.get_size(action, "forks")}
+        for connection, first, after, arguments in GRAPHQL_CONNECTION_PATTERN.findall(query):
+            repository[connection] = self.get_connection(action, connection, int(first), int(after or 0), arguments)
+        for connection in GRAPHQL_COUNT_PATTERN.findall(query):
+            repository[f"{connection}Count"] = {"totalCount": self.get_size(action, connection)}
+
+        answer = {"data": {"repositoryOwner": {"login": f"owner-{owner}", "repository": repository}}}
+        if "rateLimit" in query:
+            # the connections of the queries are not nested, so a query costs a single point. The simulator holds no
+            # state, the budget is never spent.
+            reset = datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0) + \
+                datetime.timedelta(hours=1)
+            answer["data"]["rateLimit"] = {"cost": 1, "remaining": 4999,
+                                           "resetAt": reset.strftime("%Y-%m-%dT%H:%M:%SZ")}
+        return 200, JSON_HEADERS, json.dumps(answer).encode(), 0.0
+
+    def get_connection(self, action: int, connection: str, first: int, after: int, arguments: str = "") -> dict:
+        """
+        Generate a page of the releases or of the issues of a repository. The cursor is the number of nodes before the
+        page, in the order of the connection.
+
+        :param action: The number of the Action.
+        :param connection: "releases" or "issues".
+        :param first: The number of nodes per page.
+        :param after: The cursor of the previous page, 0 for the first page.
+        :param arguments: The other arguments of the connection: the newest nodes first with "direction: DESC", and
+                          the nodes updated from a date only with "since".
+        :return: The connection.
+        """
+        # one node per hour, the dates of a repository are all different. The nodes are never updated after their
+        # creation.
+        indexes = range(self.get_size(action, connection))
+        since = GRAPHQL_SINCE_PATTERN.search(arguments)
+        if since:
+            since_date = datetime.datetime.strptime(since.group(1), "%Y-%m-%dT%H:%M:%SZ")
+            first_index = max(0, math.ceil((since_date - FIRST_DATE) / datetime.timedelta(hours=1)))
+            indexes = indexes[first_index:]
+        if "direction: DESC" in arguments:
+            indexes = indexes[::-1]
+
+        total = len(indexes)
+        edges = []
+        for index in indexes[after:after + first]:
+            day = (FIRST_DATE + datetime.timedelta(hours=index)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            if connection == "releases":
+                node = {"tag": {"name": f"v{index}.0.0"}, "publishedAt": day, "createdAt": day}
+            else:
+                closed = index % 3 != 0
+                node = {"state": "CLOSED" if closed else "OPEN", "createdAt": day, "closedAt": day if closed else None}
+            edges.append({"node": node})
+        end = min(total, after + first)
+        return {"totalCount": total, "pageInfo": {"hasNextPage": end < total, "endCursor": str(end)},
+                "edges": edges}
+
+    def get_contributors(self, owner: int, action: int, url: str, page: int, per_page: int) -> tuple:
+        """
+        Generate a page of the contributors of a repository, with the "Link" header of the REST API.
+
+        :param owner: The number of the owner.
+        :param action: The number of the Action.
+        :param url: The URL of the request.
+        :param page: The number of the page.
+        :param per_page: The number of contributors per page.
+        :return: The answer.
+        """
+        if not self.is_valid(owner, action):
+            return 404, JSON_HEADERS, b'{"message": "Not Found"}', 0.0
+
+        total = self.get_size(action, "contributors")
+        # the logins are shared by the neighbouring repositories
+        contributors = [{"login": f"contributor-{action + index}"}
+                        for index in range((page - 1) * per_page, min(total, page * per_page))]
+        headers = dict(JSON_HEADERS)
+        last_page = max(1, math.ceil(total / per_page))
+        if last_page > 1:
+            parts = urllib.parse.urlsplit(url)
+
+            def get_page_url(number: int) -> str:
+                query = urllib.parse.urlencode({"per_page": per_page, "page": number})
+                return urllib.parse.urlunsplit(parts._replace(query=query))
+
+            links = []
+            if page < last_page:
+                links.append(f'<{get_page_url(page + 1)}>; rel="next"')
+            links.append(f'<{get_page_url(last_page)}>; rel="last"')
+            headers["Link"] = ", ".join(links)
+        return 200, headers, json.dumps(contributors).encode(), 0.0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    replayer_main = cassette.Replayer(Simulator(config.simulator), config.cassette["latency"] or 0.0,
+                                      config.cassette["throttle_rate"], config.cassette["retry_after"],
+                                      config.cassette["seed"])
+    server_main = cassette.serve(replayer_main, int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
+    logging.info(f"Simulating {config.simulator['actions']} Actions on "
+                 f"http://127.0.0.1:{server_main.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server_main.shutdown()
@@ -0,0 +1,131 @@
+"""
+History of the releases and of the issues saved by the previous crawl, for the incremental mode of "fetch_data.py".
+
+A daily snapshot mostly repeats the previous one: only a few releases are published and a few issues are opened or
+closed each day. In incremental mode, the history of each repository is read from the latest previous snapshot of the
+outputs directory. The API is only asked for the releases created since the previous crawl, newest first, and for the
+issues updated since. The rest of the history is copied forward. The releases and the issues deleted or transferred
+since are noticed by comparing the merged history with the count of the repository, which is then fetched in full.
+"""
+from datetime import datetime, timedelta, timezone
+
+import glob
+import logging
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+
+
+SNAPSHOT_PATTERN = re.compile(r"actions_data_(\d{4}_\d{2}_\d{2})\.db$")
+
+
+def find_previous_snapshot(directory: str, current_path: str) -> str | None:
+    """
+    Find the latest snapshot older than the current one.
+
+    :param directory: The directory holding the snapshots.
+    :param current_path: The path of the snapshot being crawled.
+    :return: The path of the previous snapshot, None if there is none.
+    """
+    current_name = os.path.basename(current_path)
+    snapshots = [path for path in glob.glob(os.path.join(directory, "actions_data_*.db"))
+                 if SNAPSHOT_PATTERN.search(path) and os.path.abspath(path) != os.path.abspath(current_path)]
+    # the dates of the names sort in the order of the crawls
+    if SNAPSHOT_PATTERN.search(current_name):
+        snapshots = [path for path in snapshots if os.path.basename(path) < current_name]
+    return max(snapshots, key=os.path.basename) if snapshots else None
+
+
+def get_crawl_date(path: str) -> datetime:
+    """
+    Get the date of the crawl of a snapshot, from its name or else from its last modification.
+
+    :param path: The path of the snapshot.
+    :return: The date, in UTC.
+    """
+    match = SNAPSHOT_PATTERN.search(path)
+    if match:
+        return datetime.strptime(match.group(1), "%Y_%m_%d").replace(tzinfo=timezone.utc)
+    return datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+
+
+class SnapshotHistory:
+    """
+    Read-only access to the releases and the issues of each repository of the previous snapshot.
+    """
+
+    def __init__(self) -> None:
+        self.connection = None
+        self.lock = threading.Lock()
+        # the issues updated from this date, in the format of the GraphQL API, are fetched again
+        self.since = None
+        self.repositories = set()
+        # (owner, repository) -> keys that the previous crawl could not fetch
+        self.failed_keys = {}
+        # keys having rows in the previous snapshot, the other ones were not fetched by the previous crawl
+        self.keys = set()
+
+    def open(self, directory: str, current_path: str, margin_days: float) -> None:
+        """
+        Open the latest previous snapshot of a directory. Without previous snapshot, every history is fetched in full.
+
+        :param directory: The directory holding the snapshots.
+        :param current_path: The path of the snapshot being crawled.
+        :param margin_days: The number of days before the previous crawl from which the issues are fetched again.
+        """
+        path = find_previous_snapshot(directory, current_path)
+        if path is None:
+            logging.warning(f"No previous snapshot in {directory}, the histories are fetched in full")
+            return
+
+        logging.info(f"Copying the histories forward from {path}")
+        self.connection = sqlite3.connect(pathlib.Path(path).absolute().as_uri() + "?mode=ro", uri=True,
+                                          check_same_thread=False)
+        since = get_crawl_date(path) - timedelta(days=margin_days)
+        self.since = since.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        cursor = self.connection.cursor()
+        tables = {name for name, in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+        self.repositories = set(cursor.execute("SELECT owner, repository FROM categories;"))
+        if "crawl_failed_keys" in tables:
+            for owner, repository, key in cursor.execute("SELECT owner, repository, key FROM crawl_failed_keys;"):
+                self.failed_keys.setdefault((owner, repository), set()).add(key)
+        for key in ("versions", "issues"):
+            if key in tables and cursor.execute(f"SELECT 1 FROM {key} LIMIT 1;").fetchone():
+                self.keys.add(key)
+
+    def get_rows(self, key: str, owner: str, repository: str) -> list | None:
+        """
+        Get the history of a repository in the previous snapshot.
+
+        :param key: "versions" or "issues".
+        :param owner: The owner of the repository.
+        :param repository: The name of the repository.
+        :return: The (date, version) rows of the versions, or the (state, created, closed) rows of the issues. None
+                 if the previous crawl did not fetch them, so they must be fetched in full.
+        """
+        if self.connection is None or key not in self.keys or (owner, repository) not in self.repositories or \
+                key in self.failed_keys.get((owner, repository), ()):
+            return None
+
+        with self.lock:
+            if key == "versions":
+                return self.connection.execute("SELECT date, version FROM versions WHERE owner = ? AND repository = ?;",
+                                               (owner, repository)).fetchall()
+            # the empty row of a repository without issues is not an issue
+            return self.connection.execute("SELECT state, created, closed FROM issues "
+                                           "WHERE owner = ? AND repository = ? AND created IS NOT NULL;",
+                                           (owner, repository)).fetchall()
+
+    def close(self) -> None:
+        """
+        Close the previous snapshot.
+        """
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        self.repositories = set()
+        self.failed_keys = {}
+        self.keys = set()
@@ -0,0 +1,243 @@
+"""
+Temporal storage of the snapshots of "fetch_data.py".
+
+Each crawl writes a complete snapshot ("actions_data_YYYY_MM_DD.db"), and most of its rows are the same as in the
+previous one. The temporal store keeps every snapshot in a single database: each row of the snapshot tables carries
+the id of the first snapshot it is in (valid_from) and of the first snapshot it is not in anymore (valid_to, NULL
+while it is still valid). Ingesting a snapshot only closes the intervals of the rows that disappeared and opens the
+intervals of the new rows, so the store grows with the changes instead of with the snapshots. A changed row (for
+example the stars of an Action) is closed and opened again with its new values.
+
+Questions spanning dates become single indexed queries on the intervals, and as_of gives the tables as they were at
+a date, under their usual names, so the queries written for a snapshot run unchanged.
+
+Usage: python temporal_store.py store_path snapshot_or_directory [...]
+"""
+import glob
+import logging
+import os
+import pathlib
+import sqlite3
+import sys
+
+import snapshot_history
+
+
+# the tables of a snapshot and their columns, the tables of the state of the crawl are not kept
+TABLES = {
+    "actions": ("forks", "name", "owner", "repository", "stars", "verified", "watchers"),
+    "categories": ("owner", "repository", "category"),
+    "contributors": ("owner", "repository", "contributor"),
+    "dependents": ("owner", "repository", "number", "package_url"),
+    "issues": ("owner", "repository", "state", "created", "closed"),
+    "versions": ("owner", "repository", "date", "version"),
+}
+
+
+def valid_at(alias: str, snapshot: str) -> str:
+    """
+    Build the condition selecting the rows of a table valid in a snapshot.
+
+    :param alias: The name or the alias of the table in the query.
+    :param snapshot: The id of the snapshot in the query, a parameter or a column.
+    :return: The SQL condition.
+    """
+    return f"{alias}.valid_from <= {snapshot} AND ({alias}.valid_to IS NULL OR {alias}.valid_to > {snapshot})"
+
+
+def get_same_row(first_alias: str, second_alias: str, columns: tuple) -> str:
+    """
+    Build the condition matching the rows of two tables with the same values, NULL included.
+
+    :param first_alias: The alias of the first table.
+    :param second_alias: The alias of the second table.
+    :param columns: The columns to compare.
+    :return: The SQL condition.
+    """
+    return " AND ".join(f"{first_alias}.{column} IS {second_alias}.{column}" for column in columns)
+
+
+class TemporalStore:
+    """
+    The snapshots of the crawls in a single database, with the interval of validity of each row.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: The path of the database, created if needed.
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path, uri=True)
+        cursor = self.connection.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY,
+            date TEXT UNIQUE,
+            file TEXT
+        );
+        """)
+        for table, columns in TABLES.items():
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {", ".join(columns)},
+                valid_from INTEGER,
+                valid_to INTEGER
+            );
+            """)
+            # the open rows are compared with each new snapshot
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_open ON {table} ({', '.join(columns)}) "
+                           f"WHERE valid_to IS NULL;")
+            # the history of a repository
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_repository ON {table} "
+                           f"(owner, repository, valid_from, valid_to);")
+        self.connection.commit()
+
+    def get_snapshots(self) -> list:
+        """
+        :return: The (id, date) of the ingested snapshots, from the oldest.
+        """
+        return self.connection.execute("SELECT id, date FROM snapshots ORDER BY id;").fetchall()
+
+    def get_snapshot_id(self, date: str) -> int | None:
+        """
+        Get the snapshot valid at a date: the latest one crawled on or before it.
+
+        :param date: The date, as YYYY-MM-DD.
+        :return: The id of the snapshot, None if there is none before the date.
+        """
+        row = self.connection.execute("SELECT id FROM snapshots WHERE date <= ? ORDER BY date DESC LIMIT 1;",
+                                      (date,)).fetchone()
+        return row[0] if row else None
+
+    def ingest(self, snapshot_path: str) -> int:
+        """
+        Add a snapshot to the store. Only the rows that changed since the previous snapshot are written.
+
+        :param snapshot_path: The path of the snapshot.
+        :return: The id of the snapshot in the store.
+        """
+        date = snapshot_history.get_crawl_date(snapshot_path).strftime("%Y-%m-%d")
+        row = self.connection.execute("SELECT id FROM snapshots WHERE date = ?;", (date,)).fetchone()
+        if row:
+            logging.info(f"{snapshot_path} is already in the temporal store")
+            return row[0]
+        last_date = self.connection.execute("SELECT MAX(date) FROM snapshots;").fetchone()[0]
+        if last_date is not None and date < last_date:
+            raise ValueError(f"{snapshot_path} is older than the last snapshot of the store ({last_date}), the "
+                             f"snapshots must be ingested in order")
+
+        cursor = self.connection.cursor()
+        snapshot_uri = pathlib.Path(snapshot_path).absolute().as_uri() + "?mode=ro"
+        cursor.execute("ATTACH DATABASE ? AS snapshot;", (snapshot_uri,))
+        try:
+            snapshot_tables = {name for name, in cursor.execute("SELECT name FROM snapshot.sqlite_master "
+                                                                "WHERE type = 'table';")}
+            with self.connection:
+                cursor.execute("INSERT INTO snapshots (date, file) VALUES (?, ?);",
+                               (date, os.path.basename(snapshot_path)))
+                snapshot_id = cursor.lastrowid
+                for table, columns in TABLES.items():
+                    opened, closed = self.ingest_table(cursor, table, columns, snapshot_id, table in snapshot_tables)
+                    logging.info(f"{date} - {table}: {opened} rows opened, {closed} rows closed")
+        finally:
+            cursor.execute("DETACH DATABASE snapshot;")
+
+        return snapshot_id
+
+    @staticmethod
+    def ingest_table(cursor: sqlite3.Cursor, table: str, columns: tuple, snapshot_id: int,
+                     in_snapshot: bool) -> tuple[int, int]:
+        """
+        Open the intervals of the new rows of a table of the attached snapshot, and close the ones of the rows that
+        are not in it anymore.
+
+        :param cursor: The cursor of the store, with the snapshot attached as "snapshot".
+        :param table: The name of the table.
+        :param columns: The columns of the table.
+        :param snapshot_id: The id of the snapshot.
+        :param in_snapshot: False if the snapshot has no such table: every row is closed.
+        :return: The number of rows opened and closed.
+        """
+        opened = 0
+        if in_snapshot:
+            cursor.execute(f"""
+            INSERT INTO {table} ({", ".join(columns)}, valid_from)
+            SELECT {", ".join(f"new.{column}" for column in columns)}, ? FROM snapshot.{table} AS new
+            WHERE NOT EXISTS (SELECT 1 FROM main.{table} AS old
+                              WHERE old.valid_to IS NULL AND {get_same_row("old", "new", columns)});
+            """, (snapshot_id,))
+            opened = cursor.rowcount
+
+        absent = f"""AND NOT EXISTS (SELECT 1 FROM snapshot.{table} AS new
+                                     WHERE {get_same_row("new", f"main.{table}", columns)})""" if in_snapshot else ""
+        cursor.execute(f"UPDATE main.{table} SET valid_to = ? WHERE valid_to IS NULL AND valid_from < ? {absent};",
+                       (snapshot_id, snapshot_id))
+        return opened, cursor.rowcount
+
+    def ingest_directory(self, directory: str) -> list:
+        """
+        Add the snapshots of a directory that are not in the store yet, from the oldest.
+
+        :param directory: The directory holding the snapshots.
+        :return: The ids of the snapshots.
+        """
+        paths = sorted((path for path in glob.glob(os.path.join(directory, "actions_data_*.db"))
+                        if snapshot_history.SNAPSHOT_PATTERN.search(path)), key=os.path.basename)
+        return [self.ingest(path) for path in paths]
+
+    def as_of(self, date: str) -> sqlite3.Connection | None:
+        """
+        Open the tables as they were at a date. The connection shows each table of a snapshot under its usual name,
+        with its usual columns, so it can be used like the connection to the snapshot file.
+
+        :param date: The date, as YYYY-MM-DD.
+        :return: A new connection to the store, to close after use. None if there is no snapshot before the date.
+        """
+        snapshot_id = self.get_snapshot_id(date)
+        if snapshot_id is None:
+            return None
+
+        connection = sqlite3.connect(self.path)
+        # the temporary views hide the tables of the same name
+        for table, columns in TABLES.items():
+            connection.execute(f"CREATE TEMP VIEW {table} AS SELECT {', '.join(columns)} FROM main.{table} "
+                               f"WHERE {valid_at(f'main.{table}', str(snapshot_id))};")
+        return connection
+
+    def count_per_snapshot(self, table: str, group_by: str | None = None) -> list:
+        """
+        Count the rows of a table in every snapshot, with a single query.
+
+        :param table: The name of the table.
+        :param group_by: A column of the table to count the rows per value, None for the whole table.
+        :return: The (date, count) of each snapshot, from the oldest, or the (date, value, count) if grouped. A
+                 snapshot without any row is not listed if grouped.
+        """
+        group = f", {table}.{group_by}" if group_by else ""
+        join = "JOIN" if group_by else "LEFT JOIN"
+        return self.connection.execute(f"""
+        SELECT snapshots.date{group}, COUNT({table}.valid_from) FROM snapshots
+        {join} {table} ON {valid_at(table, "snapshots.id")}
+        GROUP BY snapshots.id{group} ORDER BY snapshots.id;
+        """).fetchall()
+
+    def close(self) -> None:
+        """
+        Close the store.
+        """
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    store_main = TemporalStore(sys.argv[1])
+    for path_main in sys.argv[2:]:
+        if os.path.isdir(path_main):
+            store_main.ingest_directory(path_main)
+        else:
+            store_main.ingest(path_main)
+    store_main.close()
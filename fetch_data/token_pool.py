@@ -0,0 +1,132 @@
+"""
+Pool of GitHub tokens shared by the threads of "fetch_data.py".
+
+The remaining budget of each token is read from the responses themselves (X-RateLimit-* headers, and the rateLimit
+object of GraphQL answers), so no request is spent on probing the rate limit. A request reserves the points it is
+expected to cost on its token, so the concurrent threads do not spend more than the budget of a token.
+"""
+from datetime import datetime, timezone
+
+import logging
+import threading
+import time
+
+
+class TokenPool:
+    """
+    Hand out the token with the most remaining budget, per API resource ("graphql" or "core" for the REST API).
+    """
+
+    def __init__(self, tokens: list, metrics=None) -> None:
+        """
+        :param tokens: The GitHub tokens.
+        :param metrics: The metrics recording the time spent waiting for a reset, if any.
+        """
+        self.tokens = list(tokens)
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        # resource -> token -> [remaining, reset timestamp]. The remaining budget is None until a response is seen.
+        self.budgets = {}
+        # resource -> cost of the last request, in rate limit points
+        self.costs = {}
+        # token -> its number, to label the metrics without exposing the token
+        self.numbers = {token: str(number) for number, token in enumerate(self.tokens)}
+
+    def get_budgets(self, resource: str) -> dict:
+        """
+        Get the budgets of a resource, creating them if needed. The lock must be held.
+
+        :param resource: The API resource.
+        :return: The budgets of each token for the resource.
+        """
+        if resource not in self.budgets:
+            self.budgets[resource] = {token: [None, 0.0] for token in self.tokens}
+        return self.budgets[resource]
+
+    def try_acquire(self, resource: str, cost: int | None = None) -> tuple[str | None, float]:
+        """
+        Reserve a request on the token with the most remaining budget.
+
+        :param resource: The API resource.
+        :param cost: The number of points the request is expected to cost, the cost of the last request by default.
+        :return: The token and 0, or None and the number of seconds until the earliest reset if no token has the
+                 budget of the request. The token itself may be None if its environment variable is not set.
+        """
+        with self.lock:
+            budgets = self.get_budgets(resource)
+            cost = cost or self.costs.get(resource, 1)
+            now = time.time()
+            available = {}
+            for token, (remaining, reset) in budgets.items():
+                if remaining is None or reset <= now:
+                    available[token] = float("inf")
+                elif remaining >= cost:
+                    available[token] = remaining
+
+            if not available:
+                return None, max(0.0, min(reset for _, reset in budgets.values()) - now)
+
+            best_token = max(available, key=available.get)
+
+            budget = budgets[best_token]
+            if budget[0] is not None and budget[1] > now:
+                budget[0] -= cost
+            return best_token, 0.0
+
+    def acquire(self, resource: str, cost: int | None = None) -> str:
+        """
+        Get a token with remaining budget, sleeping until the earliest reset if all tokens are exhausted.
+
+        :param resource: The API resource.
+        :param cost: The number of points the request is expected to cost, the cost of the last request by default.
+        :return: The token to use.
+        """
+        while True:
+            token, wait = self.try_acquire(resource, cost)
+            if wait == 0.0:
+                return token
+            logging.info(f"All tokens exhausted for {resource} - sleeping {round(wait + 1)} seconds")
+            if self.metrics is not None:
+                self.metrics.inc("crawl_sleep_seconds_total", wait + 1, reason=f"tokens {resource}")
+            time.sleep(wait + 1)
+
+    def update(self, token: str, resource: str, headers: dict, rate_limit: dict | None = None) -> None:
+        """
+        Update the budget of a token from a response.
+
+        :param token: The token used for the request.
+        :param resource: The API resource, overridden by the X-RateLimit-Resource header if present.
+        :param headers: The headers of the response.
+        :param rate_limit: The rateLimit object of a GraphQL answer, if it has been requested.
+        """
+        resource = headers.get("X-RateLimit-Resource", resource)
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+
+        with self.lock:
+            budgets = self.get_budgets(resource)
+            if token not in budgets:
+                return
+            if remaining is not None and reset is not None:
+                budgets[token] = [int(remaining), float(reset)]
+            if rate_limit:
+                if "cost" in rate_limit:
+                    self.costs[resource] = max(1, int(rate_limit["cost"]))
+                if "remaining" in rate_limit:
+                    budgets[token][0] = int(rate_limit["remaining"])
+                if "resetAt" in rate_limit:
+                    budgets[token][1] = get_timestamp(rate_limit["resetAt"])
+            remaining = budgets[token][0]
+
+        if self.metrics is not None and remaining is not None:
+            self.metrics.set("crawl_token_remaining_points", remaining, resource=resource, token=self.numbers[token])
+
+
+def get_timestamp(date: str) -> float:
+    """
+    Convert a date of the GraphQL API to a timestamp.
+
+    :param date: The date, in the ISO 8601 format of the API, for example "2020-01-01T00:00:00Z".
+    :return: The timestamp.
+    """
+    return datetime.strptime(date, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp()
@@ -0,0 +1,108 @@
+"""
+Pool of long-lived worker threads for "fetch_data.py".
+
+Each worker has its own deque of work items. A worker takes the most recent item of its own deque first, and steals
+the oldest item of another deque when its own is empty, so no worker sits idle while work remains.
+"""
+import collections
+import logging
+import threading
+
+
+class WorkerPool:
+    """
+    Worker threads serving work items with a handler. The handler can submit new items.
+    """
+
+    def __init__(self, number_of_workers: int, handler) -> None:
+        """
+        :param number_of_workers: The number of worker threads.
+        :param handler: The function called with each work item.
+        """
+        self.handler = handler
+        self.deques = [collections.deque() for _ in range(number_of_workers)]
+        self.lock = threading.Lock()
+        self.work_available = threading.Condition(self.lock)
+        self.all_done = threading.Condition(self.lock)
+        self.pending = 0
+        self.next_deque = 0
+        self.closed = False
+        self.local = threading.local()
+        self.threads = [threading.Thread(target=self.work, args=(i,), name=f"thread_{i}", daemon=True)
+                        for i in range(number_of_workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, item) -> None:
+        """
+        Add a work item. Items submitted by a worker go to its own deque, the others are spread over the deques.
+
+        :param item: The work item.
+        """
+        with self.lock:
+            index = getattr(self.local, "index", None)
+            if index is None:
+                index = self.next_deque
+                self.next_deque = (self.next_deque + 1) % len(self.deques)
+            self.deques[index].append(item)
+            self.pending += 1
+            self.work_available.notify()
+
+    def take(self, index: int):
+        """
+        Take a work item for a worker, stealing one if its own deque is empty. The lock must be held.
+
+        :param index: The index of the worker.
+        :return: The work item, or None if there is none.
+        """
+        if self.deques[index]:
+            return self.deques[index].pop()
+        for offset in range(1, len(self.deques)):
+            victim = self.deques[(index + offset) % len(self.deques)]
+            if victim:
+                return victim.popleft()
+        return None
+
+    def work(self, index: int) -> None:
+        """
+        Main loop of a worker.
+
+        :param index: The index of the worker.
+        """
+        self.local.index = index
+        while True:
+            with self.lock:
+                item = self.take(index)
+                while item is None and not self.closed:
+                    self.work_available.wait()
+                    item = self.take(index)
+                if item is None:
+                    return
+
+            try:
+                self.handler(item)
+            except Exception:
+                logging.exception(f"Work item {item} failed")
+            finally:
+                with self.lock:
+                    self.pending -= 1
+                    if self.pending == 0:
+                        self.all_done.notify_all()
+
+    def join(self) -> None:
+        """
+        Wait until every submitted item, and every item they submitted, has been handled.
+        """
+        with self.lock:
+            while self.pending > 0:
+                self.all_done.wait()
+
+    def close(self) -> None:
+        """
+        Stop the workers once their deques are empty.
+        """
+        with self.lock:
+            self.closed = True
+            self.work_available.notify_all()
+        for thread in self.threads:
+            thread.join()